@@ -0,0 +1,52 @@
+"""Add llm_usage table
+
+Revision ID: c957a452b509
+Revises: 0eb70ea437f0
+Create Date: 2026-10-18 21:02:14.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c957a452b509'
+down_revision: Union[str, Sequence[str], None] = '0eb70ea437f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'llm_usage',
+        sa.Column('usage_id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_role', sa.String(length=100), nullable=True),
+        sa.Column('agent', sa.String(length=100), nullable=True),
+        sa.Column('template', sa.String(length=200), nullable=True),
+        sa.Column('provider', sa.String(length=30), nullable=True),
+        sa.Column('model', sa.String(length=100), nullable=True),
+        sa.Column('tier', sa.String(length=20), nullable=True),
+        sa.Column('cache_status', sa.String(length=20), nullable=True),
+        sa.Column('fallback_depth', sa.SmallInteger(), nullable=True),
+        sa.Column('latency_ms', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('cached_tokens', sa.Integer(), nullable=True),
+        sa.Column('total_tokens', sa.Integer(), nullable=True),
+        sa.Column('cost_usd', sa.Float(), nullable=True),
+        sa.Column('success', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('usage_id')
+    )
+    op.create_index('ix_llm_usage_created_at', 'llm_usage', ['created_at'], unique=False)
+    op.create_index('ix_llm_usage_agent_created_at', 'llm_usage', ['agent', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_llm_usage_agent_created_at', table_name='llm_usage')
+    op.drop_index('ix_llm_usage_created_at', table_name='llm_usage')
+    op.drop_table('llm_usage')
@@ -1,4 +1,4 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 from app.core.event_bus import event_bus, Event, EventType
 
 class AcademicAgent(BaseAgent):
@@ -6,12 +6,15 @@ class AcademicAgent(BaseAgent):
     Academic Operations Agent
     Handles attendance, timetables, workload, CO-PO, lesson planning.
     """
-    def __init__(self, db=None):
-        super().__init__("Academic Agent", "academic", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Academic Agent", "academic", db, **services)
+
+    def _is_attendance_marking(self, query: str) -> bool:
+        return "mark attendance" in query.lower() or "absent" in query.lower()
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
         # Detect Intent (Basic Keyword Match for POC)
-        if "mark attendance" in query.lower() or "absent" in query.lower():
+        if self._is_attendance_marking(query):
             # Mock extracting student ID
             student_id = "21CS042" # Mock
             status = "ABSENT"
@@ -23,9 +26,20 @@ class AcademicAgent(BaseAgent):
             )
 
         # Default RAG Flow
-        rag_context = self.knowledge_service.search(query + " academic syllabus curriculum faculty workload attendance")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
 
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " academic syllabus curriculum faculty workload attendance", context, include_history=False)
+
+    async def stream_request(self, query: str, context: dict = None):
+        if self._is_attendance_marking(query):
+            for frame in self.llm_service.frames_from_response(await self.process_request(query, context)):
+                yield frame
+            return
+        async for frame in super().stream_request(query, context):
+            yield frame
+
     async def mark_attendance(self, student_id: str, status: str):
         print(f"📝 Marking Attendance: {student_id} -> {status}")
         # Logic to save to DB would go here
@@ -3,7 +3,7 @@ from .base_agent import BaseAgent
 from ..tools.database_tools import DatabaseTools
 from ..tools.calculation_tools import CalculationTools
 from ..tools.document_tools import DocumentTools
-import json
+from ..services.shortage_letters import generate_shortage_letters
 
 class AcademicAgent(BaseAgent):
     """Academic Operations Agent using FREE Grok model."""
@@ -121,40 +121,17 @@ ALWAYS:
         if context and context.get("conversation_history"):
             messages = context["conversation_history"] + messages
         
-        # Call LLM
-        response = await self._call_llm(messages, tools=self.tools)
-        
-        actions_taken = []
+        # Tool rounds until the model answers (tool calls within a round run concurrently)
+        text_response, actions_taken, usage = await self._run_tool_loop(messages)
         documents_generated = []
         
-        # Check if the model wants to call a tool
-        if response.tool_calls:
-            tool_results = await self._execute_tool_calls(response.tool_calls)
-            
-            # Add results to conversation
-            messages.append(response) # Add the assistant's tool call message
-            
-            for result in tool_results:
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": result["tool_call_id"],
-                    "content": json.dumps(result["result"])
-                })
-                actions_taken.append(result)
-            
-            # Get final response after tools
-            # Note: Need to provide tools again if we want it to potentially call more, but usually one round is enough
-            final_response = await self._call_llm(messages)
-            text_response = final_response.content
-        else:
-            text_response = response.content
-        
         return {
             "response": text_response,
             "actions_taken": actions_taken,
             "documents_generated": documents_generated,
             "metadata": {
-                "cost": 0.0
+                "cost": 0.0,
+                **usage
             }
         }
     
@@ -170,15 +147,10 @@ ALWAYS:
                     course_id=tool_args["course_id"], threshold=threshold
                 )
             elif tool_name == "generate_shortage_letters":
-                letters = []
-                for student_id in tool_args["student_ids"]:
-                    student_data = await self.db_tools.get_student_data(student_id)
-                    course_data = await self.db_tools.get_course_data(tool_args["course_id"])
-                    letter_url = await self.doc_tools.generate_attendance_shortage_letter(
-                        student_data=student_data, course_data=course_data
-                    )
-                    letters.append(letter_url)
-                return {"status": "success", "letters_generated": len(letters), "letter_urls": letters}
+                # Bulk path: one IN query for the students, one course lookup, concurrent rendering
+                return await generate_shortage_letters(
+                    tool_args["student_ids"], tool_args["course_id"], db_tools=self.db_tools, doc_tools=self.doc_tools
+                )
             else:
                 return {"error": f"Unknown tool: {tool_name}"}
         except Exception as e:
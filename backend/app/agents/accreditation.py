@@ -1,32 +1,67 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 import json
-from app.services.llm_service import LLMService
+from app.services.sar_batch import SARBatchGenerator, NBA_SAR_SECTIONS
 
 class AccreditationManagerAgent(BaseAgent):
-    def __init__(self, db=None):
-        super().__init__("Accreditation Manager", "accreditation_manager", db)
-        self.llm_service = LLMService()
+    def __init__(self, db=None, **services):
+        super().__init__("Accreditation Manager", "accreditation_manager", db, **services)
+        self.sar_generator = SARBatchGenerator(self.llm_service)
+
+    def _is_sar_request(self, query: str) -> bool:
+        return "sar" in query.lower() and "generate" in query.lower()
+
+    def _sar_jobs(self):
+        # Mock data for SAR generation
+        program_data = {
+            "program_name": "B.Tech Computer Science",
+            "academic_year": "2024-25",
+            "strengths": "Strong Industry Connect, High Placement",
+            "weaknesses": "Research Funding",
+            "faculty_count": 25,
+            "placement_rate": 85
+        }
+        return [(title, program_data) for title in NBA_SAR_SECTIONS]
+
+    def _queue_sar(self) -> AgentResponse:
+        # 26 sections at background priority take minutes: far past the chat
+        # deadline. Run them as a detached job and hand back its id.
+        jobs = self._sar_jobs()
+        running = self.sar_generator.is_running(self.sar_generator.run_id_for(jobs))
+        run_id = self.sar_generator.start(jobs)
+        status_url = f"/api/v1/accreditation/reports/generate-sar/batch/{run_id}"
+        return AgentResponse(
+            content=(f"**SAR generation {'already in progress' if running else 'started'}**: {len(jobs)} NBA SAR sections "
+                     f"are being generated in the background (run `{run_id}`). Completed sections are saved as they finish; "
+                     f"check progress at `{status_url}`."),
+            agent_name=self.name,
+            success=True,
+            metadata={"sar_run_id": run_id, "sar_status_url": status_url}
+        )
+
+    def _is_tool_request(self, query: str) -> bool:
+        q = query.lower()
+        return ("sar" in q and "generate" in q) or ("gap" in q and "analysis" in q)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return PromptContext()
+
+    async def stream_request(self, query: str, context: dict = None):
+        if self._is_sar_request(query):
+            response = self._queue_sar()
+            yield {"type": "final", "response": response.model_dump(mode="json"), "replace": True}
+            return
+        if self._is_tool_request(query):
+            for frame in self.llm_service.frames_from_response(await self.process_request(query, context)):
+                yield frame
+            return
+        async for frame in super().stream_request(query, context):
+            yield frame
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
         # 1. Check for specific tool invocations based on intent
-        if "sar" in query.lower() and "generate" in query.lower():
-            # Mock data for SAR generation
-            program_data = {
-                "program_name": "B.Tech Computer Science",
-                "academic_year": "2024-25",
-                "strengths": "Strong Industry Connect, High Placement",
-                "weaknesses": "Research Funding",
-                "faculty_count": 25,
-                "placement_rate": 85
-            }
-            narrative = await self.llm_service.generate_sar_narrative("Executive Summary", program_data)
-            
-            return AgentResponse(
-                content=narrative,
-                agent_name=self.name,
-                success=True,
-                documents_generated=[{"filename": "SAR_Executive_Summary.md", "path": "/api/v1/documents/download?file=SAR.md", "type": "markdown"}]
-            )
+        if self._is_sar_request(query):
+            # Full NBA SAR: all criteria sections, generated concurrently in the background
+            return self._queue_sar()
 
         if "gap" in query.lower() and "analysis" in query.lower():
             # Mock PO attainment
@@ -1,13 +1,16 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 
 class AdministrativeAgent(BaseAgent):
     """
     Administrative Agent
     Handles HR, Admin, Leave, Meetings.
     """
-    def __init__(self, db=None):
-        super().__init__("Administrative Agent", "administrative", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Administrative Agent", "administrative", db, **services)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " admin hr leave meeting circular file staff", context, include_history=False)
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        rag_context = self.knowledge_service.search(query + " admin hr leave meeting circular file staff")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
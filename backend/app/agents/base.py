@@ -1,20 +1,35 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from app.services.llm_service import LLMService
 from app.services.knowledge_service import KnowledgeService
+from app.services.prompt_budget import PromptContext, split_history
+from app.core.config import settings
 from app.schemas.agent_schema import AgentResponse
 from app.core.event_bus import event_bus, Event, EventType
+from app.core.request_context import current_db
 
 class BaseAgent:
-    def __init__(self, name: str, role: str, db: AsyncSession = None):
+    """
+    Agents are built once per worker (see app.agents.pool) and shared by all
+    requests, so they must not keep per-request state on the instance:
+    per-request data travels in the `context` argument, and the request's DB
+    session is read from a contextvar through `self.db`.
+    """
+    def __init__(self, name: str, role: str, db: AsyncSession = None,
+                 llm_service: Optional[LLMService] = None, knowledge_service: Optional[KnowledgeService] = None):
         self.name = name
         self.role = role
-        self.db = db
-        self.context: Dict[str, Any] = {}
-        # Initialize Services
-        self.llm_service = LLMService()
-        self.knowledge_service = KnowledgeService()
+        self._db = db
+        # Shared services when provided (agent pool); standalone agents build their own
+        self.llm_service = llm_service or LLMService()
+        self.knowledge_service = knowledge_service or KnowledgeService()
+        self.llm_service.semantic_cache.set_embedding_function(self.knowledge_service.embed)
+
+    @property
+    def db(self) -> Optional[AsyncSession]:
+        """The current request's session (bind_db), else the one given at construction."""
+        return current_db() or self._db
 
     async def process_request(self, query: str, context: Dict[str, Any] = None) -> AgentResponse:
         """
@@ -29,12 +44,7 @@ class BaseAgent:
             return await self.llm_service.get_response(self.name, query, "", force_mock=True)
 
         # Default RAG implementation if not overridden
-        rag_context = self.knowledge_service.search(query)
-        
-        # Merge passed context (history)
-        history_text = context.get('history', '') if context else ''
-        
-        full_context = f"{rag_context}\n\n[Recent Conversation History]:\n{history_text}"
+        full_context = self.build_context(query, context)
         
         response = await self.llm_service.get_response(self.name, query, full_context, force_mock=mock_mode)
         
@@ -51,13 +61,33 @@ class BaseAgent:
         
         return response
 
+    def build_context(self, query: str, context: Dict[str, Any] = None) -> PromptContext:
+        """RAG results plus recent conversation history, as passed to the LLM."""
+        return self.prompt_context(query, context)
+
+    def prompt_context(self, search_query: str, context: Dict[str, Any] = None, include_history: bool = True) -> PromptContext:
+        """
+        Scored RAG sections (and optionally the conversation history) for the
+        LLM. Nothing is trimmed here; LLMService fits it to the role's token budget.
+        """
+        chunks = self.knowledge_service.search_chunks(search_query, limit=settings.LLM_RAG_CHUNKS)
+        history = split_history(context.get('history')) if (context and include_history) else []
+        return PromptContext(chunks=chunks, history=history)
+
+    async def stream_request(self, query: str, context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of process_request: yields LLMService.stream_response frames.
+        Agents with tool-style intents override this to answer those in one final frame.
+        """
+        mock_mode = context.get('mock_mode', False) if context else False
+        full_context = "" if mock_mode else self.build_context(query, context)
+        async for frame in self.llm_service.stream_response(self.name, query, full_context, force_mock=mock_mode):
+            yield frame
+
     async def execute_tool(self, tool_name: str, **kwargs) -> Any:
         # Wrapper for executing tools with logging/error handling.
         pass
 
-    def update_context(self, key: str, value: Any):
-        self.context[key] = value
-
     async def proactive_briefing(self) -> AgentResponse:
         # Generates a proactive briefing (e.g., on login).
         # Default implementation uses LLM to generate a generic greeting structure
@@ -1,7 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from ..core.openrouter_client import openrouter_client
+from ..core.config import settings
+from ..core.deadline import cap as deadline_cap, DeadlineExceeded
+from ..core.metrics import metrics
+from ..tools.memo import ToolMemo, tool_memo
+import asyncio
 import json
+import time
+
+_tool_calls = metrics.counter("agent_tool_calls_total", "Tool calls by tool and outcome (ok/error/timeout)")
+_tool_seconds = metrics.histogram("agent_tool_seconds", "Tool execution time", buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60))
+_tool_rounds = metrics.histogram("agent_tool_rounds", "Tool-calling rounds per agent turn", buckets=(0, 1, 2, 3, 4, 6, 8))
 
 class BaseAgent(ABC):
     """Abstract base class for all specialized agents using FREE Grok via OpenRouter."""
@@ -39,7 +49,15 @@ class BaseAgent(ABC):
                     "requires_escalation": True
                 }
             
-            result = await self._execute_agent_logic(user_query, context)
+            # Tool lookups are memoized for the turn (or the whole request, if the API started a memo)
+            memo = tool_memo.get()
+            token = tool_memo.set(ToolMemo()) if memo is None else None
+            try:
+                result = await self._execute_agent_logic(user_query, context)
+                tool_cache = tool_memo.get().stats()
+            finally:
+                if token is not None:
+                    tool_memo.reset(token)
             
             return {
                 "success": True,
@@ -48,7 +66,7 @@ class BaseAgent(ABC):
                 "actions_taken": result.get("actions_taken", []),
                 "documents_generated": result.get("documents_generated", []),
                 "requires_approval": result.get("requires_approval", False),
-                "metadata": result.get("metadata", {}),
+                "metadata": {**result.get("metadata", {}), "tool_cache": tool_cache},
                 "model_used": "google/gemini-2.5-flash"
             }
             
@@ -66,51 +84,122 @@ class BaseAgent(ABC):
         """Check if user role has permission. Override in subclasses if strict permissioning needed."""
         return True
     
-    async def _call_llm(
+    async def _complete(
         self,
-        messages: List[Dict[str, str]],
+        messages: List[Dict[str, Any]],
         tools: Optional[List[Dict]] = None
-    ) -> Dict[str, Any]:
-        """Call FREE Grok model via OpenRouter."""
+    ):
+        """One chat completion (the full object, so callers can read usage)."""
         try:
-            completion = await self.llm_client.chat.completions.create(
+            return await self.llm_client.chat.completions.create(
                 model="google/gemini-2.5-flash",
                 messages=[{"role": "system", "content": self.system_prompt}] + messages,
                 tools=tools,
                 tool_choice="auto" if tools else None,
                 temperature=0.7
             )
-            return completion.choices[0].message
         except Exception as e:
             # Fallback or error handling
             print(f"LLM Call Error: {e}")
             raise e
-    
+
+    async def _call_llm(
+        self,
+        messages: List[Dict[str, str]],
+        tools: Optional[List[Dict]] = None
+    ) -> Dict[str, Any]:
+        """Call FREE Grok model via OpenRouter."""
+        completion = await self._complete(messages, tools)
+        return completion.choices[0].message
+
+    async def _run_tool_loop(self, messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict], Dict[str, Any]]:
+        """
+        Lets the model call tools until it answers in text, for at most
+        AGENT_MAX_TOOL_ROUNDS rounds and AGENT_TOOL_TOKEN_BUDGET total tokens.
+        The tool calls of one round run concurrently (_execute_tool_calls).
+        When a limit is reached the model is asked once more without tools,
+        so the turn always ends with an answer.
+        Returns (text, actions_taken, usage).
+        """
+        rounds, tokens = 0, 0
+        actions_taken: List[Dict] = []
+        while True:
+            within_budget = rounds < settings.AGENT_MAX_TOOL_ROUNDS and tokens < settings.AGENT_TOOL_TOKEN_BUDGET
+            completion = await self._complete(messages, tools=self.tools if within_budget else None)
+            tokens += getattr(completion.usage, "total_tokens", 0) or 0
+            message = completion.choices[0].message
+            if not message.tool_calls or not within_budget:
+                break
+
+            rounds += 1
+            tool_results = await self._execute_tool_calls(message.tool_calls)
+            # The assistant's tool call message, then one tool message per call
+            messages.append(message.model_dump(exclude_none=True))
+            for result in tool_results:
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": result["tool_call_id"],
+                    "content": json.dumps(result["result"] if result["success"] else {"error": result["error"]}, default=str)
+                })
+                actions_taken.append({**result, "round": rounds})
+
+        _tool_rounds.observe(rounds, agent=self.agent_name)
+        usage = {"tool_rounds": rounds, "total_tokens": tokens, "stopped_by_limit": not within_budget}
+        return message.content or "", actions_taken, usage
+
+    def _tool_timeout(self, tool_name: str) -> float:
+        return settings.AGENT_TOOL_TIMEOUTS.get(tool_name, settings.AGENT_TOOL_TIMEOUT)
+
     async def _execute_tool_calls(self, tool_calls: List[Any]) -> List[Dict]:
-        """Execute tool calls and return results."""
-        results = []
-        for tool_call in tool_calls:
+        """
+        Execute tool calls and return results (in call order).
+        Calls from one model turn are independent, so they run concurrently,
+        at most AGENT_TOOL_CONCURRENCY at a time. Each call has its own timeout
+        (AGENT_TOOL_TIMEOUTS / AGENT_TOOL_TIMEOUT, capped by the request
+        deadline) and is cancelled when it expires; a failure or timeout only
+        affects that call's result. Each result carries latency_ms.
+        """
+        semaphore = asyncio.Semaphore(settings.AGENT_TOOL_CONCURRENCY)
+        return list(await asyncio.gather(*(self._run_tool_call(tool_call, semaphore) for tool_call in tool_calls)))
+
+    async def _run_tool_call(self, tool_call: Any, semaphore: asyncio.Semaphore) -> Dict:
+        func_name = getattr(tool_call.function, 'name', 'unknown')
+        async with semaphore:
+            start = time.perf_counter()
+            outcome = "ok"
             try:
                 # Handle OpenAI tool call object
-                func_name = tool_call.function.name
-                func_args = json.loads(tool_call.function.arguments)
-                
-                result = await self._execute_tool(func_name, func_args)
-                
-                results.append({
+                func_args = json.loads(tool_call.function.arguments or "{}")
+                timeout = deadline_cap(self._tool_timeout(func_name))
+                result = await asyncio.wait_for(self._execute_tool(func_name, func_args), timeout=timeout)
+                return {
                     "tool_call_id": tool_call.id,
                     "function_name": func_name,
                     "result": result,
-                    "success": True
-                })
+                    "success": True,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+                }
+            except (asyncio.TimeoutError, DeadlineExceeded):
+                outcome = "timeout"
+                return {
+                    "tool_call_id": tool_call.id,
+                    "function_name": func_name,
+                    "error": f"Tool '{func_name}' timed out",
+                    "success": False,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+                }
             except Exception as e:
-                results.append({
+                outcome = "error"
+                return {
                     "tool_call_id": tool_call.id,
-                    "function_name": getattr(tool_call.function, 'name', 'unknown'),
+                    "function_name": func_name,
                     "error": str(e),
-                    "success": False
-                })
-        return results
+                    "success": False,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+                }
+            finally:
+                _tool_calls.inc(tool=func_name, outcome=outcome)
+                _tool_seconds.observe(time.perf_counter() - start, tool=func_name)
     
     @abstractmethod
     async def _execute_tool(self, tool_name: str, tool_args: Dict) -> Any:
@@ -1,13 +1,16 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 
 class ComplianceAgent(BaseAgent):
     """
     Compliance Agent
     Handles AICTE, NIRF, AISHE, Regulations.
     """
-    def __init__(self, db=None):
-        super().__init__("Compliance Agent", "compliance", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Compliance Agent", "compliance", db, **services)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " compliance aicte nirf aishe regulation approval mandatory", context, include_history=False)
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        rag_context = self.knowledge_service.search(query + " compliance aicte nirf aishe regulation approval mandatory")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
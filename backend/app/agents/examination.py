@@ -1,13 +1,16 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 
 class ExaminationAgent(BaseAgent):
     """
     Examination Agent
     Handles exams, results, certificates, hall tickets.
     """
-    def __init__(self, db=None):
-        super().__init__("Examination Agent", "examination", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Examination Agent", "examination", db, **services)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " exam schedule result grade rules evaluation", context, include_history=False)
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        rag_context = self.knowledge_service.search(query + " exam schedule result grade rules evaluation")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
@@ -0,0 +1,132 @@
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import time
+from app.agents.base import BaseAgent
+from app.core.config import settings
+from app.core.deadline import cap as deadline_cap, DeadlineExceeded
+from app.core.metrics import metrics
+from app.schemas.agent_schema import AgentResponse
+
+_fanout_agents = metrics.counter("orchestrator_fanout_agents_total", "Agents run in fan-out mode by outcome (ok/error/timeout)")
+_fanout_seconds = metrics.histogram("orchestrator_fanout_seconds", "Wall time of one fan-out (slowest agent that made it)")
+
+# Per-agent LLM metadata kept in the merged response's "sources"
+SOURCE_METADATA = ("provider", "model", "tier", "cache_status", "cost_usd")
+
+
+def fanout_candidates(scores: Dict[str, int]) -> List[str]:
+    """
+    Agents whose keyword score reaches both ORCHESTRATOR_FANOUT_MIN_SCORE and
+    ORCHESTRATOR_FANOUT_RELATIVE_SCORE times the top score, best first, at most
+    ORCHESTRATOR_FANOUT_MAX_AGENTS. A single incidental keyword hit next to a
+    clearly dominant domain does not count. Fewer than two means the query is
+    single-domain.
+    """
+    if not settings.ORCHESTRATOR_FANOUT_ENABLED or not scores:
+        return []
+    threshold = max(settings.ORCHESTRATOR_FANOUT_MIN_SCORE,
+                    settings.ORCHESTRATOR_FANOUT_RELATIVE_SCORE * max(scores.values()))
+    ranked = sorted(
+        (agent for agent, score in scores.items() if score >= threshold),
+        key=lambda agent: scores[agent], reverse=True
+    )
+    return ranked[:settings.ORCHESTRATOR_FANOUT_MAX_AGENTS]
+
+
+async def fan_out(agents: Dict[str, BaseAgent], query: str, context: Optional[dict]) -> AgentResponse:
+    """
+    Runs every agent concurrently under one budget (ORCHESTRATOR_FANOUT_TIMEOUT,
+    capped by the request deadline) and merges what came back in time.
+    Agents still running at the budget are cancelled and listed as timed out;
+    errors are dropped from the merge, not raised.
+    """
+    start = time.perf_counter()
+    try:
+        budget = deadline_cap(settings.ORCHESTRATOR_FANOUT_TIMEOUT)
+    except DeadlineExceeded:
+        budget = 0.0
+
+    timings: Dict[str, Dict[str, Any]] = {}
+
+    async def run(key: str, agent: BaseAgent) -> Tuple[str, AgentResponse]:
+        agent_start = time.perf_counter()
+        try:
+            return key, await agent.process_request(query, context)
+        finally:
+            timings[key] = {"seconds": round(time.perf_counter() - agent_start, 3)}
+
+    tasks = {asyncio.create_task(run(key, agent)): key for key, agent in agents.items()}
+    done, pending = await asyncio.wait(tasks, timeout=budget) if budget > 0 else (set(), set(tasks))
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    responses: List[Tuple[str, AgentResponse]] = []
+    for task, key in tasks.items():
+        if task in pending:
+            timings[key] = {"seconds": round(time.perf_counter() - start, 3), "status": "timeout"}
+        elif task.exception() is not None:
+            timings[key]["status"] = "error"
+            timings[key]["error"] = str(task.exception())
+            print(f"⚠️ Fan-out: {key} failed: {task.exception()}")
+        else:
+            responses.append(task.result())
+            timings[key]["status"] = "ok" if task.result()[1].success else "failed"
+        _fanout_agents.inc(agent=key, outcome=timings[key]["status"])
+    _fanout_seconds.observe(time.perf_counter() - start)
+
+    merged = merge_responses([(agents[key].name, response) for key, response in responses])
+    merged.processing_time = round(time.perf_counter() - start, 3)
+    merged.metadata["fanout"] = {"budget_seconds": round(budget, 3), "agents": timings}
+    return merged
+
+
+def merge_responses(responses: List[Tuple[str, AgentResponse]]) -> AgentResponse:
+    """
+    One AgentResponse from several agents' answers: content as one section
+    per agent, action items and visualizations deduplicated (by label/type
+    and type/title), everything else concatenated.
+    """
+    if not responses:
+        return AgentResponse(
+            content="**No Answer in Time**: None of the agents for this request finished in time. Please try again or narrow the request.",
+            success=False,
+            error_message="All fan-out agents failed or timed out",
+            agent_name="Orchestrator"
+        )
+    if len(responses) == 1:
+        return responses[0][1].model_copy(deep=True)
+
+    merged = AgentResponse(
+        content="\n\n".join(f"**{name}**: {response.content}" for name, response in responses),
+        agent_name=" + ".join(name for name, _ in responses),
+        success=any(response.success for _, response in responses)
+    )
+    seen_actions, seen_charts = set(), set()
+    for _, response in responses:
+        for item in response.action_items:
+            key = (item.label.strip().lower(), item.action_type)
+            if key not in seen_actions:
+                seen_actions.add(key)
+                merged.action_items.append(item)
+        for chart in response.visualizations:
+            key = (chart.type, chart.title.strip().lower())
+            if key not in seen_charts:
+                seen_charts.add(key)
+                merged.visualizations.append(chart)
+        merged.components.extend(response.components)
+        merged.documents_generated.extend(response.documents_generated)
+        merged.notifications.extend(response.notifications)
+        if response.requires_approval:
+            merged.requires_approval = True
+            merged.approval_from = merged.approval_from or response.approval_from
+    errors = [response.error_message for _, response in responses if response.error_message]
+    if errors and not merged.success:
+        merged.error_message = "; ".join(errors)
+    merged.metadata["sources"] = [
+        {"agent": name, **{k: v for k, v in response.metadata.items() if k in SOURCE_METADATA}}
+        for name, response in responses
+    ]
+    merged.metadata["cost_usd"] = round(sum(response.metadata.get("cost_usd", 0.0) for _, response in responses), 6)
+    return merged
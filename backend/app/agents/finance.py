@@ -1,13 +1,16 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 
 class FinanceAgent(BaseAgent):
     """
     Finance Agent
     Handles fees, budget, payments, salaries.
     """
-    def __init__(self, db=None):
-        super().__init__("Finance Agent", "finance", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Finance Agent", "finance", db, **services)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " finance budget fee salary invoice payments", context, include_history=False)
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        rag_context = self.knowledge_service.search(query + " finance budget fee salary invoice payments")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
@@ -8,72 +8,130 @@ from .administrative import AdministrativeAgent
 from .research import ResearchAgent
 from .compliance import ComplianceAgent
 from .accreditation import AccreditationManagerAgent
-from typing import Dict
+from typing import Dict, Optional, Tuple
 from app.core.agent_communication import agent_communicator
+from app.services.llm_routing import intent_scores
+from app.services.intent_router import IntentRouter, RouteDecision
+from app.agents.fanout import fan_out, fanout_candidates
+from app.tools.memo import tool_memo
+from app.services.llm_service import LLMService
+from app.services.knowledge_service import KnowledgeService
 import json
 
 class OrchestratorAgent(BaseAgent):
-    def __init__(self, db=None):
-        super().__init__("Orchestrator", "orchestrator", db)
+    def __init__(self, db=None, llm_service: Optional[LLMService] = None, knowledge_service: Optional[KnowledgeService] = None):
+        super().__init__("Orchestrator", "orchestrator", db, llm_service, knowledge_service)
+        # One LLMService (Redis client, breakers, caches) and one KnowledgeService
+        # (Chroma client, embedder) shared by the whole agent tree
+        services = {"llm_service": self.llm_service, "knowledge_service": self.knowledge_service}
         self.agents: Dict[str, BaseAgent] = {
-            "academic": AcademicAgent(db),
-            "examination": ExaminationAgent(db),
-            "finance": FinanceAgent(db),
-            "quality": QualityAssuranceAgent(db),
-            "student_services": StudentServicesAgent(db),
-            "administrative": AdministrativeAgent(db),
-            "research": ResearchAgent(db),
-            "compliance": ComplianceAgent(db),
-            "accreditation_manager": AccreditationManagerAgent(db)
+            "academic": AcademicAgent(db, **services),
+            "examination": ExaminationAgent(db, **services),
+            "finance": FinanceAgent(db, **services),
+            "quality": QualityAssuranceAgent(db, **services),
+            "student_services": StudentServicesAgent(db, **services),
+            "administrative": AdministrativeAgent(db, **services),
+            "research": ResearchAgent(db, **services),
+            "compliance": ComplianceAgent(db, **services),
+            "accreditation_manager": AccreditationManagerAgent(db, **services)
         }
         
+        self.router = IntentRouter(self.INTENT_MAP)
+        self.router.set_embedding_function(self.knowledge_service.embed)
+
         # Register Agents for Inter-Communication
         agent_communicator.register_agent("orchestrator", self)
         for name, agent in self.agents.items():
             agent_communicator.register_agent(name, agent)
 
-    async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        query_lower = query.lower()
+    # Intent Keywords
+    INTENT_MAP = {
+        "academic": ["attendance", "timetable", "workload", "faculty", "course", "lesson", "co-po", "curriculum", "syllabus", "teaching"],
+        "examination": ["exam", "result", "grade", "marks", "hall ticket", "certificate", "question paper"],
+        "finance": ["fee", "budget", "payment", "salary", "invoice", "purchase"],
+        "quality": ["naac", "nba", "aqar", "accreditation", "iqac", "attainment"],
+        "student_services": ["placement", "internship", "hostel", "scholarship", "grievance", "club"],
+        "administrative": ["leave", "hr", "meeting", "circular", "file", "staff"],
+        "research": ["research", "publication", "patent", "project", "phd", "grant"],
+        "compliance": ["aicte", "nirf", "aishe", "compliance", "regulation", "mandatory"],
+        "accreditation_manager": ["washington accord", "mbgl", "digital audit", "sar", "po gap", "program outcome"]
+    }
+
+    async def _route(self, query: str, context: dict = None) -> Tuple[Optional[BaseAgent], RouteDecision]:
+        """Picks the specialised agent for a query, or None for the Orchestrator's own RAG fallback."""
         role_id = context.get('role_id', 'orchestrator') if context else 'orchestrator'
         
         # 0. DIRECT ROLE ROUTING
         # If the user is specifically the Accreditation Manager, default to that agent
         if role_id == "accreditation_manager":
-            return await self.agents["accreditation_manager"].process_request(query, context)
+            return self.agents["accreditation_manager"], RouteDecision("accreditation_manager", 1.0, "role")
 
-        # Intent Keywords
-        intent_map = {
-            "academic": ["attendance", "timetable", "workload", "faculty", "course", "lesson", "co-po", "curriculum", "syllabus", "teaching"],
-            "examination": ["exam", "result", "grade", "marks", "hall ticket", "certificate", "question paper"],
-            "finance": ["fee", "budget", "payment", "salary", "invoice", "purchase"],
-            "quality": ["naac", "nba", "aqar", "accreditation", "iqac", "attainment"],
-            "student_services": ["placement", "internship", "hostel", "scholarship", "grievance", "club"],
-            "administrative": ["leave", "hr", "meeting", "circular", "file", "staff"],
-            "research": ["research", "publication", "patent", "project", "phd", "grant"],
-            "compliance": ["aicte", "nirf", "aishe", "compliance", "regulation", "mandatory"],
-            "accreditation_manager": ["washington accord", "mbgl", "digital audit", "sar", "po gap", "program outcome"]
-        }
+        decision = await self.router.route(query)
+        intent_scores.set(decision.scores)
+        if decision.agent:
+            print(f"🧭 Routed to {decision.agent} via {decision.source} (confidence {decision.confidence:.2f})")
+        return (self.agents.get(decision.agent) if decision.agent else None), decision
 
-        # Determine target agent by keyword score
-        scores = {agent: sum(1 for kw in kws if kw in query_lower) for agent, kws in intent_map.items()}
-        best_agent = max(scores, key=scores.get)
-        
-        target_agent = None
-        if scores[best_agent] > 0:
-            target_agent = self.agents.get(best_agent)
+    @staticmethod
+    def _annotate(metadata: dict, decision: RouteDecision):
+        """Routing decision and, if any tool lookups ran, the request's tool cache hit rates."""
+        metadata["routing"] = decision.as_dict()
+        memo = tool_memo.get()
+        if memo is not None and memo.lookups:
+            metadata["tool_cache"] = memo.stats()
+
+    def _fanout_agents(self, decision: RouteDecision) -> Dict[str, BaseAgent]:
+        """Agents for a multi-domain query (empty unless two or more qualify)."""
+        if decision.source != "keyword":
+            return {}
+        keys = fanout_candidates(decision.scores)
+        return {key: self.agents[key] for key in keys} if len(keys) > 1 else {}
 
+    async def process_request(self, query: str, context: dict = None) -> AgentResponse:
+        target_agent, decision = await self._route(query, context)
+        fanout = self._fanout_agents(decision)
+        if fanout:
+            print(f"🔀 Fan-out to {', '.join(fanout)} for '{query[:60]}'")
+            response = await fan_out(fanout, query, context)
+            self._annotate(response.metadata, decision)
+            return response
         if target_agent:
-            return await target_agent.process_request(query, context)
+            response = await target_agent.process_request(query, context)
+            self._annotate(response.metadata, decision)
+            return response
 
         # Fallback to Orchestrator RAG
         mock_mode = context.get('mock_mode', False) if context else False
         
         if mock_mode:
              print(f"🚀 MOCK MODE: Skipping RAG for Orchestrator...")
-             return await self.llm_service.get_response(self.name, query, "", force_mock=True)
+             response = await self.llm_service.get_response(self.name, query, "", force_mock=True)
+        else:
+            rag_context = self.build_context(query, context)
+            response = await self.llm_service.get_response(self.name, query, rag_context, force_mock=False)
+        self._annotate(response.metadata, decision)
+        return response
 
-        rag_context = self.knowledge_service.search(query)
-        return await self.llm_service.get_response(self.name, query, rag_context, force_mock=False)
+    async def stream_request(self, query: str, context: dict = None):
+        target_agent, decision = await self._route(query, context)
+        fanout = self._fanout_agents(decision)
+        if fanout:
+            # Agents run to completion concurrently; the merged answer is sent as whole frames
+            response = await fan_out(fanout, query, context)
+            self._annotate(response.metadata, decision)
+            for frame in self.llm_service.frames_from_response(response):
+                yield frame
+            return
+        if target_agent:
+            frames = target_agent.stream_request(query, context)
+        else:
+            mock_mode = context.get('mock_mode', False) if context else False
+            rag_context = "" if mock_mode else self.build_context(query, context)
+            frames = self.llm_service.stream_response(self.name, query, rag_context, force_mock=mock_mode)
+        async for frame in frames:
+            if frame.get("type") == "final":
+                self._annotate(frame["response"].setdefault("metadata", {}), decision)
+            yield frame
 
     async def proactive_briefing(self, role_id: str) -> AgentResponse:
         # Simple mapping for briefing
@@ -0,0 +1,58 @@
+from typing import Optional
+import asyncio
+import time
+from app.agents.orchestrator import OrchestratorAgent
+from app.agents.base import BaseAgent
+from app.services.llm_service import LLMService
+from app.services.knowledge_service import KnowledgeService
+
+
+class AgentPool:
+    """
+    App-scoped agents and the services they share.
+
+    Building an OrchestratorAgent means ten agents, an LLMService (Redis
+    client, circuit breakers, caches) and a KnowledgeService (Chroma client,
+    embedder, upsert of every KB file). That is done once in the FastAPI
+    lifespan; requests only bind their DB session (app.core.request_context)
+    and reuse the instances. Agents keep no per-request state, so concurrent
+    requests can share them.
+    """
+    def __init__(self):
+        self._orchestrator: Optional[OrchestratorAgent] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """Called from the FastAPI lifespan on startup."""
+        async with self._lock:
+            if self._orchestrator is not None:
+                return
+            start = time.perf_counter()
+            llm_service = LLMService()
+            # Opening Chroma and indexing the KB is blocking disk/CPU work
+            knowledge_service = await asyncio.to_thread(KnowledgeService)
+            self._orchestrator = OrchestratorAgent(llm_service=llm_service, knowledge_service=knowledge_service)
+            await self._orchestrator.router.warm()
+            print(f"✅ Agent pool ready: {len(self._orchestrator.agents) + 1} agents in {time.perf_counter() - start:.2f}s.")
+
+    @property
+    def orchestrator(self) -> OrchestratorAgent:
+        # Built on first use outside the FastAPI lifespan (Celery, scripts)
+        if self._orchestrator is None:
+            self._orchestrator = OrchestratorAgent()
+        return self._orchestrator
+
+    @property
+    def llm_service(self) -> LLMService:
+        return self.orchestrator.llm_service
+
+    @property
+    def knowledge_service(self) -> KnowledgeService:
+        return self.orchestrator.knowledge_service
+
+    def agent(self, name: str) -> BaseAgent:
+        """A specialised agent by key (e.g. 'accreditation_manager')."""
+        return self.orchestrator.agents[name]
+
+# Global Instance
+agent_pool = AgentPool()
@@ -1,13 +1,16 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 
 class QualityAssuranceAgent(BaseAgent):
     """
     Quality Assurance Agent
     Handles NAAC, NBA, AQAR, Accreditation.
     """
-    def __init__(self, db=None):
-        super().__init__("Quality Assurance Agent", "quality", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Quality Assurance Agent", "quality", db, **services)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " naac nba aqar accreditation iqac criteria", context, include_history=False)
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        rag_context = self.knowledge_service.search(query + " naac nba aqar accreditation iqac criteria")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
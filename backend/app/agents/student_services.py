@@ -1,13 +1,16 @@
-from .base import BaseAgent, AgentResponse
+from .base import BaseAgent, AgentResponse, PromptContext
 
 class StudentServicesAgent(BaseAgent):
     """
     Student Services Agent
     Handles placements, internships, hostels, scholarships.
     """
-    def __init__(self, db=None):
-        super().__init__("Student Services Agent", "student_services", db)
+    def __init__(self, db=None, **services):
+        super().__init__("Student Services Agent", "student_services", db, **services)
+
+    def build_context(self, query: str, context: dict = None) -> PromptContext:
+        return self.prompt_context(query + " placement internship hostel scholarship grievance club", context, include_history=False)
 
     async def process_request(self, query: str, context: dict = None) -> AgentResponse:
-        rag_context = self.knowledge_service.search(query + " placement internship hostel scholarship grievance club")
+        rag_context = self.build_context(query, context)
         return await self.llm_service.get_response(self.name, query, rag_context)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import date
+import json
 import random
 from app.core.rbac import rbac, Permission
 from app.models.user import User
@@ -23,6 +25,17 @@ class DigitalAuditRequest(BaseModel):
     entity_id: str
     audit_type: str
 
+class SARSectionJob(BaseModel):
+    section_title: str
+    program_data: Optional[Dict[str, Any]] = None  # defaults to the batch's program_data
+
+class SARBatchRequest(BaseModel):
+    program_data: Dict[str, Any]
+    sections: Optional[List[SARSectionJob]] = None  # defaults to every NBA SAR criterion
+    run_id: Optional[str] = None                    # pass a previous run_id to resume it
+    concurrency: Optional[int] = None               # clamped to SAR_BATCH_MAX_CONCURRENCY
+    background: bool = False                        # queue the run and return its run_id instead of streaming
+
 # --- Endpoints ---
 
 @router.get("/dashboard", dependencies=[Depends(rbac.require_permission(Permission.VIEW_ANALYTICS))])
@@ -71,6 +84,16 @@ async def get_accreditation_dashboard():
 @router.post("/washington-accord/calculate-attainment")
 async def calculate_co_po_attainment(request: POAttainmentRequest):
     """Calculate CO and PO attainment (Mocked)"""
+    # Recalculated attainment makes cached accreditation answers stale
+    try:
+        await event_bus.publish(Event(
+            event_type=EventType.ACCREDITATION_DATA_UPDATED,
+            source_agent="accreditation_agent",
+            payload={"course_code": request.course_code, "academic_year": request.academic_year}
+        ))
+    except Exception as e:
+        print(f"Event bus error: {e}")
+
     # Logic simulating 60% threshold check
     return {
         "course_code": request.course_code,
@@ -129,6 +152,46 @@ async def generate_sar(program_code: str, academic_year: str):
         "download_url": f"/api/v1/documents/download/SAR_{program_code}_Final.pdf"
     }
 
+@router.post("/reports/generate-sar/batch", dependencies=[Depends(rbac.require_permission(Permission.GENERATE_REPORTS))])
+async def generate_sar_batch(request: SARBatchRequest):
+    """
+    Generate many SAR sections concurrently, streamed as NDJSON as each completes.
+    Completed sections are checkpointed; repeating the request (or passing
+    run_id) resumes an interrupted run. With background=true the run is queued
+    and its run_id returned; poll GET /reports/generate-sar/batch/{run_id}.
+    """
+    from app.services.sar_batch import NBA_SAR_SECTIONS
+
+    if request.sections:
+        jobs = [(job.section_title, job.program_data or request.program_data) for job in request.sections]
+    else:
+        jobs = [(title, request.program_data) for title in NBA_SAR_SECTIONS]
+    generator = _sar_generator()
+    run_id = request.run_id or generator.run_id_for(jobs)
+
+    if request.background:
+        generator.start(jobs, run_id=run_id, concurrency=request.concurrency)
+        return {"run_id": run_id, "status": "queued", "status_url": f"/api/v1/accreditation/reports/generate-sar/batch/{run_id}"}
+    if generator.is_running(run_id):
+        raise HTTPException(status_code=409, detail=f"SAR run {run_id} is already in progress; poll its status instead.")
+
+    async def encode():
+        async for event in generator.generate(jobs, run_id=run_id, concurrency=request.concurrency):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(encode(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/reports/generate-sar/batch/{run_id}", dependencies=[Depends(rbac.require_permission(Permission.GENERATE_REPORTS))])
+async def get_sar_batch_status(run_id: str):
+    """Progress of a SAR batch run (sections checkpointed so far)."""
+    return await _sar_generator().status(run_id)
+
+def _sar_generator():
+    # The pooled agent's generator: it wraps the app's shared LLMService (pooled
+    # clients, rate limiter, breakers) and keeps in-memory checkpoints and jobs
+    from app.agents.pool import agent_pool
+    return agent_pool.agent("accreditation_manager").sar_generator
+
 @router.post("/nac/digital-audit-package")
 async def prepare_digital_audit_package(request: DigitalAuditRequest):
     """Prepare digital audit package (Mocked)"""
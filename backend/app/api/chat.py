@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import datetime
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.db_postgres import get_db
-from app.agents.orchestrator import OrchestratorAgent
+from app.core.db_postgres import get_db, AsyncSessionLocal
+from app.agents.pool import agent_pool
+from app.core.request_context import bind_db
+from app.tools.memo import begin_tool_memo
+from app.services.llm_routing import tier_override
+from app.core.config import settings
+from app.core.deadline import set_deadline, remaining
+from app.services.usage_ledger import tag_usage
+
+# Slack after the deadline for the LLM layer's own fallback (mock/error response) to return
+DEADLINE_GRACE_SECONDS = 1.0
 
 router = APIRouter()
 
@@ -16,15 +28,25 @@ class ChatRequest(BaseModel):
     mock_mode: Optional[bool] = False
     context: Optional[dict] = None
 
-from app.services.llm_service import LLMService
+def _deadline_for(default: float, requested: Optional[float]) -> float:
+    """The route's SLA, tightened (never extended) by an X-Request-Timeout header."""
+    if requested and requested > 0:
+        return min(default, requested) if default > 0 else requested
+    return default
 
 @router.post("", response_model=AgentResponse)
-async def chat_message(request: ChatRequest, db: AsyncSession = Depends(get_db)):
-    
+async def chat_message(request: ChatRequest, db: AsyncSession = Depends(get_db),
+                       x_llm_tier: Optional[str] = Header(None, description="Force a model tier: trivial|standard|heavy (testing)"),
+                       x_request_timeout: Optional[float] = Header(None, description="Seconds the client will wait (tightens CHAT_REQUEST_DEADLINE)")):
+    tier_override.set(x_llm_tier)
+    # End-to-end deadline; every LLM call below sizes its timeout to what is left of it
+    set_deadline(_deadline_for(settings.CHAT_REQUEST_DEADLINE, x_request_timeout))
+    tag_usage(user_role=request.role_id)
+
     # 🔥 GLOBAL INTERCEPT: Mock Mode (Bypass Orchestrator/DB)
     if request.mock_mode:
         print(f"🚀 API MOCK INTERCEPT: Skipping ALL Agent Logic for '{request.query}'")
-        llm = LLMService()
+        llm = agent_pool.llm_service
         # Direct call to mock
         return await llm.get_response(
             role=request.role_id,
@@ -33,8 +55,11 @@ async def chat_message(request: ChatRequest, db: AsyncSession = Depends(get_db))
             force_mock=True
         )
 
-    # Instantiate Orchestrator with DB session (or None if DB failed)
-    orchestrator = OrchestratorAgent(db)
+    # Shared orchestrator; this request's DB session (or None if DB failed) travels in a contextvar
+    bind_db(db)
+    # Database tool lookups are shared by every agent answering this request
+    begin_tool_memo()
+    orchestrator = agent_pool.orchestrator
     
     # Process request
     # Process request with global error handling
@@ -44,8 +69,19 @@ async def chat_message(request: ChatRequest, db: AsyncSession = Depends(get_db))
         context = request.context or {}
         context["mock_mode"] = request.mock_mode
 
-        response = await orchestrator.process_request(request.query, {"role_id": request.role_id, **context})
-        return response
+        work = orchestrator.process_request(request.query, {"role_id": request.role_id, **context})
+        left = remaining()
+        if left is None:
+            return await work
+        return await asyncio.wait_for(work, timeout=max(left, 0) + DEADLINE_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        print(f"⏰ Chat request exceeded its deadline: '{request.query[:60]}'")
+        return AgentResponse(
+            content="**Request Timed Out**: The assistant could not finish within the time limit. Please try again or narrow the request.",
+            success=False,
+            error_message="Request deadline exceeded",
+            agent_name="System"
+        )
     except Exception as e:
         print(f"🔥 CRITICAL: Chat Endpoint Error: {str(e)}")
         # Return a graceful error response instead of 500
@@ -55,3 +91,52 @@ async def chat_message(request: ChatRequest, db: AsyncSession = Depends(get_db))
             error_message=str(e),
             agent_name="System"
         )
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, format: str = "ndjson",
+                      x_llm_tier: Optional[str] = Header(None, description="Force a model tier: trivial|standard|heavy (testing)"),
+                      x_request_timeout: Optional[float] = Header(None, description="Seconds the client will wait (tightens CHAT_STREAM_DEADLINE)")):
+    """
+    Streaming variant of chat_message.
+    Emits content tokens and completed action_items/visualizations/components as they
+    arrive, then a final frame holding the full AgentResponse.
+    format=ndjson (default): one JSON object per line. format=sse: text/event-stream.
+    """
+    context = request.context or {}
+    context["mock_mode"] = request.mock_mode
+
+    async def frames():
+        tier_override.set(x_llm_tier)
+        # Started here rather than in the endpoint: the body runs after the response headers are sent
+        set_deadline(_deadline_for(settings.CHAT_STREAM_DEADLINE, x_request_timeout))
+        tag_usage(user_role=request.role_id)
+        try:
+            if request.mock_mode:
+                async for frame in agent_pool.llm_service.stream_response(request.role_id, request.query, "", force_mock=True):
+                    yield frame
+                return
+            # Opened here rather than via Depends(get_db): a yield dependency is closed before the body streams
+            async with AsyncSessionLocal() as db:
+                bind_db(db)
+                begin_tool_memo()
+                async for frame in agent_pool.orchestrator.stream_request(request.query, {"role_id": request.role_id, **context}):
+                    yield frame
+        except Exception as e:
+            print(f"🔥 CRITICAL: Chat Stream Error: {str(e)}")
+            error_response = AgentResponse(
+                content=f"**System Error**: An internal error occurred while processing your request.\n\n`{str(e)}`\n\nPlease check the backend logs.",
+                success=False,
+                error_message=str(e),
+                agent_name="System"
+            )
+            yield {"type": "final", "response": error_response.model_dump(mode="json"), "replace": True}
+
+    async def encode():
+        async for frame in frames():
+            if format == "sse":
+                yield f"event: {frame['type']}\ndata: {json.dumps(frame)}\n\n"
+            else:
+                yield json.dumps(frame) + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(encode(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Dict, Any
 import time
+from app.core.event_bus import event_bus, Event, EventType
 
 router = APIRouter(prefix="/integrations", tags=["integrations"])
 
@@ -12,6 +13,13 @@ MOCK_INTEGRATIONS = [
     { "id": "blackboard", "name": "Blackboard LMS", "type": "LMS", "status": "connected", "lastSync": "5 mins ago" }
 ]
 
+# Domain data each integration brings in; a sync publishes these so cached answers are evicted
+SYNC_EVENTS: Dict[str, List[EventType]] = {
+    "sap": [EventType.BUDGET_UPDATED],
+    "mysql": [EventType.ATTENDANCE_UPDATED, EventType.GRADE_CHANGED],
+    "blackboard": [EventType.GRADE_CHANGED],
+}
+
 @router.get("/")
 async def list_integrations():
     return MOCK_INTEGRATIONS
@@ -22,5 +30,14 @@ async def sync_integration(integration_id: str):
         if integration["id"] == integration_id:
             integration["status"] = "connected"
             integration["lastSync"] = "Just now"
+            for event_type in SYNC_EVENTS.get(integration_id, []):
+                try:
+                    await event_bus.publish(Event(
+                        event_type=event_type,
+                        source_agent="integrations",
+                        payload={"integration_id": integration_id}
+                    ))
+                except Exception as e:
+                    print(f"Event bus error: {e}")
             return {"status": "success", "message": f"Synced {integration_id}"}
     raise HTTPException(status_code=404, detail="Integration not found")
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db_postgres import get_db
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.rbac import rbac, Permission
+from app.core.http_client import http_pool
+from app.services.llm_cache import llm_cache
+from app.services.json_repair import repair_stats
+from app.services.llm_routing import tier_stats
+from app.services.llm_rate_limiter import rate_limiter
+from app.services.llm_timeouts import timeout_stats
+from app.services.prompt_layout import prompt_cache_stats
+from app.agents.pool import agent_pool
+from app.core.agent_communication import agent_communicator
+from app.services.usage_ledger import usage_ledger, aggregate_usage, USAGE_DIMENSIONS, USAGE_BUCKETS
+
+# Operational data (costs per role/template, request chains): admins only
+router = APIRouter(dependencies=[Depends(rbac.require_permission(Permission.VIEW_SYSTEM_METRICS))])
+
+@router.get("")
+async def get_metrics(prefix: str = ""):
+    """In-process metrics for this worker (counters, gauges, histograms)."""
+    return metrics.snapshot(prefix)
+
+@router.get("/http-pool")
+async def get_http_pool_metrics():
+    """Connection pool configuration and saturation per upstream host."""
+    return http_pool.stats()
+
+@router.get("/llm-cache")
+async def get_llm_cache_metrics():
+    """Exact-key (local/Redis) and semantic cache statistics."""
+    return {
+        "exact": llm_cache.stats(),
+        "semantic": metrics.snapshot("llm_semantic_cache")
+    }
+
+@router.get("/llm-json")
+async def get_llm_json_metrics():
+    """JSON parse outcomes and repair rate per model."""
+    return repair_stats()
+
+@router.get("/llm-tiers")
+async def get_llm_tier_metrics():
+    """Requests, latency, tokens and estimated spend per model tier."""
+    return tier_stats()
+
+@router.get("/llm-rate-limits")
+async def get_llm_rate_limit_metrics():
+    """Provider limits, queue depth per bucket/priority, waits, timeouts and 429s."""
+    return rate_limiter.stats()
+
+@router.get("/llm-timeouts")
+async def get_llm_timeout_metrics():
+    """Adaptive timeout per provider/model, chosen timeouts and expiries."""
+    return timeout_stats()
+
+@router.get("/llm-prompt-cache")
+async def get_llm_prompt_cache_metrics():
+    """Provider prompt-cache reads per model (cached share of prompt tokens, estimated savings)."""
+    return prompt_cache_stats()
+
+@router.get("/intent-routing")
+async def get_intent_routing_metrics():
+    """Routing decisions per source/agent, route cache hit rate and routing latency."""
+    return agent_pool.orchestrator.router.stats()
+
+@router.get("/agent-mailboxes")
+async def get_agent_mailbox_metrics():
+    """Mailbox depth and workers per agent, inter-agent request outcomes and recent request chains."""
+    return agent_communicator.stats()
+
+@router.get("/agent-requests")
+async def get_agent_request_log(root_id: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """Inter-agent request/response correlation log, newest first (one chain with root_id)."""
+    return agent_communicator.correlation_log(root_id, limit)
+
+@router.get("/llm-usage")
+async def get_llm_usage(group_by: str = "agent", window_hours: float = Query(24.0, gt=0, le=settings.LLM_USAGE_MAX_WINDOW_HOURS),
+                        bucket: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Persistent usage ledger aggregated per dimension over a time window:
+    calls, p50/p95 latency, tokens, cost, cache hit rate and fallback depth.
+    group_by: user_role|agent|template|provider|model|tier|cache_status|fallback_depth
+    bucket: hour|day|week (optional time series)
+    """
+    if group_by not in USAGE_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(USAGE_DIMENSIONS)}")
+    if bucket and bucket not in USAGE_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(USAGE_BUCKETS)}")
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {
+        "group_by": group_by,
+        "window_hours": window_hours,
+        "bucket": bucket,
+        "rows": await aggregate_usage(db, group_by, window_hours, bucket),
+        "ledger": usage_ledger.stats()
+    }
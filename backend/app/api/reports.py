@@ -11,10 +11,13 @@ import json
 from typing import List, Tuple, Any, Optional
 from pydantic import BaseModel
 from app.services.report_service import ReportService
-from app.schemas.report_schema import ReportRequest, SuggestionRequest
+from app.schemas.report_schema import ReportRequest, SuggestionRequest, ShortageLetterRequest
+from app.services.shortage_letters import stream_shortage_letters
 from app.core.rbac import rbac, Permission
 from app.models.user import User
-from app.services.llm_service import LLMService
+from app.agents.pool import agent_pool
+from app.services.json_repair import parse_llm_json, JSONRepairError
+from app.services.usage_ledger import tag_usage
 from langchain_core.messages import HumanMessage, SystemMessage
 
 router = APIRouter()
@@ -1103,6 +1106,7 @@ async def get_report_suggestions(request: SuggestionRequest):
     Prioritizes static statutory templates if available, otherwise uses LLM.
     """
     template_lower = request.template.lower()
+    tag_usage(template=request.template)
 
     # Check for Static Statutory Templates first
     content = None
@@ -1219,7 +1223,7 @@ async def get_report_suggestions(request: SuggestionRequest):
         return {"content": content}
 
     # fallback to LLM for unknown templates
-    llm = LLMService()
+    llm = agent_pool.llm_service
     
     prompt = f"""You are an expert academic administrator. Generate realistic, detailed, and compliant content for a '{request.template}' report for an Indian Engineering College.
     
@@ -1252,30 +1256,12 @@ async def get_report_suggestions(request: SuggestionRequest):
             force_mock=False 
         )
         
-        content_str = response.content
-        # Extract JSON from code block
-        if "```json" in content_str:
-            json_str = content_str.split("```json")[1].split("```")[0].strip()
-            data = json.loads(json_str)
-            return data
-        elif "```" in content_str:
-             json_str = content_str.split("```")[1].split("```")[0].strip()
-             try:
-                data = json.loads(json_str)
-                return data
-             except:
-                pass
-        
-        # Fallback if no code block but response is valid
-        # Try to parse raw content
         try:
-             # Look for '{'
-             start = content_str.find('{')
-             end = content_str.rfind('}') + 1
-             if start != -1 and end != -1:
-                 return json.loads(content_str[start:end])
-        except:
-             pass
+            data, _ = parse_llm_json(response.content, model=(response.metadata or {}).get("model", "ReportGenerator"))
+            if isinstance(data, dict):
+                return data
+        except JSONRepairError:
+            pass
 
         print("⚠️ LLM Response parsing failed. Using Fallback.")
         return {"content": get_naac_content()} 
@@ -1302,6 +1288,18 @@ from .statutory_templates import (
 
 # ...
 
+@router.post("/shortage-letters/bulk", dependencies=[Depends(rbac.require_permission(Permission.GENERATE_REPORTS))])
+async def generate_shortage_letters_bulk(request: ShortageLetterRequest):
+    """
+    Attendance shortage letters for many students of one course, streamed as
+    NDJSON as each letter is rendered, then a summary line.
+    """
+    async def encode():
+        async for event in stream_shortage_letters(request.student_ids, request.course_id, concurrency=request.concurrency):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(encode(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post("/generate", dependencies=[Depends(rbac.require_permission(Permission.GENERATE_REPORTS))])
 async def generate_custom_pdf(request: CustomReportRequest):
     """
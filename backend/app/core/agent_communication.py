@@ -1,42 +1,279 @@
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, List, Tuple
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 import asyncio
+import contextvars
+import time
+import uuid
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.deadline import cap as deadline_cap, DeadlineExceeded
+
+_requests = metrics.counter("agent_requests_total", "Inter-agent requests by target, action and outcome (ok/error/timeout/rejected)")
+_request_seconds = metrics.histogram("agent_request_seconds", "Inter-agent request time, split into queued and run stages")
+_mailbox_depth = metrics.gauge("agent_mailbox_depth", "Requests waiting in each agent's mailbox")
+
+
+class MailboxFull(Exception):
+    """Backpressure: the target agent's mailbox is at capacity. Retry later or degrade."""
+    def __init__(self, agent: str, capacity: int):
+        super().__init__(f"Agent '{agent}' is busy ({capacity} requests queued).")
+        self.agent = agent
+        self.capacity = capacity
+
+
+class AgentRequestTimeout(asyncio.TimeoutError):
+    """The inter-agent request missed its deadline (queued too long or handler too slow)."""
+
+
+@dataclass
+class Envelope:
+    correlation_id: str
+    root_id: str
+    parent_id: Optional[str]
+    depth: int
+    from_agent: str
+    to_agent: str
+    action: str
+    params: Dict[str, Any]
+    path: Tuple[str, ...]  # agents in the chain so far, caller first
+    deadline: float
+    context: contextvars.Context
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+# Envelope being handled in this task, so nested send_request calls join its chain
+current_envelope: ContextVar[Optional[Envelope]] = ContextVar("agent_current_envelope", default=None)
+
+
+class Mailbox:
+    """Bounded queue of requests for one agent, drained by a fixed number of workers."""
+    def __init__(self, name: str, agent: Any):
+        self.name = name
+        self.agent = agent
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.AGENT_MAILBOX_SIZE)
+        self.workers: List[asyncio.Task] = []
+        self.processed = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def ensure_workers(self, communicator: "AgentCommunicator"):
+        # Started on first use: registration can happen before the event loop runs
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # New event loop (scripts, Celery tasks): old queue and workers are unusable
+            self._loop = loop
+            self.queue = asyncio.Queue(maxsize=settings.AGENT_MAILBOX_SIZE)
+            self.workers = []
+        self.workers = [w for w in self.workers if not w.done()]
+        while len(self.workers) < settings.AGENT_MAILBOX_WORKERS:
+            self.workers.append(asyncio.create_task(communicator._work(self)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "workers": len([w for w in self.workers if not w.done()]),
+            "processed": self.processed
+        }
+
 
 class AgentCommunicator:
     """
     Facilitates direct communication between agents.
     Acts as a central registry and router for inter-agent requests.
+
+    Each agent has a mailbox: a bounded queue (AGENT_MAILBOX_SIZE) served by
+    AGENT_MAILBOX_WORKERS workers, so a slow agent can only hold that many
+    requests in flight. A full mailbox raises MailboxFull at once instead of
+    queueing without limit. Every request carries a deadline
+    (AGENT_REQUEST_TIMEOUT, capped by the caller's request deadline) and runs
+    in the caller's context (deadline, DB session, usage labels). Chains
+    deeper than AGENT_MAX_CHAIN_DEPTH are refused. Each request is recorded in
+    a bounded correlation log (root/parent ids, queue and run time).
     """
     def __init__(self):
         self._agents: Dict[str, Any] = {}
-        
+        self._mailboxes: Dict[str, Mailbox] = {}
+        self._log: deque = deque(maxlen=settings.AGENT_CORRELATION_LOG_SIZE)
+
     def register_agent(self, agent_name: str, agent_instance: Any):
         """Register an agent instance to receive requests."""
         self._agents[agent_name.lower()] = agent_instance
+        self._mailboxes[agent_name.lower()] = Mailbox(agent_name.lower(), agent_instance)
         print(f"📡 Agent Registered: {agent_name}")
 
-    async def send_request(self, from_agent: str, to_agent: str, action: str, params: Dict[str, Any] = {}) -> Any:
+    def _resolve(self, target: Any, to_agent: str, action: str):
+        # Convention: public methods or specific 'handle_request'
+        if hasattr(target, action) and callable(getattr(target, action)):
+            return getattr(target, action), False
+        if hasattr(target, "process_inter_agent_request"):
+            # Fallback to generic handler if available
+            return target.process_inter_agent_request, True
+        raise ValueError(f"Agent '{to_agent}' does not support action '{action}'.")
+
+    async def send_request(self, from_agent: str, to_agent: str, action: str, params: Optional[Dict[str, Any]] = None,
+                           timeout: Optional[float] = None) -> Any:
         """
-        Send a request from one agent to another.
+        Send a request from one agent to another and wait for the result.
+        Raises MailboxFull (backpressure), AgentRequestTimeout, ValueError for
+        unknown agents/actions or too deep chains, or the handler's own error.
         """
-        target = self._agents.get(to_agent.lower())
-        if not target:
+        params = params or {}
+        mailbox = self._mailboxes.get(to_agent.lower())
+        if not mailbox:
             raise ValueError(f"Target agent '{to_agent}' not found or not online.")
-            
-        print(f"📞 Agent Call: {from_agent} -> {to_agent} [Action: {action}]")
-        
-        # Check if target has the specific action method exposed
-        # Convention: public methods or specific 'handle_request' 
-        if hasattr(target, action) and callable(getattr(target, action)):
-            method = getattr(target, action)
-            if asyncio.iscoroutinefunction(method):
-                return await method(**params)
-            else:
-                return method(**params)
-        elif hasattr(target, "process_inter_agent_request"):
-            # Fallback to generic handler if available
-            return await target.process_inter_agent_request(from_agent, action, params)
+        self._resolve(mailbox.agent, to_agent, action)
+
+        parent = current_envelope.get()
+        depth = parent.depth + 1 if parent else 1
+        if depth > settings.AGENT_MAX_CHAIN_DEPTH:
+            raise ValueError(f"Inter-agent chain too deep ({depth} > {settings.AGENT_MAX_CHAIN_DEPTH}): {from_agent} -> {to_agent}")
+        try:
+            budget = deadline_cap(timeout or settings.AGENT_REQUEST_TIMEOUT)
+        except DeadlineExceeded:
+            raise AgentRequestTimeout(f"No time left to call {to_agent}.{action}")
+
+        correlation_id = uuid.uuid4().hex[:12]
+        envelope = Envelope(
+            correlation_id=correlation_id,
+            root_id=parent.root_id if parent else correlation_id,
+            parent_id=parent.correlation_id if parent else None,
+            depth=depth,
+            from_agent=from_agent,
+            to_agent=to_agent.lower(),
+            action=action,
+            params=params,
+            path=(parent.path if parent else (from_agent.lower(),)) + (to_agent.lower(),),
+            deadline=time.monotonic() + budget,
+            context=contextvars.copy_context(),
+            future=asyncio.get_running_loop().create_future()
+        )
+
+        if parent and envelope.to_agent in parent.path:
+            # Re-entrant call (A -> B -> A): A's workers may all be waiting on this
+            # chain, so queueing would deadlock until the deadline. Run it here.
+            print(f"📞 Agent Call: {from_agent} -> {to_agent} [Action: {action}] ({correlation_id}, depth {depth}, inline)")
+            await self._execute(mailbox, envelope)
+            try:
+                return await asyncio.wait_for(asyncio.shield(envelope.future), timeout=0)
+            except asyncio.TimeoutError:
+                raise AgentRequestTimeout(f"{to_agent}.{action} did not answer within {budget:.1f}s ({correlation_id})")
+
+        mailbox.ensure_workers(self)
+        try:
+            mailbox.queue.put_nowait(envelope)
+        except asyncio.QueueFull:
+            self._record(envelope, "rejected", None, None)
+            raise MailboxFull(mailbox.name, mailbox.queue.maxsize)
+        _mailbox_depth.set(mailbox.queue.qsize(), agent=mailbox.name)
+        print(f"📞 Agent Call: {from_agent} -> {to_agent} [Action: {action}] ({correlation_id}, depth {depth})")
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(envelope.future), timeout=budget)
+        except asyncio.TimeoutError:
+            # The worker sees the expired deadline and drops or cancels the work
+            raise AgentRequestTimeout(f"{to_agent}.{action} did not answer within {budget:.1f}s ({correlation_id})")
+
+    async def _work(self, mailbox: Mailbox):
+        while True:
+            envelope: Envelope = await mailbox.queue.get()
+            _mailbox_depth.set(mailbox.queue.qsize(), agent=mailbox.name)
+            await self._execute(mailbox, envelope)
+
+    async def _execute(self, mailbox: Mailbox, envelope: Envelope):
+        """Runs one request and settles its future; never raises (except on cancellation)."""
+        started = time.monotonic()
+        queued = started - envelope.enqueued_at
+        left = envelope.deadline - started
+        if left <= 0 or envelope.future.done():
+            self._record(envelope, "timeout", queued, None)
+            return
+
+        method, generic = self._resolve(mailbox.agent, envelope.to_agent, envelope.action)
+        # Run in the sender's context, marked as this envelope, so nested calls chain to it
+        envelope.context.run(current_envelope.set, envelope)
+        if generic:
+            call = method(envelope.from_agent, envelope.action, envelope.params)
+        elif asyncio.iscoroutinefunction(method):
+            call = method(**envelope.params)
         else:
-             raise ValueError(f"Agent '{to_agent}' does not support action '{action}'.")
+            call = asyncio.to_thread(method, **envelope.params)
+        task = asyncio.create_task(call, context=envelope.context)
+        try:
+            result = await asyncio.wait_for(task, timeout=left)
+            status = "ok"
+            if not envelope.future.done():
+                envelope.future.set_result(result)
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        except Exception as e:
+            status = "error"
+            if not envelope.future.done():
+                envelope.future.set_exception(e)
+                envelope.future.exception()  # the sender re-raises it; may have timed out already
+        mailbox.processed += 1
+        self._record(envelope, status, queued, time.monotonic() - started)
+
+    def _record(self, envelope: Envelope, status: str, queued: Optional[float], run: Optional[float]):
+        _requests.inc(to=envelope.to_agent, action=envelope.action, outcome=status)
+        if queued is not None:
+            _request_seconds.observe(queued, to=envelope.to_agent, stage="queued")
+        if run is not None:
+            _request_seconds.observe(run, to=envelope.to_agent, stage="run")
+        self._log.append({
+            "correlation_id": envelope.correlation_id,
+            "root_id": envelope.root_id,
+            "parent_id": envelope.parent_id,
+            "depth": envelope.depth,
+            "from": envelope.from_agent,
+            "to": envelope.to_agent,
+            "action": envelope.action,
+            "status": status,
+            "queued_ms": round(queued * 1000, 1) if queued is not None else None,
+            "run_ms": round(run * 1000, 1) if run is not None else None,
+            "total_ms": round((time.monotonic() - envelope.enqueued_at) * 1000, 1)
+        })
+
+    def correlation_log(self, root_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent requests first, optionally only those of one chain."""
+        entries = [e for e in reversed(self._log) if root_id is None or e["root_id"] == root_id]
+        return entries[:limit]
+
+    def chains(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Recent request chains: hop count, max depth and end-to-end latency of the root call."""
+        chains: Dict[str, Dict[str, Any]] = {}
+        for entry in self._log:
+            chain = chains.setdefault(entry["root_id"], {"root_id": entry["root_id"], "hops": 0, "max_depth": 0,
+                                                         "statuses": {}, "total_ms": None, "path": []})
+            chain["hops"] += 1
+            chain["max_depth"] = max(chain["max_depth"], entry["depth"])
+            chain["statuses"][entry["status"]] = chain["statuses"].get(entry["status"], 0) + 1
+            chain["path"].append(f"{entry['from']}->{entry['to']}.{entry['action']}")
+            if entry["correlation_id"] == entry["root_id"]:
+                chain["total_ms"] = entry["total_ms"]
+        return list(chains.values())[-limit:][::-1]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mailboxes": {name: mailbox.stats() for name, mailbox in self._mailboxes.items()},
+            "requests": _requests.snapshot(),
+            "request_seconds": _request_seconds.snapshot(),
+            "chains": self.chains()
+        }
+
+    async def stop(self):
+        """Called from the FastAPI lifespan on shutdown."""
+        workers = [w for mailbox in self._mailboxes.values() for w in mailbox.workers]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for mailbox in self._mailboxes.values():
+            mailbox.workers = []
 
     def get_online_agents(self):
         return list(self._agents.keys())
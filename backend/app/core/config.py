@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Dict, Any
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -39,7 +39,135 @@ class Settings(BaseSettings):
 
     # OPENROUTER
     OPENROUTER_API_KEY: Optional[str] = None
-    
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+
+    # LLM STUB (OpenAI-compatible stand-in for offline load tests, e.g. http://localhost:8100/v1)
+    LLM_STUB_BASE_URL: Optional[str] = None
+
+    # LLM HTTP POOL (shared httpx client, opened in the FastAPI lifespan)
+    LLM_HTTP2: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 50
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP_DEFAULT_TIMEOUT: float = 15.0
+    LLM_HTTP_POOL_TIMEOUT: float = 5.0
+
+    # LLM HEDGING (raced provider calls; per-role overrides as JSON keyed by role)
+    LLM_HEDGING_ENABLED: bool = True
+    LLM_LATENCY_BUDGET: Optional[float] = 45.0
+    LLM_HEDGE_DELAY: Optional[float] = None
+    LLM_HEDGE_MAX_PARALLEL: int = 2
+    LLM_HEDGE_POLICIES: Dict[str, Dict[str, Any]] = {}
+
+    # LLM TIMEOUTS (adaptive per provider/model from observed latency; seconds)
+    LLM_TIMEOUT_PERCENTILE: float = 0.95
+    LLM_TIMEOUT_MULTIPLIER: float = 1.5
+    LLM_TIMEOUT_MIN_SAMPLES: int = 10
+    LLM_TIMEOUT_MIN: float = 3.0
+    LLM_TIMEOUT_MAX: float = 120.0
+    LLM_TIMEOUT_DEFAULT_BASE: float = 4.0               # before enough samples: base + tokens / rate
+    LLM_TIMEOUT_DEFAULT_TOKENS_PER_SECOND: float = 40.0
+
+    # REQUEST DEADLINES (end-to-end, propagated to every LLM call; 0 disables)
+    CHAT_REQUEST_DEADLINE: float = 45.0
+    CHAT_STREAM_DEADLINE: float = 300.0
+
+    # LLM CIRCUIT BREAKERS (per provider/model/key, shared through Redis)
+    LLM_CIRCUIT_WINDOW: int = 20
+    LLM_CIRCUIT_MIN_REQUESTS: int = 3
+    LLM_CIRCUIT_ERROR_THRESHOLD: float = 0.5
+    LLM_CIRCUIT_OPEN_SECONDS: float = 30.0
+    LLM_CIRCUIT_PROBE_SECONDS: float = 20.0
+
+    # LLM RESPONSE CACHE (in-process LRU in front of compressed Redis values)
+    LLM_CACHE_TTL: int = 3600  # untagged answers (no domain event evicts them)
+    LLM_CACHE_TAGGED_TTL: int = 259200  # answers tagged with a data domain; its events evict them sooner
+    LLM_CACHE_LOCAL_MAX_ENTRIES: int = 1000
+    LLM_CACHE_LOCAL_TTL: int = 300
+    LLM_CACHE_STALE_TTL: int = 600
+
+    # LLM SEMANTIC CACHE (embedding-keyed, scoped to role + context fingerprint)
+    LLM_SEMANTIC_CACHE_ENABLED: bool = True
+    LLM_SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    LLM_SEMANTIC_CACHE_MAX_ENTRIES: int = 200
+    LLM_SEMANTIC_CACHE_TTL: int = 3600
+
+    # LLM SINGLEFLIGHT (optional cross-worker lock so one worker calls the provider)
+    LLM_SINGLEFLIGHT_REDIS_LOCK: bool = False
+    LLM_SINGLEFLIGHT_LOCK_TTL: float = 30.0
+    LLM_SINGLEFLIGHT_WAIT: float = 25.0
+    LLM_SINGLEFLIGHT_POLL_INTERVAL: float = 0.2
+
+    # LLM PROMPT BUDGETS (tokens for system template + context + query)
+    LLM_PROMPT_TOKEN_BUDGET: int = 6000
+    LLM_PROMPT_BUDGETS: Dict[str, int] = {}
+    LLM_RAG_CHUNKS: int = 8
+    # Preloaded BPE files (scripts/fetch_tiktoken_encoding.py); token counting never downloads at runtime
+    TIKTOKEN_CACHE_DIR: str = "app/data/tiktoken"
+
+    # LLM TIER ROUTING (USD per 1M tokens, e.g. {"openai/gpt-5.5": {"input": 1.25, "output": 10.0}})
+    LLM_MODEL_PRICING: Dict[str, Dict[str, float]] = {}
+
+    # LLM RATE LIMITS (per provider API key, shared through Redis)
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+        "google": {"rpm": 60, "tpm": 1000000},
+        "openrouter": {"rpm": 20, "tpm": 200000}
+    }
+    LLM_RATE_LIMIT_MAX_WAIT: Dict[str, float] = {"interactive": 8.0, "standard": 20.0, "background": 120.0}
+    LLM_RATE_LIMIT_RESERVE: Dict[str, float] = {"interactive": 0.0, "standard": 0.1, "background": 0.25}
+    LLM_RATE_LIMIT_OUTPUT_ESTIMATE: int = 800
+
+    # LLM USAGE LEDGER (one row per call in llm_usage, written in background batches)
+    LLM_USAGE_LEDGER_ENABLED: bool = True
+    LLM_USAGE_BATCH_SIZE: int = 200
+    LLM_USAGE_FLUSH_INTERVAL: float = 2.0
+    LLM_USAGE_QUEUE_MAX: int = 10000
+    LLM_USAGE_MAX_WINDOW_HOURS: int = 24 * 31  # upper bound for /metrics/llm-usage window_hours
+
+    # INTENT ROUTING (keyword matcher, then embedding nearest-centroid for unmatched queries)
+    INTENT_ROUTER_CENTROID_ENABLED: bool = True
+    INTENT_ROUTER_MIN_SIMILARITY: float = 0.35
+    INTENT_ROUTER_MIN_MARGIN: float = 0.02
+    INTENT_ROUTE_CACHE_SIZE: int = 4096
+
+    # ORCHESTRATOR FAN-OUT (multi-domain queries answered by several agents at once)
+    ORCHESTRATOR_FANOUT_ENABLED: bool = True
+    ORCHESTRATOR_FANOUT_MIN_SCORE: int = 2    # keyword hits an agent needs to join
+    ORCHESTRATOR_FANOUT_RELATIVE_SCORE: float = 0.5  # ...and at least this share of the top agent's hits
+    ORCHESTRATOR_FANOUT_MAX_AGENTS: int = 3
+    ORCHESTRATOR_FANOUT_TIMEOUT: float = 30.0  # capped by the request deadline
+
+    # AGENT TOOL CALLING (function-calling agents in app/agents/base_agent.py)
+    AGENT_TOOL_TIMEOUT: float = 15.0
+    AGENT_TOOL_TIMEOUTS: Dict[str, float] = {"generate_shortage_letters": 60.0}
+    AGENT_TOOL_CONCURRENCY: int = 4
+    AGENT_MAX_TOOL_ROUNDS: int = 4
+    AGENT_TOOL_TOKEN_BUDGET: int = 24000  # total tokens across all rounds of one turn
+
+    # AGENT-TO-AGENT MAILBOXES (bounded queue + fixed workers per agent)
+    AGENT_MAILBOX_SIZE: int = 64
+    AGENT_MAILBOX_WORKERS: int = 2
+    AGENT_REQUEST_TIMEOUT: float = 20.0  # capped by the request deadline
+    AGENT_MAX_CHAIN_DEPTH: int = 4
+    AGENT_CORRELATION_LOG_SIZE: int = 500
+
+    # DATABASE TOOL CACHING (per-request memo; short-TTL cache for reference data such as courses)
+    DB_TOOL_MEMO_ENABLED: bool = True
+    DB_TOOL_REFERENCE_CACHE_TTL: float = 60.0  # 0 disables the cross-request cache
+    DB_TOOL_REFERENCE_CACHE_MAX_ENTRIES: int = 1000
+
+    # BULK SHORTAGE LETTERS
+    SHORTAGE_LETTER_CONCURRENCY: int = 8
+    SHORTAGE_LETTER_MAX_CONCURRENCY: int = 16  # upper bound for a client-supplied concurrency
+
+    # SAR BATCH GENERATION
+    SAR_BATCH_CONCURRENCY: int = 4
+    SAR_BATCH_MAX_CONCURRENCY: int = 8    # upper bound for a client-supplied concurrency
+    SAR_SECTION_CACHE_TTL: int = 604800
+    SAR_CHECKPOINT_TTL: int = 86400
+    SAR_LOCAL_MAX_RUNS: int = 16  # runs kept in memory when Redis is unavailable
+
     # MINIO
     MINIO_ENDPOINT: Optional[str] = None
     MINIO_ACCESS_KEY: str = "minioadmin"
@@ -0,0 +1,54 @@
+from typing import Optional
+from contextvars import ContextVar
+import asyncio
+import time
+
+# Absolute time.monotonic() by which the current request must be answered.
+# Set once at the API edge; asyncio tasks inherit it, so every layer below
+# (orchestrator, agents, LLM calls, rate-limiter queues) sees the same budget.
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's end-to-end deadline passed before this step could start."""
+
+
+def set_deadline(seconds: Optional[float]):
+    """
+    Starts a deadline `seconds` from now (None or <= 0 clears it). An existing
+    earlier deadline is kept, so nested callers can only tighten it.
+    Returns the ContextVar token.
+    """
+    if not seconds or seconds <= 0:
+        return request_deadline.set(None)
+    deadline = time.monotonic() + seconds
+    current = request_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    return request_deadline.set(deadline)
+
+
+def clear_deadline():
+    """Detaches work that outlives the request (background refreshes, batch jobs)."""
+    return request_deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the request deadline, or None when there is none."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def cap(timeout: Optional[float]) -> Optional[float]:
+    """
+    Clamps a step's own timeout to what is left of the request deadline.
+    Raises DeadlineExceeded if nothing is left.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded.")
+    return left if timeout is None else min(timeout, left)
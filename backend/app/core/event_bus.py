@@ -17,6 +17,8 @@ class EventType(Enum):
     GRADE_CHANGED = "grade.changed"
     ATTENDANCE_BELOW_THRESHOLD = "attendance.below_threshold"
     GRADE_BELOW_THRESHOLD = "grade.below_threshold"
+    BUDGET_UPDATED = "finance.budget_updated"
+    ACCREDITATION_DATA_UPDATED = "accreditation.data_updated"
     WORKFLOW_STARTED = "workflow.started"
     APPROVAL_REQUIRED = "approval.required"
     DOCUMENT_GENERATED = "document.generated"
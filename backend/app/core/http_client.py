@@ -0,0 +1,140 @@
+from typing import Dict, Any, AsyncIterator
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import asyncio
+import time
+import httpx
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_in_flight = metrics.gauge("http_pool_in_flight", "Requests currently using a pooled connection, per host")
+_peak_in_flight = metrics.gauge("http_pool_peak_in_flight", "Highest concurrent requests seen, per host")
+_saturation = metrics.gauge("http_pool_saturation", "in_flight / max_connections, per host")
+_saturated_total = metrics.counter("http_pool_saturated_total", "Requests that started while the pool was full")
+_pool_timeouts = metrics.counter("http_pool_timeouts_total", "Requests that gave up waiting for a pooled connection")
+_request_latency = metrics.histogram("http_pool_request_seconds", "Wall time of pooled HTTP requests")
+
+
+class HTTPClientPool:
+    """
+    App-scoped pool of httpx.AsyncClient instances, one per upstream host.
+
+    Each host gets its own connection limits and keep-alive connections, so a
+    burst against one provider cannot starve another. The FastAPI lifespan
+    opens and closes the pool; outside the app (Celery, scripts) clients are
+    created lazily on first use.
+    """
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = asyncio.Lock()
+        self.max_connections = settings.LLM_HTTP_MAX_CONNECTIONS
+        self.max_keepalive_connections = settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS
+        self.keepalive_expiry = settings.LLM_HTTP_KEEPALIVE_EXPIRY
+        self.http2 = settings.LLM_HTTP2 and HTTP2_AVAILABLE
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(settings.LLM_HTTP_DEFAULT_TIMEOUT, pool=settings.LLM_HTTP_POOL_TIMEOUT),
+            follow_redirects=True
+        )
+
+    async def open(self):
+        """Called from the FastAPI lifespan on startup."""
+        if settings.LLM_HTTP2 and not HTTP2_AVAILABLE:
+            print("⚠️ HTTP/2 requested but 'h2' is not installed. Falling back to HTTP/1.1.")
+        print(f"✅ HTTP client pool ready (http2={self.http2}, max_connections={self.max_connections}/host).")
+
+    async def close(self):
+        """Called from the FastAPI lifespan on shutdown."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"⚠️ Error closing HTTP client: {e}")
+
+    async def get_client(self, url: str) -> httpx.AsyncClient:
+        host = urlsplit(url).netloc
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            async with self._lock:
+                client = self._clients.get(host)
+                if client is None or client.is_closed:
+                    client = self._build_client()
+                    self._clients[host] = client
+        return client
+
+    @asynccontextmanager
+    async def _track(self, host: str):
+        """Records in-flight/saturation metrics around one pooled request."""
+        _in_flight.inc(host=host)
+        current = _in_flight.get(host=host)
+        if current > _peak_in_flight.get(host=host):
+            _peak_in_flight.set(current, host=host)
+        if current > self.max_connections:
+            _saturated_total.inc(host=host)
+        _saturation.set(min(current / self.max_connections, 1.0), host=host)
+
+        start = time.perf_counter()
+        try:
+            yield
+        except httpx.PoolTimeout:
+            _pool_timeouts.inc(host=host)
+            raise
+        finally:
+            _request_latency.observe(time.perf_counter() - start, host=host)
+            _in_flight.dec(host=host)
+            _saturation.set(min(_in_flight.get(host=host) / self.max_connections, 1.0), host=host)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the pooled client for the URL's host, recording pool usage."""
+        host = urlsplit(url).netloc
+        client = await self.get_client(url)
+        async with self._track(host):
+            return await client.request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming variant of request(); the connection counts as in use until the body is consumed."""
+        host = urlsplit(url).netloc
+        client = await self.get_client(url)
+        async with self._track(host):
+            async with client.stream(method, url, **kwargs) as response:
+                yield response
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_connections_per_host": self.max_connections,
+            "max_keepalive_connections_per_host": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "hosts": {
+                host: {
+                    "in_flight": _in_flight.get(host=host),
+                    "peak_in_flight": _peak_in_flight.get(host=host),
+                    "saturation": _saturation.get(host=host),
+                    "saturated_total": _saturated_total.get(host=host),
+                    "pool_timeouts": _pool_timeouts.get(host=host)
+                }
+                for host in self._clients
+            }
+        }
+
+# Global Instance
+http_pool = HTTPClientPool()
@@ -0,0 +1,132 @@
+from typing import Dict, Any, List, Optional, Tuple
+import threading
+import time
+
+
+class Counter:
+    """Monotonic counter, optionally split by a label tuple."""
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(k), "value": v} for k, v in self._values.items()]
+
+
+class Gauge:
+    """Point-in-time value that can go up and down."""
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(k), "value": v} for k, v in self._values.items()]
+
+
+class Histogram:
+    """Bucketed histogram with count/sum per label tuple."""
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, description: str = "", buckets: Optional[Tuple[float, ...]] = None):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._values: Dict[Tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0}
+                self._values[key] = entry
+            idx = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    idx = i
+                    break
+            entry["counts"][idx] += 1
+            entry["count"] += 1
+            entry["sum"] += value
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        out = []
+        for k, entry in self._values.items():
+            bounds = [str(b) for b in self.buckets] + ["+Inf"]
+            out.append({
+                "labels": dict(k),
+                "buckets": dict(zip(bounds, entry["counts"])),
+                "count": entry["count"],
+                "sum": round(entry["sum"], 6)
+            })
+        return out
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry.
+    Metrics are per worker process; exposed as JSON via /api/v1/metrics.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Any]:
+        return {
+            name: {
+                "type": type(metric).__name__.lower(),
+                "description": metric.description,
+                "values": metric.snapshot()
+            }
+            for name, metric in sorted(self._metrics.items())
+            if name.startswith(prefix)
+        }
+
+# Global Instance
+metrics = MetricsRegistry()
@@ -22,6 +22,7 @@ class Permission(str, Enum):
     GENERATE_REPORTS = "generate:reports"
     MANAGE_USERS = "manage:users"
     VIEW_ANALYTICS = "view:analytics"
+    VIEW_SYSTEM_METRICS = "view:system_metrics"
 
 # Role -> Permissions Mapping
 ROLE_PERMISSIONS: Dict[Role, List[Permission]] = {
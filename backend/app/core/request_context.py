@@ -0,0 +1,16 @@
+from typing import Optional
+from contextvars import ContextVar
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Database session of the current request. Agents are app-scoped singletons,
+# so per-request state travels in contextvars instead of on the instances.
+db_session: ContextVar[Optional[AsyncSession]] = ContextVar("db_session", default=None)
+
+
+def bind_db(db: Optional[AsyncSession]):
+    """Makes `db` the session for this request (and the tasks it spawns). Returns the token."""
+    return db_session.set(db)
+
+
+def current_db() -> Optional[AsyncSession]:
+    return db_session.get()
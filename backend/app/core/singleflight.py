@@ -0,0 +1,35 @@
+from typing import Dict, Any, Callable, Awaitable
+import asyncio
+from app.core.metrics import metrics
+
+_calls = metrics.counter("singleflight_calls_total", "Singleflight calls by role (leader/follower)")
+
+
+class SingleFlight:
+    """
+    In-flight request deduplication (Go's singleflight, for asyncio).
+
+    The first caller for a key starts the work as a task; concurrent callers
+    with the same key await that same task instead of repeating it. The task
+    is shielded, so a leader whose client disconnects does not cancel the
+    work for everyone else. The key is released as soon as the task finishes,
+    so later callers go back to the cache.
+    """
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            _calls.inc(group=self.name, role="leader")
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _t, k=key: self._tasks.pop(k, None))
+        else:
+            _calls.inc(group=self.name, role="follower")
+            print(f"🔗 Singleflight: joining in-flight call for {key}")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
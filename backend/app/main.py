@@ -3,7 +3,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.db_postgres import init_db
-from app.api import auth, chat, reports, admin, workflows, accreditation, recommendations, integrations
+from app.core.http_client import http_pool
+from app.services.llm_cache import llm_cache
+from app.services.cache_invalidation import register_cache_invalidation
+from app.services.usage_ledger import usage_ledger
+from app.agents.pool import agent_pool
+from app.core.agent_communication import agent_communicator
+from app.api import auth, chat, reports, admin, workflows, accreditation, recommendations, integrations, metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -12,8 +18,22 @@ async def lifespan(app: FastAPI):
         await init_db()
     except Exception as e:
         print(f"WARNING: Database initialization failed: {e}. Running in logical mode only.")
+    # Startup: Shared HTTP connection pool for LLM providers
+    await http_pool.open()
+    # Startup: Drop local LLM cache entries when other workers invalidate them
+    await llm_cache.start_invalidation_listener()
+    # Startup: Evict tagged LLM answers when attendance/grades/finance/accreditation data changes
+    register_cache_invalidation()
+    # Startup: Background writer for the LLM usage ledger
+    await usage_ledger.start()
+    # Startup: Agents, LLMService and KnowledgeService are built once and shared by all requests
+    await agent_pool.start()
     yield
-    # Shutdown logic if needed
+    # Shutdown: Stop agent mailbox workers, flush queued usage rows, then release pooled connections
+    await agent_communicator.stop()
+    await usage_ledger.stop()
+    await llm_cache.stop_invalidation_listener()
+    await http_pool.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -56,3 +76,5 @@ from app.api import recommendations
 app.include_router(recommendations.router, prefix="/api/v1/recommendations", tags=["recommendations"])
 
 app.include_router(integrations.router, prefix="/api/v1")
+
+app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["metrics"])
@@ -5,3 +5,4 @@ from .exam import ExamSchedule, QuestionPaper, Result
 from .finance import BudgetHead, FeeStructure, StudentFee, Vendor, PurchaseOrder
 from .student_services import PlacementDrive, Internship, Grievance
 from .research_compliance import ResearchProject, Publication, ComplianceCalendar, AQARData
+from .llm_usage import LLMUsage
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Boolean, Integer, SmallInteger, BigInteger, Float, DateTime, Index, func
+from .base import Base
+
+class LLMUsage(Base):
+    """
+    One row per LLM call (provider call, cache hit or mock fallback).
+    Append-only and written in batches by app.services.usage_ledger.
+    """
+    __tablename__ = "llm_usage"
+
+    usage_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    user_role = Column(String(100))      # role_id of the requesting user, e.g. "faculty"
+    agent = Column(String(100))          # LLMService role, e.g. "Academic Agent", "ReportGenerator"
+    template = Column(String(200))       # report template / SAR section, when applicable
+    provider = Column(String(30))
+    model = Column(String(100))
+    tier = Column(String(20))
+    cache_status = Column(String(20))    # miss | exact | semantic | stale | coalesced | direct | mock_fallback | failed
+    fallback_depth = Column(SmallInteger)  # index of the winning candidate; 0 = first choice
+    latency_ms = Column(Integer)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    cached_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+    success = Column(Boolean, default=True)
+
+    __table_args__ = (
+        Index("ix_llm_usage_created_at", "created_at"),
+        Index("ix_llm_usage_agent_created_at", "agent", "created_at"),
+    )
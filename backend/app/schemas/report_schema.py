@@ -10,3 +10,8 @@ class SuggestionRequest(BaseModel):
     context: str
     current_content: str
     focus_area: Optional[str] = None
+
+class ShortageLetterRequest(BaseModel):
+    course_id: str
+    student_ids: List[str]
+    concurrency: Optional[int] = None               # clamped to SHORTAGE_LETTER_MAX_CONCURRENCY
@@ -0,0 +1,35 @@
+from typing import Dict, List
+from app.core.event_bus import event_bus, Event, EventType
+from app.services.llm_cache import llm_cache
+
+# Which cached-answer domains each domain event makes stale. Only events that
+# are actually published belong here (attendance marking, integration syncs,
+# attainment recalculation); ACCREDITATION_RENEWAL_DUE changes no data.
+EVENT_CACHE_TAGS: Dict[EventType, List[str]] = {
+    EventType.ATTENDANCE_UPDATED: ["attendance"],
+    EventType.ATTENDANCE_BELOW_THRESHOLD: ["attendance"],
+    EventType.GRADE_CHANGED: ["grades"],
+    EventType.BUDGET_UPDATED: ["finance"],
+    EventType.ACCREDITATION_DATA_UPDATED: ["accreditation"],
+}
+
+_registered = False
+
+
+async def _invalidate_for_event(event: Event):
+    tags = EVENT_CACHE_TAGS.get(event.event_type, [])
+    try:
+        await llm_cache.invalidate_tags(tags)
+    except Exception as e:
+        # Never let cache housekeeping break the publisher
+        print(f"⚠️ Cache invalidation for {event.event_type.value} failed: {e}")
+
+
+def register_cache_invalidation():
+    """Subscribes the LLM cache to domain events. Safe to call more than once."""
+    global _registered
+    if _registered:
+        return
+    for event_type in EVENT_CACHE_TAGS:
+        event_bus.subscribe(event_type, _invalidate_for_event)
+    _registered = True
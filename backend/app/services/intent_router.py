@@ -0,0 +1,241 @@
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+import asyncio
+import re
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.semantic_cache import _normalise, _dot
+
+_routes = metrics.counter("intent_routes_total", "Routing decisions by source (role/keyword/centroid/fallback) and agent")
+_route_seconds = metrics.histogram(
+    "intent_route_seconds", "Time to route one query (cache misses only)",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+_route_cache = metrics.counter("intent_route_cache_total", "Route cache lookups by result (hit/miss)")
+
+# Example phrasings per agent that use none of its keywords. Together with the
+# keyword list they form the agent's centroid in embedding space, which is
+# what unmatched queries are compared against.
+INTENT_EXEMPLARS: Dict[str, List[str]] = {
+    "academic": [
+        "Which classes do I teach on Thursday?",
+        "How many students were absent in my section today?",
+        "Assign the remaining units of the subject to the new lecturer",
+        "Which topics are still left to cover this semester?",
+    ],
+    "examination": [
+        "When will the semester end results be published?",
+        "I want to apply for revaluation of my answer script",
+        "Who is the invigilator for room 204 tomorrow?",
+        "How is the CGPA calculated for backlog students?",
+    ],
+    "finance": [
+        "How much money is left for the lab equipment this year?",
+        "Has my tuition for this semester been received?",
+        "Show pending reimbursements for the conference travel",
+        "What did the department spend on consumables last quarter?",
+    ],
+    "quality": [
+        "Prepare the criterion-wise self study report evidence",
+        "Which metrics pull down our institutional quality score?",
+        "Schedule the internal quality audit of all departments",
+        "What is the outcome-based education readiness of the CSE program?",
+    ],
+    "student_services": [
+        "Which companies are visiting campus for recruitment next month?",
+        "I need a room change in the boys' residence",
+        "How do I get financial aid for my studies?",
+        "Where do I report harassment or ragging?",
+    ],
+    "administrative": [
+        "I will be away next Friday, please record my absence request",
+        "Send a notice to all departments about the holiday",
+        "Who approves new non-teaching appointments?",
+        "Book the seminar hall for the board of studies",
+    ],
+    "research": [
+        "How many papers did our faculty get into Scopus journals?",
+        "Is there seed money available for a new lab idea?",
+        "List the doctoral scholars under Dr. Rao",
+        "Help me file an intellectual property application",
+    ],
+    "compliance": [
+        "Are we meeting the approval norms for intake this year?",
+        "What data do we need to submit for the national ranking framework?",
+        "Which statutory committees are missing members?",
+        "Upload the all-India higher education survey data",
+    ],
+    "accreditation_manager": [
+        "Map our graduate attributes to the international benchmark",
+        "Compile the self assessment report for the mechanical program",
+        "Which outcomes have weak attainment in the last cycle?",
+        "Prepare evidence folders for the external audit visit",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    agent: Optional[str]  # None: the Orchestrator answers itself (RAG fallback)
+    confidence: float
+    source: str  # role | keyword | centroid | fallback
+    scores: Dict[str, int] = field(default_factory=dict)
+    similarity: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["scores"] = {k: v for k, v in self.scores.items() if v}
+        return data
+
+
+class IntentRouter:
+    """
+    Routes a query to an agent key in two stages:
+
+    1. One compiled regex over every agent's keywords (longest alternative
+       first, anchored at a word start so "hr" does not match "three" but
+       "exam" still matches "examination"). Score = distinct keywords hit.
+       Ties are broken by the embedding stage instead of dict order.
+    2. Queries with no keyword go to the nearest agent centroid (mean of the
+       embedded keywords and INTENT_EXEMPLARS), if the cosine similarity and
+       the margin over the runner-up pass the configured thresholds.
+
+    Decisions are cached per normalised query in a bounded LRU.
+    """
+    def __init__(self, intent_map: Dict[str, List[str]], exemplars: Optional[Dict[str, List[str]]] = None):
+        self.intent_map = intent_map
+        self.exemplars = exemplars if exemplars is not None else INTENT_EXEMPLARS
+        # Keyword -> agents that list it (a keyword may belong to more than one)
+        self._owners: Dict[str, List[str]] = {}
+        for agent, keywords in intent_map.items():
+            for kw in keywords:
+                self._owners.setdefault(kw.lower(), []).append(agent)
+        alternatives = sorted(self._owners, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(" + "|".join(re.escape(kw) for kw in alternatives) + r")\w*")
+        self.embedding_function: Optional[Callable[[List[str]], List[List[float]]]] = None
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._centroid_lock = asyncio.Lock()
+        self._cache: "OrderedDict[str, RouteDecision]" = OrderedDict()
+
+    def set_embedding_function(self, fn: Callable[[List[str]], List[List[float]]]):
+        self.embedding_function = fn
+        self._centroids = None
+        self._cache.clear()
+
+    def keyword_scores(self, query: str) -> Dict[str, int]:
+        """Distinct keyword hits per agent (every agent present, 0 if none)."""
+        hits: Dict[str, set] = {}
+        for match in self._pattern.finditer(query.lower()):
+            keyword = match.group(1)
+            for agent in self._owners[keyword]:
+                hits.setdefault(agent, set()).add(keyword)
+        return {agent: len(hits.get(agent, ())) for agent in self.intent_map}
+
+    async def warm(self):
+        """Embeds the centroids ahead of the first unmatched query (agent pool startup)."""
+        await self._get_centroids()
+
+    async def _get_centroids(self) -> Optional[Dict[str, List[float]]]:
+        if not settings.INTENT_ROUTER_CENTROID_ENABLED or self.embedding_function is None:
+            return None
+        if self._centroids is not None:
+            return self._centroids
+        async with self._centroid_lock:
+            if self._centroids is None:
+                agents = list(self.intent_map)
+                texts, owners = [], []
+                for agent in agents:
+                    for text in [", ".join(self.intent_map[agent])] + self.exemplars.get(agent, []):
+                        texts.append(text)
+                        owners.append(agent)
+                try:
+                    vectors = await asyncio.to_thread(self.embedding_function, texts)
+                except Exception as e:
+                    print(f"⚠️ Intent router: centroid embedding failed, keyword routing only: {e}")
+                    return None
+                sums: Dict[str, List[float]] = {}
+                for agent, vector in zip(owners, vectors):
+                    vector = _normalise([float(v) for v in vector])
+                    total = sums.setdefault(agent, [0.0] * len(vector))
+                    for i, v in enumerate(vector):
+                        total[i] += v
+                self._centroids = {agent: _normalise(total) for agent, total in sums.items()}
+                print(f"✅ Intent router: {len(self._centroids)} centroids from {len(texts)} examples.")
+        return self._centroids
+
+    async def _nearest(self, query: str, candidates: Optional[List[str]] = None) -> Optional[Tuple[str, float, float]]:
+        """(agent, similarity, margin over runner-up) among `candidates`, or None without embeddings."""
+        centroids = await self._get_centroids()
+        if not centroids:
+            return None
+        try:
+            vectors = await asyncio.to_thread(self.embedding_function, [query])
+        except Exception as e:
+            print(f"⚠️ Intent router: query embedding failed: {e}")
+            return None
+        vector = _normalise([float(v) for v in vectors[0]])
+        ranked = sorted(
+            ((_dot(vector, centroids[a]), a) for a in (candidates or centroids) if a in centroids), reverse=True
+        )
+        if not ranked:
+            return None
+        margin = ranked[0][0] - ranked[1][0] if len(ranked) > 1 else ranked[0][0]
+        return ranked[0][1], ranked[0][0], margin
+
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    async def route(self, query: str) -> RouteDecision:
+        key = self._cache_key(query)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            _route_cache.inc(result="hit")
+            _routes.inc(source=cached.source, agent=cached.agent or "orchestrator")
+            return cached
+        _route_cache.inc(result="miss")
+
+        start = time.perf_counter()
+        decision = await self._decide(query)
+        _route_seconds.observe(time.perf_counter() - start, source=decision.source)
+        _routes.inc(source=decision.source, agent=decision.agent or "orchestrator")
+
+        self._cache[key] = decision
+        if len(self._cache) > settings.INTENT_ROUTE_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return decision
+
+    async def _decide(self, query: str) -> RouteDecision:
+        scores = self.keyword_scores(query)
+        top = max(scores.values())
+        if top > 0:
+            leaders = [a for a, s in scores.items() if s == top]
+            agent, similarity = leaders[0], None
+            if len(leaders) > 1:
+                nearest = await self._nearest(query, leaders)
+                if nearest:
+                    agent, similarity = nearest[0], round(nearest[1], 4)
+            # Share of all keyword hits that went to the chosen agent
+            confidence = top / sum(scores.values())
+            return RouteDecision(agent, round(confidence, 4), "keyword", scores, similarity)
+
+        nearest = await self._nearest(query)
+        if nearest:
+            agent, similarity, margin = nearest
+            if similarity >= settings.INTENT_ROUTER_MIN_SIMILARITY and margin >= settings.INTENT_ROUTER_MIN_MARGIN:
+                return RouteDecision(agent, round(similarity, 4), "centroid", scores, round(similarity, 4))
+            return RouteDecision(None, round(similarity, 4), "fallback", scores, round(similarity, 4))
+        return RouteDecision(None, 0.0, "fallback", scores)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keywords": len(self._owners),
+            "centroids_ready": self._centroids is not None,
+            "cache_entries": len(self._cache),
+            "routes": _routes.snapshot(),
+            "cache": _route_cache.snapshot(),
+            "route_seconds": _route_seconds.snapshot()
+        }
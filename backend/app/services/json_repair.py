@@ -0,0 +1,215 @@
+from typing import Dict, List, Any, Tuple
+import json
+import re
+from pydantic import TypeAdapter, ValidationError
+from app.schemas.agent_schema import AgentResponse, ActionItem, Visualization, GenUIComponent, Document, Notification
+from app.core.metrics import metrics
+
+_parses = metrics.counter("llm_json_parse_total", "LLM JSON payloads by model and outcome (clean/repaired/failed)")
+
+# Reusable adapters (building a TypeAdapter is the expensive part)
+AGENT_RESPONSE_ADAPTER = TypeAdapter(AgentResponse)
+_ITEM_ADAPTERS = {
+    "action_items": TypeAdapter(ActionItem),
+    "visualizations": TypeAdapter(Visualization),
+    "components": TypeAdapter(GenUIComponent),
+    "documents_generated": TypeAdapter(Document),
+    "notifications": TypeAdapter(Notification),
+}
+
+# Only a fence wrapping the whole payload; ``` inside string values is content
+_FENCE = re.compile(r"^\s*```(?:json|JSON)?\s*(.*?)\s*```\s*$", re.DOTALL)
+_CLOSER_AHEAD = re.compile(r"\s*[}\]]")
+
+
+class JSONRepairError(ValueError):
+    """Raised when a model payload cannot be parsed even after repair."""
+
+
+def _strip_fences(raw: str) -> str:
+    match = _FENCE.match(raw)
+    if match:
+        return match.group(1).strip()
+    raw = raw.strip()
+    # Opening fence of a truncated payload (the closing one never arrived)
+    if raw.startswith("```json") or raw.startswith("```JSON"):
+        raw = raw[7:]
+    elif raw.startswith("```"):
+        raw = raw[3:]
+    return raw.strip()
+
+
+def _extract_block(text: str) -> str:
+    """
+    Returns the first balanced {...} / [...] block, ignoring prose around it.
+    If the block is never closed (truncated output) the remainder is returned
+    for _close_truncated to finish.
+    """
+    start = -1
+    for i, ch in enumerate(text):
+        if ch in "{[":
+            start = i
+            break
+    if start == -1:
+        return text
+
+    depth, in_string, escape = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _close_truncated(text: str) -> str:
+    """Closes an unterminated string and any open brackets, in order."""
+    stack: List[str] = []
+    in_string, escape = False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if not stack and not in_string:
+        return text
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # Dangling separators from a cut-off member: `"a": 1,` or `"key":`
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Drops commas directly before } or ]; commas inside string values are content."""
+    out: List[str] = []
+    in_string, escape = False, False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "," and _CLOSER_AHEAD.match(text, i + 1):
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def repair_json_text(raw: str) -> str:
+    """Best-effort repair: fences, surrounding prose, trailing commas, truncation."""
+    text = _extract_block(_strip_fences(raw))
+    text = _close_truncated(text)
+    return _strip_trailing_commas(text)
+
+
+def parse_llm_json(raw: str, model: str = "unknown") -> Tuple[Any, bool]:
+    """
+    Parses a model's JSON output, repairing it if needed.
+    Returns (data, repaired). Raises JSONRepairError if repair also fails.
+    """
+    for candidate in (raw, _strip_fences(raw or "")):
+        try:
+            data = json.loads(candidate)
+            _parses.inc(model=model, outcome="clean")
+            return data, False
+        except (ValueError, TypeError):
+            continue
+
+    try:
+        data = json.loads(repair_json_text(raw or ""))
+        _parses.inc(model=model, outcome="repaired")
+        print(f"🩹 Repaired malformed JSON from {model}")
+        return data, True
+    except (ValueError, TypeError) as e:
+        _parses.inc(model=model, outcome="failed")
+        raise JSONRepairError(f"Unrepairable JSON from {model}: {e}") from e
+
+
+def parse_agent_payload(raw: str, model: str = "unknown") -> Dict[str, Any]:
+    """
+    Parses and validates a structured AgentResponse payload.
+
+    Array elements that fail validation are dropped rather than failing the
+    whole answer; only a payload without usable `content` is rejected (which
+    is the one case worth paying for a call to the next model).
+    """
+    data, _ = parse_llm_json(raw, model)
+    if not isinstance(data, dict):
+        _parses.inc(model=model, outcome="invalid")
+        raise JSONRepairError(f"Expected a JSON object from {model}, got {type(data).__name__}")
+
+    try:
+        AGENT_RESPONSE_ADAPTER.validate_python(data)
+        return data
+    except ValidationError:
+        pass
+
+    cleaned = dict(data)
+    for field, adapter in _ITEM_ADAPTERS.items():
+        items = cleaned.get(field)
+        if items is None:
+            continue
+        if not isinstance(items, list):
+            cleaned[field] = []
+            continue
+        kept = []
+        for item in items:
+            try:
+                adapter.validate_python(item)
+                kept.append(item)
+            except ValidationError:
+                continue
+        cleaned[field] = kept
+
+    try:
+        AGENT_RESPONSE_ADAPTER.validate_python(cleaned)
+    except ValidationError as e:
+        _parses.inc(model=model, outcome="invalid")
+        raise JSONRepairError(f"Payload from {model} does not match AgentResponse: {e}") from e
+    _parses.inc(model=model, outcome="pruned")
+    return cleaned
+
+
+def repair_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-model outcome counts and repair rate."""
+    per_model: Dict[str, Dict[str, Any]] = {}
+    for entry in _parses.snapshot():
+        labels = entry["labels"]
+        per_model.setdefault(labels["model"], {})[labels["outcome"]] = entry["value"]
+    for model, counts in per_model.items():
+        total = sum(counts.get(k, 0) for k in ("clean", "repaired", "failed"))
+        counts["repair_rate"] = round(counts.get("repaired", 0) / total, 4) if total else 0.0
+    return per_model
@@ -0,0 +1,123 @@
+from typing import List, Optional, Tuple
+import json
+
+# Top-level AgentResponse arrays whose elements are emitted as soon as each one closes
+STREAMED_ARRAYS = ("action_items", "visualizations", "components", "documents_generated", "notifications")
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for the model's streamed AgentResponse JSON.
+
+    Feed it text chunks as they arrive; each call returns the events that became
+    available:
+      ("content", text)          - newly decoded characters of the top-level "content" string
+      ("item", field, element)   - a completed element of one of STREAMED_ARRAYS
+
+    Anything before the first '{' (prose, ```json fences) is skipped. The parser
+    only tracks structure; the complete text is still parsed and validated once
+    the stream ends.
+    """
+    def __init__(self, streamed_arrays: Tuple[str, ...] = STREAMED_ARRAYS):
+        self.streamed_arrays = streamed_arrays
+        self.buffer: List[str] = []      # full text seen so far (from the first '{')
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = ""                # pending escape sequence (after a backslash)
+        self._expect_key = False         # at depth 1, the next string is a key
+        self._string_is_key = False
+        self._key_chars: List[str] = []
+        self._current_key: Optional[str] = None
+        self._streaming_content = False
+        self._element_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+    def feed(self, chunk: str) -> List[tuple]:
+        events: List[tuple] = []
+        content_out: List[str] = []
+
+        for ch in chunk:
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+
+            pos = len(self.buffer)
+            self.buffer.append(ch)
+
+            if self._in_string:
+                self._on_string_char(ch, content_out)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._streaming_content = (
+                    not self._string_is_key and self._depth == 1 and self._current_key == "content"
+                )
+                self._key_chars = []
+            elif ch in "{[":
+                if self._depth == 2 and self._current_key in self.streamed_arrays and self._element_start is None:
+                    self._element_start = pos
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._element_start is not None:
+                    raw = "".join(self.buffer[self._element_start:pos + 1])
+                    self._element_start = None
+                    try:
+                        events.append(("item", self._current_key, json.loads(raw)))
+                    except ValueError:
+                        pass
+            elif ch == ":" and self._depth == 1:
+                self._expect_key = False
+            elif ch == "," and self._depth == 1:
+                self._expect_key = True
+                self._current_key = None
+
+        if content_out:
+            events.insert(0, ("content", "".join(content_out)))
+        return events
+
+    def _on_string_char(self, ch: str, content_out: List[str]):
+        if self._escape:
+            self._escape += ch
+            if self._escape[1] == "u":
+                if len(self._escape) < 6:
+                    return
+                try:
+                    decoded = chr(int(self._escape[2:6], 16))
+                except ValueError:
+                    decoded = ""
+            else:
+                decoded = _ESCAPES.get(ch, ch)
+            self._escape = ""
+            self._emit_string_char(decoded, content_out)
+            return
+
+        if ch == "\\":
+            self._escape = ch
+            return
+
+        if ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._current_key = "".join(self._key_chars)
+            self._streaming_content = False
+            return
+
+        self._emit_string_char(ch, content_out)
+
+    def _emit_string_char(self, decoded: str, content_out: List[str]):
+        if self._string_is_key:
+            self._key_chars.append(decoded)
+        elif self._streaming_content:
+            content_out.append(decoded)
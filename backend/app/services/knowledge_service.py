@@ -1,8 +1,33 @@
 import os
-from typing import List
+import re
+from typing import List, Tuple
 import glob
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
+
+_HEADING = re.compile(r"^#{1,3}\s")
+
+
+def split_markdown_sections(content: str, doc_name: str) -> List[str]:
+    """
+    Splits a markdown document at #/##/### headings (outside code fences) so
+    retrieval and prompt trimming work per section instead of per file.
+    Each section is prefixed with its document's title for context.
+    """
+    sections, current, in_fence = [], [], False
+    for line in content.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        # Consecutive headings stay together with the body that follows them
+        if not in_fence and _HEADING.match(line) and any(l.strip() and not _HEADING.match(l) for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+    return [f"[{doc_name}]\n{section}" for section in sections]
+
 
 class KnowledgeService:
     def __init__(self, kb_path: str = "app/data/knowledge_base"):
@@ -12,7 +37,12 @@ class KnowledgeService:
         # Initialize ChromaDB client
         persist_directory = os.path.join(os.getcwd(), "chroma_db")
         self.chroma_client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.chroma_client.get_or_create_collection(name="erp_knowledge")
+        # Explicit (default) embedding function so other services can reuse the loaded model
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.collection = self.chroma_client.get_or_create_collection(
+            name="erp_knowledge",
+            embedding_function=self.embedding_function
+        )
         
         self.load_documents()
 
@@ -31,8 +61,9 @@ class KnowledgeService:
                 content = file.read()
                 doc_name = os.path.basename(f)
                 self.documents[doc_name] = content
-                new_docs.append(content)
-                new_ids.append(doc_name)
+                for i, section in enumerate(split_markdown_sections(content, doc_name)):
+                    new_docs.append(section)
+                    new_ids.append(f"{doc_name}#{i}")
                 
         # Upsert documents to Chroma
         if new_docs:
@@ -40,21 +71,45 @@ class KnowledgeService:
                 documents=new_docs,
                 ids=new_ids
             )
-            print(f"✅ Upserted {len(new_docs)} documents into ChromaDB Knowledge Service.")
+            print(f"✅ Upserted {len(new_docs)} sections from {len(files)} documents into ChromaDB Knowledge Service.")
+            # Drop entries no longer produced (whole-file ids from before the section split, removed sections)
+            current = set(new_ids)
+            stale = [i for i in self.collection.get(include=[])["ids"] if i not in current]
+            if stale:
+                self.collection.delete(ids=stale)
+                print(f"🧹 Removed {len(stale)} stale entries from the knowledge collection.")
 
     def search(self, query: str, limit: int = 3) -> str:
         """
-        Retrieves top K documents from ChromaDB.
+        Retrieves top K sections from ChromaDB.
+        """
+        return "\n\n---\n\n".join(text for text, _ in self.search_chunks(query, limit))
+
+    def search_chunks(self, query: str, limit: int = 8) -> List[Tuple[str, float]]:
+        """
+        Retrieves top K sections with relevance scores (1.0 = identical), best first.
         """
         try:
             results = self.collection.query(
                 query_texts=[query],
-                n_results=limit
+                n_results=limit,
+                include=["documents", "distances"]
             )
             
             if results and results['documents'] and results['documents'][0]:
-                return "\n\n---\n\n".join(results['documents'][0])
-            return ""
+                # Default space is squared L2 over unit vectors: d = 2 - 2cos
+                distances = results.get('distances') or [[0.0] * len(results['documents'][0])]
+                return [
+                    (doc, round(1.0 - dist / 2.0, 4))
+                    for doc, dist in zip(results['documents'][0], distances[0])
+                ]
+            return []
         except Exception as e:
             print(f"⚠️ ChromaDB search error: {e}")
-            return ""
+            return []
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts with the same model the ChromaDB collection uses.
+        """
+        return [list(v) for v in self.embedding_function(texts)]
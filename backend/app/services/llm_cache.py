@@ -0,0 +1,294 @@
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_lookups = metrics.counter("llm_cache_lookups_total", "Exact-key LLM cache lookups by tier (local/redis/miss) and freshness")
+_bytes = metrics.counter("llm_cache_bytes_total", "Bytes written to Redis, raw vs compressed")
+_invalidations = metrics.counter("llm_cache_invalidations_total", "Keys invalidated (published or received)")
+
+# Value framing: 2-byte codec marker + body. Legacy entries are plain JSON.
+_ZSTD = b"Z1"
+_ZLIB = b"z1"
+
+
+def _compress(raw: bytes) -> bytes:
+    if zstandard is not None:
+        return _ZSTD + zstandard.ZstdCompressor(level=3).compress(raw)
+    return _ZLIB + zlib.compress(raw, 6)
+
+
+def _decompress(blob: bytes) -> bytes:
+    marker, body = blob[:2], blob[2:]
+    if marker == _ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed cache entry but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if marker == _ZLIB:
+        return zlib.decompress(body)
+    return blob
+
+
+class _LocalLRU:
+    """Size-bounded LRU with per-entry expiry. Thread-safe for Celery's thread pools."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (payload, fresh_until, stale_until, local_until)
+        self._data: "OrderedDict[str, Tuple[Dict[str, Any], float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float, float, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, payload: Dict[str, Any], fresh_until: float, stale_until: float, local_until: float):
+        with self._lock:
+            self._data[key] = (payload, fresh_until, stale_until, local_until)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Data domains a cached answer can depend on, with the words that imply them.
+# Add a domain together with the published event that evicts it (cache_invalidation).
+CACHE_TAG_KEYWORDS: Dict[str, List[str]] = {
+    "attendance": ["attendance", "absent", "shortage", "detention"],
+    "grades": ["grade", "marks", "result", "exam", "cgpa", "sgpa", "backlog"],
+    "finance": ["fee", "budget", "payment", "salary", "invoice", "purchase", "finance", "expense"],
+    "accreditation": ["naac", "nba", "sar", "aqar", "accreditation", "attainment", "co-po", "iqac", "nirf"],
+}
+# Words match at the start of a word ("grade" tags "grades", "sar" does not tag "necessary")
+_TAG_PATTERNS = {tag: re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + ")") for tag, words in CACHE_TAG_KEYWORDS.items()}
+
+
+def infer_cache_tags(role: str, query: str) -> List[str]:
+    """
+    Tags a response with the data domains it depends on. Only the role and
+    query are inspected; RAG context mentions every domain and would tag
+    everything.
+    """
+    text = f"{role} {query}".lower()
+    return sorted(tag for tag, pattern in _TAG_PATTERNS.items() if pattern.search(text))
+
+
+class LLMResponseCache:
+    """
+    Two-tier exact-key cache for LLM response payloads.
+
+    Tier 1 is an in-process LRU (no network, no JSON decode on hit). Tier 2 is
+    Redis, holding compressed JSON envelopes (zstd when installed, else zlib).
+    Entries stay readable for `stale_ttl` seconds after they expire so callers
+    can serve them immediately while refreshing in the background
+    (stale-while-revalidate). Invalidations are broadcast over Redis pub/sub
+    so every worker drops its local copy.
+
+    Entries can be tagged with data domains (see infer_cache_tags). A Redis
+    set per tag indexes the keys, so a domain event evicts only the entries
+    that depend on it.
+    """
+    CHANNEL = "llm_cache:invalidate"
+    TAG_PREFIX = "llm_cache:tag"
+
+    def __init__(self):
+        self.local = _LocalLRU(settings.LLM_CACHE_LOCAL_MAX_ENTRIES)
+        self.local_ttl = settings.LLM_CACHE_LOCAL_TTL
+        self.stale_ttl = settings.LLM_CACHE_STALE_TTL
+        self.redis_client = None
+        if redis is not None:
+            try:
+                # Binary client: values are compressed bytes
+                self.redis_client = redis.from_url(os.getenv("REDIS_URL", settings.REDIS_URL), decode_responses=False)
+            except Exception as e:
+                print(f"⚠️ Failed to initialize Redis for LLM cache: {e}")
+        self._listener_task: Optional[asyncio.Task] = None
+        # tag -> key -> time the key's entry expires; bounded, Redis holds the full index
+        self._local_tags: Dict[str, "OrderedDict[str, float]"] = {}
+
+    async def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Returns (payload, is_stale). payload is None on a miss."""
+        now = time.time()
+        entry = self.local.get(key)
+        if entry is not None:
+            payload, fresh_until, stale_until, local_until = entry
+            if now < local_until:
+                if now < fresh_until:
+                    _lookups.inc(tier="local", fresh="true")
+                    return payload, False
+                if now < stale_until:
+                    _lookups.inc(tier="local", fresh="false")
+                    return payload, True
+            self.local.pop(key)
+
+        if self.redis_client:
+            try:
+                blob = await self.redis_client.get(key)
+                if blob:
+                    envelope = json.loads(_decompress(blob))
+                    # Legacy entries were the bare payload with a 1 hour TTL
+                    if "v" not in envelope:
+                        envelope = {"v": envelope, "fresh_until": now + 60}
+                    payload, fresh_until = envelope["v"], envelope["fresh_until"]
+                    stale = now >= fresh_until
+                    self.local.set(key, payload, fresh_until, fresh_until + self.stale_ttl, now + self.local_ttl)
+                    _lookups.inc(tier="redis", fresh="false" if stale else "true")
+                    return payload, stale
+            except Exception as e:
+                print(f"⚠️ Redis cache read error: {e}")
+
+        _lookups.inc(tier="miss", fresh="false")
+        return None, False
+
+    async def set(self, key: str, payload: Dict[str, Any], ttl: int, tags: Optional[List[str]] = None):
+        now = time.time()
+        fresh_until = now + ttl
+        stale_until = fresh_until + self.stale_ttl
+        # Without Redis the local tier is the only copy, so it keeps the full lifetime
+        local_until = now + self.local_ttl if self.redis_client else stale_until
+        self.local.set(key, payload, fresh_until, stale_until, local_until)
+        if not self.redis_client:
+            await self.tag_keys(tags or [], [key], ttl)
+            return
+        try:
+            raw = json.dumps({"v": payload, "fresh_until": fresh_until}).encode("utf-8")
+            blob = _compress(raw)
+            _bytes.inc(len(raw), kind="raw")
+            _bytes.inc(len(blob), kind="compressed")
+            await self.redis_client.setex(key, int(ttl + self.stale_ttl), blob)
+        except Exception as e:
+            print(f"⚠️ Redis cache write error: {e}")
+        await self.tag_keys(tags or [], [key], ttl)
+
+    async def tag_keys(self, tags: List[str], keys: List[str], ttl: int):
+        """Adds keys (cache entries, semantic scopes) to the per-tag indexes."""
+        if not tags or not keys:
+            return
+        now = time.time()
+        expires_at = now + ttl + self.stale_ttl
+        for tag in tags:
+            index = self._local_tags.setdefault(tag, OrderedDict())
+            for key in keys:
+                index[key] = expires_at
+                index.move_to_end(key)
+            # Drop keys whose entries have aged out, then cap at the local tier's size
+            while index and (next(iter(index.values())) <= now or len(index) > self.local.max_entries):
+                index.popitem(last=False)
+        if not self.redis_client:
+            return
+        try:
+            pipe = self.redis_client.pipeline()
+            for tag in tags:
+                tag_key = f"{self.TAG_PREFIX}:{tag}"
+                pipe.sadd(tag_key, *keys)
+                # The index only needs to outlive the longest entry it points at
+                pipe.expire(tag_key, int(ttl + self.stale_ttl))
+            await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Redis cache tag write error: {e}")
+
+    async def invalidate_tags(self, tags: List[str]) -> int:
+        """Evicts every entry indexed under any of the tags. Returns the number of keys evicted."""
+        keys = set()
+        for tag in tags:
+            keys.update(self._local_tags.pop(tag, {}))
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                for tag in tags:
+                    pipe.smembers(f"{self.TAG_PREFIX}:{tag}")
+                    pipe.delete(f"{self.TAG_PREFIX}:{tag}")
+                raw = await pipe.execute()
+                for members in raw[0::2]:
+                    keys.update(k.decode() if isinstance(k, bytes) else k for k in members)
+            except Exception as e:
+                print(f"⚠️ Redis cache tag read error: {e}")
+        await self.invalidate(sorted(keys))
+        print(f"🧹 Invalidated {len(keys)} cached LLM response(s) for tags {tags}")
+        return len(keys)
+
+    async def invalidate(self, keys: List[str]):
+        """Deletes keys everywhere and tells the other workers to drop their local copies."""
+        if not keys:
+            return
+        for key in keys:
+            self.local.pop(key)
+        _invalidations.inc(len(keys), direction="published")
+        if not self.redis_client:
+            return
+        try:
+            await self.redis_client.delete(*keys)
+            await self.redis_client.publish(self.CHANNEL, json.dumps(keys))
+        except Exception as e:
+            print(f"⚠️ Redis cache invalidation error: {e}")
+
+    async def start_invalidation_listener(self):
+        """Called from the FastAPI lifespan; one listener per worker."""
+        if self.redis_client and self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop_invalidation_listener(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub()
+                await pubsub.subscribe(self.CHANNEL)
+                print("✅ LLM cache invalidation listener subscribed.")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    keys = json.loads(message["data"])
+                    for key in keys:
+                        self.local.pop(key.decode() if isinstance(key, bytes) else key)
+                    _invalidations.inc(len(keys), direction="received")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ LLM cache invalidation listener error: {e}. Reconnecting in 5s.")
+                await asyncio.sleep(5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "local_entries": len(self.local),
+            "local_max_entries": self.local.max_entries,
+            "codec": "zstd" if zstandard is not None else "zlib",
+            "lookups": _lookups.snapshot(),
+            "bytes": _bytes.snapshot(),
+            "invalidations": _invalidations.snapshot()
+        }
+
+# Global Instance (the local tier must be shared by every LLMService in the worker)
+llm_cache = LLMResponseCache()
@@ -0,0 +1,233 @@
+from typing import Dict, List, Any, Optional
+from collections import deque
+import hashlib
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_state_changes = metrics.counter("llm_circuit_transitions_total", "Circuit breaker state transitions")
+_skipped = metrics.counter("llm_circuit_skipped_total", "Candidates skipped because their circuit was open")
+
+
+def circuit_id(candidate: Dict[str, Any]) -> str:
+    """(provider, model, key) identity. Keys are fingerprinted, never stored."""
+    key_fp = hashlib.sha1((candidate.get("key") or "").encode("utf-8")).hexdigest()[:10]
+    return f"{candidate['provider']}:{candidate['model']}:{key_fp}"
+
+
+class _LocalCircuit:
+    def __init__(self, window: int):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.outcomes = deque(maxlen=window)  # 1 = success, 0 = failure
+        self.latency_ewma: Optional[float] = None
+        self.probe_until = 0.0
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breaker per (provider, model, key) with a rolling error rate and
+    latency EWMA.
+
+    closed    -> calls flow; opens when the error rate over the last `window`
+                 calls passes `error_threshold` (after `min_requests` calls).
+    open      -> candidate is skipped until `open_seconds` have elapsed.
+    half_open -> exactly one probe call is let through (guarded by a Redis
+                 SET NX across workers); success closes, failure re-opens.
+
+    State lives in Redis when a client is given so every uvicorn worker shares
+    it; otherwise (or if Redis errors) it falls back to process memory.
+    """
+    PREFIX = "llm_cb"
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self.window = settings.LLM_CIRCUIT_WINDOW
+        self.min_requests = settings.LLM_CIRCUIT_MIN_REQUESTS
+        self.error_threshold = settings.LLM_CIRCUIT_ERROR_THRESHOLD
+        self.open_seconds = settings.LLM_CIRCUIT_OPEN_SECONDS
+        self.probe_seconds = settings.LLM_CIRCUIT_PROBE_SECONDS
+        self._local: Dict[str, _LocalCircuit] = {}
+
+    # --- State access -----------------------------------------------------
+
+    def _local_circuit(self, cid: str) -> _LocalCircuit:
+        circuit = self._local.get(cid)
+        if circuit is None:
+            circuit = _LocalCircuit(self.window)
+            self._local[cid] = circuit
+        return circuit
+
+    async def _load_many(self, cids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch state for many circuits in one Redis round trip."""
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                for cid in cids:
+                    pipe.hgetall(f"{self.PREFIX}:{cid}")
+                    pipe.lrange(f"{self.PREFIX}:{cid}:outcomes", 0, self.window - 1)
+                raw = await pipe.execute()
+                out = {}
+                for i, cid in enumerate(cids):
+                    state, outcomes = raw[2 * i] or {}, raw[2 * i + 1] or []
+                    out[cid] = {
+                        "state": state.get("state", CLOSED),
+                        "opened_at": float(state.get("opened_at", 0) or 0),
+                        "latency_ewma": float(state["latency_ewma"]) if state.get("latency_ewma") else None,
+                        "outcomes": [int(o) for o in outcomes]
+                    }
+                return out
+            except Exception as e:
+                print(f"⚠️ Circuit breaker Redis read failed, using local state: {e}")
+        return {
+            cid: {
+                "state": c.state,
+                "opened_at": c.opened_at,
+                "latency_ewma": c.latency_ewma,
+                "outcomes": list(c.outcomes)
+            }
+            for cid, c in ((cid, self._local_circuit(cid)) for cid in cids)
+        }
+
+    async def _set_state(self, cid: str, state: str, reset_outcomes: bool = False):
+        now = time.time()
+        circuit = self._local_circuit(cid)
+        if circuit.state != state:
+            _state_changes.inc(circuit=cid, to=state)
+            print(f"🔌 Circuit {cid}: {circuit.state} -> {state}")
+        circuit.state = state
+        if state == OPEN:
+            circuit.opened_at = now
+        if reset_outcomes:
+            circuit.outcomes.clear()
+
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                mapping = {"state": state}
+                if state == OPEN:
+                    mapping["opened_at"] = now
+                pipe.hset(f"{self.PREFIX}:{cid}", mapping=mapping)
+                if reset_outcomes:
+                    pipe.delete(f"{self.PREFIX}:{cid}:outcomes")
+                if state != HALF_OPEN:
+                    pipe.delete(f"{self.PREFIX}:{cid}:probe")
+                await pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Circuit breaker Redis write failed: {e}")
+
+    async def _try_acquire_probe(self, cid: str) -> bool:
+        if self.redis_client:
+            try:
+                acquired = await self.redis_client.set(
+                    f"{self.PREFIX}:{cid}:probe", "1", nx=True, px=int(self.probe_seconds * 1000)
+                )
+                return bool(acquired)
+            except Exception as e:
+                print(f"⚠️ Circuit breaker probe lock failed: {e}")
+        circuit = self._local_circuit(cid)
+        now = time.time()
+        if circuit.probe_until > now:
+            return False
+        circuit.probe_until = now + self.probe_seconds
+        return True
+
+    # --- Scoring ------------------------------------------------------------
+
+    def _error_rate(self, outcomes: List[int]) -> float:
+        if not outcomes:
+            return 0.0
+        return 1.0 - (sum(outcomes) / len(outcomes))
+
+    def health_score(self, state: Dict[str, Any]) -> float:
+        """1.0 = perfectly healthy; penalised by error rate and slow latency."""
+        if state["state"] == OPEN:
+            return 0.0
+        success_rate = 1.0 - self._error_rate(state["outcomes"])
+        latency = state["latency_ewma"] or 0.0
+        return success_rate / (1.0 + latency / 10.0)
+
+    # --- Public API ---------------------------------------------------------
+
+    async def order(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drops candidates whose circuit is open and reorders the rest by health.
+        Health is bucketed so small differences keep the configured priority.
+        """
+        if not candidates:
+            return candidates
+        cids = [circuit_id(c) for c in candidates]
+        states = await self._load_many(cids)
+        now = time.time()
+
+        usable = []
+        for idx, (candidate, cid) in enumerate(zip(candidates, cids)):
+            state = states[cid]
+            if state["state"] in (OPEN, HALF_OPEN):
+                if now - state["opened_at"] < self.open_seconds:
+                    _skipped.inc(provider=candidate["provider"])
+                    continue
+                # Cooldown elapsed: let exactly one probe through across workers
+                if not await self._try_acquire_probe(cid):
+                    _skipped.inc(provider=candidate["provider"])
+                    continue
+                await self._set_state(cid, HALF_OPEN)
+                state = {**state, "state": HALF_OPEN}
+            bucket = int(self.health_score(state) * 4)
+            usable.append((-bucket, idx, candidate))
+
+        usable.sort(key=lambda item: (item[0], item[1]))
+        if len(usable) < len(candidates):
+            print(f"🔌 Circuit breakers skipped {len(candidates) - len(usable)} unhealthy candidate(s).")
+        return [item[2] for item in usable]
+
+    async def record(self, candidate: Dict[str, Any], success: bool, latency: Optional[float] = None):
+        cid = circuit_id(candidate)
+        circuit = self._local_circuit(cid)
+        circuit.outcomes.appendleft(1 if success else 0)
+        if latency is not None:
+            circuit.latency_ewma = latency if circuit.latency_ewma is None else 0.8 * circuit.latency_ewma + 0.2 * latency
+        outcomes = list(circuit.outcomes)
+
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.lpush(f"{self.PREFIX}:{cid}:outcomes", 1 if success else 0)
+                pipe.ltrim(f"{self.PREFIX}:{cid}:outcomes", 0, self.window - 1)
+                pipe.lrange(f"{self.PREFIX}:{cid}:outcomes", 0, self.window - 1)
+                pipe.hget(f"{self.PREFIX}:{cid}", "state")
+                if latency is not None:
+                    pipe.hset(f"{self.PREFIX}:{cid}", "latency_ewma", circuit.latency_ewma)
+                raw = await pipe.execute()
+                outcomes = [int(o) for o in raw[2]]
+                circuit.state = raw[3] or circuit.state
+            except Exception as e:
+                print(f"⚠️ Circuit breaker Redis write failed: {e}")
+
+        if success:
+            if circuit.state == HALF_OPEN:
+                await self._set_state(cid, CLOSED, reset_outcomes=True)
+            return
+
+        if circuit.state == HALF_OPEN:
+            await self._set_state(cid, OPEN)
+        elif circuit.state == CLOSED and len(outcomes) >= self.min_requests and self._error_rate(outcomes) >= self.error_threshold:
+            await self._set_state(cid, OPEN)
+
+    async def snapshot(self, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        cids = [circuit_id(c) for c in candidates]
+        states = await self._load_many(cids)
+        return {
+            cid: {
+                "state": s["state"],
+                "error_rate": round(self._error_rate(s["outcomes"]), 3),
+                "calls_in_window": len(s["outcomes"]),
+                "latency_ewma": s["latency_ewma"],
+                "health": round(self.health_score(s), 3)
+            }
+            for cid, s in states.items()
+        }
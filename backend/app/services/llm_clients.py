@@ -0,0 +1,87 @@
+from typing import Any, Dict, Tuple
+import asyncio
+import threading
+import weakref
+import google.ai.generativelanguage as glm
+from langchain_google_genai import ChatGoogleGenerativeAI
+from app.core.metrics import metrics
+
+_lookups = metrics.counter("llm_google_client_lookups_total", "Google client registry lookups (hit = reused instance)")
+
+
+class _LoopClients:
+    """Clients of one event loop: chat clients by (model, key, temperature), service clients by key."""
+    def __init__(self):
+        self.chat: Dict[Tuple[str, str, float], ChatGoogleGenerativeAI] = {}
+        self.service: Dict[str, Tuple[Any, Any]] = {}
+
+
+class GoogleClientRegistry:
+    """
+    Process-wide registry of prebuilt ChatGoogleGenerativeAI clients keyed by
+    (model, key, temperature). Clients are created lazily on first use and
+    reused for the life of the process, so auth and transport setup stay off
+    the request path. `ainvoke` holds no per-call state on the instance, so a
+    client can be shared by concurrent requests; the lock only guards creation.
+
+    ChatGoogleGenerativeAI sets its key with the process-wide genai.configure(),
+    and its GenerativeModel would pick up whichever default service client is
+    current at its first call. Each cached client is therefore bound to its
+    own key's service clients (one pair per key, shared across models), so key
+    rotation and the per-key breakers/rate buckets see the key actually used.
+
+    The async service client holds a grpc.aio channel tied to the event loop
+    it was created on, so clients are kept per running loop (weakly: a Celery
+    task's asyncio.run loop takes its clients with it when it is gone).
+    """
+    def __init__(self):
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _loop_clients(self) -> _LoopClients:
+        # Called under the lock; callers are coroutines, so a loop is running
+        loop = asyncio.get_running_loop()
+        clients = self._loops.get(loop)
+        if clients is None:
+            clients = self._loops[loop] = _LoopClients()
+        return clients
+
+    @staticmethod
+    def _bind_key(clients: _LoopClients, llm: ChatGoogleGenerativeAI, api_key: str):
+        pair = clients.service.get(api_key)
+        if pair is None:
+            options = {"api_key": api_key}
+            pair = (glm.GenerativeServiceClient(client_options=options),
+                    glm.GenerativeServiceAsyncClient(client_options=options))
+            clients.service[api_key] = pair
+        llm.client._client, llm.client._async_client = pair
+
+    def get(self, model: str, api_key: str, temperature: float = 0.3) -> ChatGoogleGenerativeAI:
+        """Must be called from a coroutine (the client is bound to the running loop)."""
+        registry_key = (model, api_key, temperature)
+        with self._lock:
+            clients = self._loop_clients()
+            client = clients.chat.get(registry_key)
+            if client is None:
+                client = ChatGoogleGenerativeAI(
+                    model=model,
+                    temperature=temperature,
+                    google_api_key=api_key,
+                    convert_system_message_to_human=True
+                )
+                self._bind_key(clients, client, api_key)
+                clients.chat[registry_key] = client
+                _lookups.inc(result="miss")
+            else:
+                _lookups.inc(result="hit")
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._loops.clear()
+
+    def __len__(self):
+        return sum(len(clients.chat) for clients in list(self._loops.values()))
+
+# Global Instance
+google_clients = GoogleClientRegistry()
@@ -0,0 +1,204 @@
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple, Deque
+from collections import deque
+from dataclasses import dataclass, replace
+import asyncio
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.deadline import cap as request_deadline_cap
+
+_hedges_launched = metrics.counter("llm_hedges_launched_total", "Extra candidates started because the primary was slow")
+_hedge_wins = metrics.counter("llm_hedge_wins_total", "Races won by a candidate other than the first one launched")
+_budget_exhausted = metrics.counter("llm_latency_budget_exhausted_total", "Races abandoned because the latency budget ran out")
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    How aggressively a role races provider candidates.
+
+    hedge_delay=None means "use the observed p-th percentile latency of the
+    candidate currently in flight" (falling back to default_hedge_delay until
+    enough samples exist). max_parallel=1 reproduces the old serial ladder.
+    """
+    enabled: bool = True
+    latency_budget: Optional[float] = 45.0
+    hedge_delay: Optional[float] = None
+    hedge_percentile: float = 0.9
+    default_hedge_delay: float = 4.0
+    min_hedge_delay: float = 0.5
+    max_parallel: int = 2
+
+
+# Per-role overrides (keys are normalised role names, e.g. "academic_agent").
+# Interactive agents hedge early; background generators stay closer to serial.
+ROLE_HEDGE_POLICIES: Dict[str, Dict[str, Any]] = {
+    "orchestrator": {"latency_budget": 30.0, "max_parallel": 3},
+    "reportgenerator": {"latency_budget": 90.0, "default_hedge_delay": 10.0, "max_parallel": 2},
+    "accreditation_manager": {"latency_budget": 90.0, "default_hedge_delay": 10.0},
+}
+
+
+def _normalise_role(role: str) -> str:
+    return (role or "").lower().replace(" ", "_")
+
+
+def get_hedge_policy(role: str) -> HedgePolicy:
+    """Resolve the policy for a role: defaults <- ROLE_HEDGE_POLICIES <- settings.LLM_HEDGE_POLICIES."""
+    policy = HedgePolicy(
+        enabled=settings.LLM_HEDGING_ENABLED,
+        latency_budget=settings.LLM_LATENCY_BUDGET,
+        hedge_delay=settings.LLM_HEDGE_DELAY,
+        max_parallel=settings.LLM_HEDGE_MAX_PARALLEL
+    )
+    key = _normalise_role(role)
+    overrides = dict(ROLE_HEDGE_POLICIES.get(key, {}))
+    overrides.update(settings.LLM_HEDGE_POLICIES.get(key, {}))
+    if overrides:
+        policy = replace(policy, **overrides)
+    if not policy.enabled:
+        policy = replace(policy, max_parallel=1)
+    return policy
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful call latencies per (provider, model), with
+    the completion size of each call when known (used to scale timeouts).
+    """
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._output_tokens: Dict[Tuple[str, str], Deque[int]] = {}
+
+    def record(self, provider: str, model: str, seconds: float, output_tokens: Optional[int] = None):
+        samples = self._samples.get((provider, model))
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._samples[(provider, model)] = samples
+        samples.append(seconds)
+        if output_tokens:
+            tokens = self._output_tokens.get((provider, model))
+            if tokens is None:
+                tokens = deque(maxlen=self.window)
+                self._output_tokens[(provider, model)] = tokens
+            tokens.append(output_tokens)
+
+    def sample_count(self, provider: str, model: str) -> int:
+        return len(self._samples.get((provider, model), ()))
+
+    def median_output_tokens(self, provider: str, model: str) -> Optional[int]:
+        tokens = self._output_tokens.get((provider, model))
+        if not tokens:
+            return None
+        return sorted(tokens)[len(tokens) // 2]
+
+    def percentile(self, provider: str, model: str, p: float, min_samples: int = 5) -> Optional[float]:
+        samples = self._samples.get((provider, model))
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, max(0, int(round(p * (len(ordered) - 1)))))
+        return ordered[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            f"{provider}:{model}": {
+                "samples": len(s),
+                "p50": self.percentile(provider, model, 0.5, min_samples=1),
+                "p90": self.percentile(provider, model, 0.9, min_samples=1),
+            }
+            for (provider, model), s in self._samples.items()
+        }
+
+# Global Instance (per worker)
+latency_tracker = LatencyTracker()
+
+
+def _hedge_delay_for(candidate: Dict[str, Any], policy: HedgePolicy) -> float:
+    if policy.hedge_delay is not None:
+        return policy.hedge_delay
+    observed = latency_tracker.percentile(candidate["provider"], candidate["model"], policy.hedge_percentile)
+    delay = observed if observed is not None else policy.default_hedge_delay
+    return max(policy.min_hedge_delay, delay)
+
+
+async def hedged_race(
+    candidates: List[Dict[str, Any]],
+    call: Callable[[Dict[str, Any]], Awaitable[Any]],
+    policy: HedgePolicy
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run candidates in priority order, starting the next one in parallel whenever
+    the newest in-flight candidate exceeds its hedge delay (up to max_parallel).
+    A failed candidate is replaced immediately. The first successful result wins
+    and every other in-flight call is cancelled.
+
+    Returns (result, winning_candidate). Raises the last error if all fail or
+    the latency budget (capped by the request deadline) runs out.
+    """
+    if not candidates:
+        raise Exception("No LLM candidates available.")
+
+    loop = asyncio.get_running_loop()
+    # The role's latency budget, tightened by the request's end-to-end deadline
+    budget = request_deadline_cap(policy.latency_budget)
+    deadline = loop.time() + budget if budget else None
+    pending: Dict[asyncio.Task, Dict[str, Any]] = {}
+    next_idx = 0
+    newest: Optional[Dict[str, Any]] = None
+    last_error: Optional[BaseException] = None
+
+    def launch():
+        nonlocal next_idx, newest
+        candidate = candidates[next_idx]
+        next_idx += 1
+        newest = candidate
+        pending[asyncio.create_task(call(candidate))] = candidate
+
+    launch()
+    try:
+        while pending or next_idx < len(candidates):
+            remaining = deadline - loop.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                _budget_exhausted.inc()
+                last_error = last_error or asyncio.TimeoutError(f"LLM latency budget of {budget:.1f}s exhausted.")
+                break
+
+            if not pending:
+                launch()
+                continue
+
+            can_hedge = next_idx < len(candidates) and len(pending) < policy.max_parallel
+            wait_for = remaining
+            if can_hedge:
+                delay = _hedge_delay_for(newest, policy)
+                wait_for = delay if remaining is None else min(delay, remaining)
+
+            done, _ = await asyncio.wait(list(pending), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge:
+                    print(f"⏱️ Hedging: {newest['provider']} {newest['model']} slow, starting next candidate in parallel.")
+                    _hedges_launched.inc()
+                    launch()
+                continue
+
+            for task in done:
+                candidate = pending.pop(task)
+                if task.cancelled():
+                    continue
+                error = task.exception()
+                if error is None:
+                    if candidate is not candidates[0]:
+                        _hedge_wins.inc()
+                    return task.result(), candidate
+                last_error = error
+
+            # Replace failed candidates straight away (the serial ladder's behaviour)
+            if not pending and next_idx < len(candidates):
+                launch()
+
+        raise last_error or Exception("All LLM candidates failed.")
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,308 @@
+from typing import Dict, List, Any, Optional, Tuple
+from contextvars import ContextVar
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.deadline import remaining as deadline_remaining
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+_queue_depth = metrics.gauge("llm_rate_limit_queue_depth", "Callers waiting for provider capacity, per bucket and priority")
+_wait_seconds = metrics.histogram("llm_rate_limit_wait_seconds", "Time spent queued for provider capacity")
+_timeouts = metrics.counter("llm_rate_limit_timeouts_total", "Callers that gave up waiting (deadline passed)")
+_throttled = metrics.counter("llm_rate_limit_provider_429_total", "429 / quota errors reported by providers")
+
+# Lower number = served first. Unknown names are treated as "standard".
+PRIORITIES = {"interactive": 0, "standard": 1, "background": 2}
+
+# Priority class of LLM calls made in the current task (chat defaults to interactive)
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+
+
+class RateLimitTimeout(Exception):
+    """No capacity before the caller's deadline. Not a provider failure."""
+
+
+# Two token buckets (requests, tokens) refilled continuously; capacity = one
+# minute's allowance. `reserve` is the fraction of each bucket this priority
+# may not dip into, which keeps headroom for interactive callers across workers.
+# Returns 0 if admitted, else the milliseconds to wait before retrying.
+_ACQUIRE_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local reserve = tonumber(ARGV[5])
+
+local state = redis.call('HMGET', key, 'r', 't', 'ts')
+local r = tonumber(state[1]) or rpm
+local t = tonumber(state[2]) or tpm
+local ts = tonumber(state[3]) or now
+local elapsed = math.max(now - ts, 0)
+r = math.min(rpm, r + elapsed * rpm / 60.0)
+t = math.min(tpm, t + elapsed * tpm / 60.0)
+
+local need_r = 1 + reserve * rpm
+local need_t = math.min(cost, tpm) + reserve * tpm
+if r >= need_r and t >= need_t then
+    r = r - 1
+    t = t - math.min(cost, tpm)
+    redis.call('HSET', key, 'r', r, 't', t, 'ts', now)
+    redis.call('EXPIRE', key, 120)
+    return 0
+end
+redis.call('HSET', key, 'r', r, 't', t, 'ts', now)
+redis.call('EXPIRE', key, 120)
+local wait_r = 0
+if r < need_r then wait_r = (need_r - r) * 60.0 / rpm end
+local wait_t = 0
+if t < need_t then wait_t = (need_t - t) * 60.0 / tpm end
+return math.ceil(math.max(wait_r, wait_t) * 1000)
+"""
+
+# Adjusts the token bucket after the call (actual - estimated), or drains it on a 429.
+_ADJUST_LUA = """
+local key = KEYS[1]
+local tpm = tonumber(ARGV[1])
+local delta = tonumber(ARGV[2])
+local drain = tonumber(ARGV[3])
+local t = tonumber(redis.call('HGET', key, 't') or tpm)
+t = math.max(-tpm, math.min(tpm, t - delta))
+if drain == 1 then
+    redis.call('HSET', key, 'r', 0, 't', math.min(t, 0), 'ts', ARGV[4])
+else
+    redis.call('HSET', key, 't', t)
+end
+redis.call('EXPIRE', key, 120)
+return 0
+"""
+
+
+class _LocalBucket:
+    """In-process fallback with the same semantics as the Lua script."""
+    def __init__(self, rpm: float, tpm: float):
+        self.r, self.t, self.ts = rpm, tpm, time.time()
+
+    def try_acquire(self, rpm: float, tpm: float, cost: float, reserve: float) -> float:
+        now = time.time()
+        elapsed = max(now - self.ts, 0)
+        self.r = min(rpm, self.r + elapsed * rpm / 60.0)
+        self.t = min(tpm, self.t + elapsed * tpm / 60.0)
+        self.ts = now
+        need_r, need_t = 1 + reserve * rpm, min(cost, tpm) + reserve * tpm
+        if self.r >= need_r and self.t >= need_t:
+            self.r -= 1
+            self.t -= min(cost, tpm)
+            return 0.0
+        wait_r = (need_r - self.r) * 60.0 / rpm if self.r < need_r else 0.0
+        wait_t = (need_t - self.t) * 60.0 / tpm if self.t < need_t else 0.0
+        return max(wait_r, wait_t)
+
+
+def bucket_id(candidate: Dict[str, Any]) -> str:
+    """Providers meter per API key. Keys are fingerprinted, never stored."""
+    key_fp = hashlib.sha1((candidate.get("key") or "").encode("utf-8")).hexdigest()[:10]
+    return f"{candidate['provider']}:{key_fp}"
+
+
+class ProviderRateLimiter:
+    """
+    Shared requests/min + tokens/min limiter per (provider, API key).
+
+    Buckets live in Redis (one atomic Lua call per attempt), so every uvicorn
+    and Celery worker draws from the same allowance; without Redis they fall
+    back to process memory. Within a worker, waiters for a bucket form a
+    priority queue and only the head polls Redis. Across workers, lower
+    priorities must leave a reserve in the bucket, so interactive chat keeps
+    headroom while background SAR generation is running.
+
+    A provider 429 drains the bucket so other callers queue instead of
+    repeating it.
+    """
+    PREFIX = "llm_rl"
+
+    def __init__(self):
+        self.redis_client = None
+        if redis is not None:
+            try:
+                self.redis_client = redis.from_url(os.getenv("REDIS_URL", settings.REDIS_URL), decode_responses=True)
+            except Exception as e:
+                print(f"⚠️ Failed to initialize Redis for LLM rate limiter: {e}")
+        self._local: Dict[str, _LocalBucket] = {}
+        self._waiters: Dict[str, List[list]] = {}   # bucket -> heap of [rank, seq, wake_future]
+        self._seq = itertools.count()
+        self._acquire_script = None
+        self._adjust_script = None
+
+    def limits(self, provider: str) -> Tuple[float, float]:
+        conf = settings.LLM_RATE_LIMITS.get(provider, {})
+        return float(conf.get("rpm", 60)), float(conf.get("tpm", 1_000_000))
+
+    async def _try_acquire(self, bid: str, provider: str, cost: int, reserve: float) -> float:
+        """One admission attempt. Returns seconds to wait (0 = admitted)."""
+        rpm, tpm = self.limits(provider)
+        if self.redis_client:
+            try:
+                if self._acquire_script is None:
+                    self._acquire_script = self.redis_client.register_script(_ACQUIRE_LUA)
+                wait_ms = await self._acquire_script(
+                    keys=[f"{self.PREFIX}:{bid}"], args=[time.time(), rpm, tpm, cost, reserve]
+                )
+                return int(wait_ms) / 1000.0
+            except Exception as e:
+                print(f"⚠️ Rate limiter Redis error, using local bucket: {e}")
+        bucket = self._local.get(bid)
+        if bucket is None:
+            bucket = self._local[bid] = _LocalBucket(rpm, tpm)
+        return bucket.try_acquire(rpm, tpm, cost, reserve)
+
+    async def acquire(self, candidate: Dict[str, Any], est_tokens: int,
+                      priority: Optional[str] = None, max_wait: Optional[float] = None):
+        """
+        Waits for capacity for one call of ~est_tokens tokens.
+        Raises RateLimitTimeout if none is available within max_wait seconds
+        (default: LLM_RATE_LIMIT_MAX_WAIT for the priority class, capped by
+        the request deadline).
+        """
+        if not settings.LLM_RATE_LIMIT_ENABLED:
+            return
+        priority = priority or llm_priority.get()
+        rank = PRIORITIES.get(priority, PRIORITIES["standard"])
+        reserve = settings.LLM_RATE_LIMIT_RESERVE.get(priority, 0.0)
+        if max_wait is None:
+            max_wait = settings.LLM_RATE_LIMIT_MAX_WAIT.get(priority, 10.0)
+        # Never queue past the request's end-to-end deadline
+        left = deadline_remaining()
+        if left is not None:
+            max_wait = max(0.0, min(max_wait, left))
+        bid = bucket_id(candidate)
+        provider = candidate["provider"]
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + max_wait
+        waiters = self._waiters.setdefault(bid, [])
+        entry = [rank, next(self._seq), loop.create_future()]
+        heapq.heappush(waiters, entry)
+        _queue_depth.inc(bucket=bid, priority=priority)
+        try:
+            while True:
+                # Wait until we are the highest-priority waiter for this bucket
+                if waiters[0] is not entry:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"No {provider} capacity within {max_wait:.1f}s ({priority})")
+                    if entry[2].done():
+                        entry[2] = loop.create_future()
+                    try:
+                        await asyncio.wait_for(asyncio.shield(entry[2]), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        raise RateLimitTimeout(f"No {provider} capacity within {max_wait:.1f}s ({priority})")
+                    continue
+
+                wait = await self._try_acquire(bid, provider, est_tokens, reserve)
+                if wait <= 0:
+                    _wait_seconds.observe(loop.time() - start, priority=priority)
+                    return
+                if loop.time() + wait > deadline:
+                    raise RateLimitTimeout(
+                        f"{provider} capacity in {wait:.1f}s exceeds the {max_wait:.1f}s deadline ({priority})"
+                    )
+                await asyncio.sleep(min(wait, 1.0))
+        except RateLimitTimeout:
+            _timeouts.inc(provider=provider, priority=priority)
+            raise
+        finally:
+            _queue_depth.dec(bucket=bid, priority=priority)
+            self._remove_waiter(bid, entry)
+
+    def _remove_waiter(self, bid: str, entry: list):
+        waiters = self._waiters.get(bid, [])
+        if entry in waiters:
+            waiters.remove(entry)
+            heapq.heapify(waiters)
+        if waiters and not waiters[0][2].done():
+            waiters[0][2].set_result(True)
+
+    async def _adjust(self, candidate: Dict[str, Any], delta: int, drain: bool):
+        bid = bucket_id(candidate)
+        rpm, tpm = self.limits(candidate["provider"])
+        if self.redis_client:
+            try:
+                if self._adjust_script is None:
+                    self._adjust_script = self.redis_client.register_script(_ADJUST_LUA)
+                await self._adjust_script(
+                    keys=[f"{self.PREFIX}:{bid}"], args=[tpm, delta, 1 if drain else 0, time.time()]
+                )
+                return
+            except Exception as e:
+                print(f"⚠️ Rate limiter Redis adjust error: {e}")
+        bucket = self._local.get(bid)
+        if bucket is None:
+            return
+        bucket.t = max(-tpm, min(tpm, bucket.t - delta))
+        if drain:
+            bucket.r, bucket.t, bucket.ts = 0.0, min(bucket.t, 0.0), time.time()
+
+    async def settle(self, candidate: Dict[str, Any], est_tokens: int, actual_tokens: int):
+        """Charges (or refunds) the difference between the estimate and real usage."""
+        if settings.LLM_RATE_LIMIT_ENABLED and actual_tokens and actual_tokens != est_tokens:
+            await self._adjust(candidate, actual_tokens - est_tokens, drain=False)
+
+    async def penalize(self, candidate: Dict[str, Any]):
+        """Provider said 429: empty the bucket so other callers wait for the refill."""
+        _throttled.inc(provider=candidate["provider"])
+        print(f"🚦 {candidate['provider']} quota exhausted for key {bucket_id(candidate)}; draining bucket.")
+        if settings.LLM_RATE_LIMIT_ENABLED:
+            await self._adjust(candidate, 0, drain=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.LLM_RATE_LIMIT_ENABLED,
+            "limits": settings.LLM_RATE_LIMITS,
+            "queue_depth": _queue_depth.snapshot(),
+            "wait_seconds": _wait_seconds.snapshot(),
+            "timeouts": _timeouts.snapshot(),
+            "provider_429": _throttled.snapshot()
+        }
+
+
+def _error_chain(error: BaseException):
+    """The error and its causes (SDKs and tenacity wrap provider errors)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Provider quota errors, from structured fields only: HTTP status 429
+    (httpx / OpenAI-style status_code, google.api_core code, OpenRouter error
+    body code) or Google's RESOURCE_EXHAUSTED status. Message text is not
+    inspected; a "429" in an id or token count is not a rate limit.
+    """
+    for exc in _error_chain(error):
+        status = getattr(exc, "status_code", None)
+        if status is None:
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+        code = getattr(exc, "code", None)
+        if 429 in (status, code) or str(status) == "429" or str(code) == "429":
+            return True
+        grpc_status = getattr(exc, "grpc_status_code", None)
+        if getattr(grpc_status, "name", None) == "RESOURCE_EXHAUSTED" or getattr(exc, "status", None) == "RESOURCE_EXHAUSTED":
+            return True
+    return False
+
+# Global Instance (waiter queues must be shared by every LLMService in the worker)
+rate_limiter = ProviderRateLimiter()
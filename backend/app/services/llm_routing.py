@@ -0,0 +1,180 @@
+from typing import Dict, List, Any, Optional
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import re
+from app.core.config import settings
+from app.core.metrics import metrics
+
+_tier_requests = metrics.counter("llm_tier_requests_total", "Provider calls per tier and decision source (classifier/override)")
+_tier_latency = metrics.histogram("llm_tier_latency_seconds", "End-to-end provider latency per tier")
+_tier_tokens = metrics.counter("llm_tier_tokens_total", "Tokens per tier (prompt/completion)")
+_tier_cost = metrics.counter("llm_tier_cost_usd_total", "Estimated spend per tier in USD")
+
+TIERS = ("trivial", "standard", "heavy")
+
+# Cheapest adequate chain per tier. Candidates are expanded per API key and
+# re-ordered by circuit-breaker health, as before; "heavy" keeps the full ladder.
+TIER_MODEL_CHAINS: Dict[str, List[Dict[str, str]]] = {
+    "trivial": [
+        {"provider": "google", "model": "gemini-2.5-flash-lite"},
+        {"provider": "google", "model": "gemini-2.5-flash"},
+        {"provider": "openrouter", "model": "google/gemini-2.5-flash"},
+        {"provider": "openrouter", "model": "mistralai/codestral-2508"},
+    ],
+    "standard": [
+        {"provider": "google", "model": "gemini-3-flash-preview"},
+        {"provider": "google", "model": "gemini-2.5-flash"},
+        {"provider": "openrouter", "model": "google/gemini-2.5-flash"},
+        {"provider": "openrouter", "model": "anthropic/claude-sonnet-4.6"},
+    ],
+    "heavy": [
+        {"provider": "google", "model": "gemini-3-flash-preview"},
+        {"provider": "google", "model": "gemini-3.1-pro-preview"},
+        {"provider": "openrouter", "model": "google/gemini-2.5-flash"},
+        {"provider": "openrouter", "model": "anthropic/claude-sonnet-4.6"},
+        {"provider": "openrouter", "model": "openai/gpt-5.5"},
+        {"provider": "openrouter", "model": "mistralai/codestral-2508"},
+    ],
+}
+
+# USD per 1M (input, output, cached_input) tokens. List prices when written; override
+# with settings.LLM_MODEL_PRICING as they change. Used for dashboards, not billing.
+# cached_input is the provider prompt-cache read price (defaults to input).
+MODEL_PRICING: Dict[str, Dict[str, float]] = {
+    "gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40, "cached_input": 0.025},
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached_input": 0.075},
+    "gemini-3-flash-preview": {"input": 0.50, "output": 3.00, "cached_input": 0.05},
+    "gemini-3.1-pro-preview": {"input": 2.00, "output": 12.00, "cached_input": 0.20},
+    "google/gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached_input": 0.075},
+    "anthropic/claude-sonnet-4.6": {"input": 3.00, "output": 15.00, "cached_input": 0.30},
+    "openai/gpt-5.5": {"input": 1.25, "output": 10.00, "cached_input": 0.125},
+    "mistralai/codestral-2508": {"input": 0.30, "output": 0.90},
+}
+
+# Set per request: X-LLM-Tier header (testing) and the Orchestrator's intent scores
+tier_override: ContextVar[Optional[str]] = ContextVar("llm_tier_override", default=None)
+intent_scores: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_intent_scores", default=None)
+
+_GREETING = re.compile(
+    r"^\s*(hi|hii+|hello|hey|thanks|thank you|ok|okay|good (morning|afternoon|evening)|bye)\b[\s!.?]*$", re.IGNORECASE
+)
+_LOOKUP = re.compile(r"\b(show|list|what is|what's|when is|where is|my)\b", re.IGNORECASE)
+_HEAVY = re.compile(
+    r"\b(generate|draft|analy[sz]e|analysis|compare|comparison|report|plan|strategy|forecast|trend|"
+    r"explain why|root cause|recommend|summari[sz]e|evaluate|audit|sar|ssr|aqar)\b", re.IGNORECASE
+)
+_VISUAL = re.compile(r"\b(chart|graph|plot|visuali[sz]e|diagram|breakdown|distribution|dashboard)\b", re.IGNORECASE)
+_TOOL = re.compile(r"\b(mark|apply|approve|submit|schedule|book|send|notify|update|create)\b", re.IGNORECASE)
+
+# Roles whose answers are long-form documents regardless of phrasing
+HEAVY_ROLES = {"reportgenerator", "accreditation_manager"}
+
+
+@dataclass
+class TierDecision:
+    tier: str
+    source: str = "classifier"
+    score: int = 0
+    reasons: List[str] = field(default_factory=list)
+
+
+def classify_query(query: str, role: str, context_tokens: int = 0,
+                   scores: Optional[Dict[str, int]] = None) -> TierDecision:
+    """
+    Local, rule-based complexity classifier (microseconds; no model call).
+    Points for length, long context, multi-domain intent, likely
+    visualizations and document/analysis verbs. Greetings and short lookups
+    are "trivial"; tool-style actions stay "standard" unless pushed up.
+    """
+    override = (tier_override.get() or "").lower()
+    if override in TIERS:
+        return TierDecision(override, source="override", reasons=["X-LLM-Tier header"])
+
+    role_key = (role or "").lower().replace(" ", "_")
+    if role_key in HEAVY_ROLES:
+        return TierDecision("heavy", score=99, reasons=[f"role:{role_key}"])
+
+    words = len(query.split())
+    if _GREETING.match(query) or (words <= 3 and not _HEAVY.search(query) and not _VISUAL.search(query)):
+        return TierDecision("trivial", reasons=["greeting" if _GREETING.match(query) else "short"])
+
+    score, reasons = 0, []
+    if words > 40:
+        score += 2
+        reasons.append("long_query")
+    elif words > 15:
+        score += 1
+        reasons.append("medium_query")
+    if context_tokens > 3000:
+        score += 1
+        reasons.append("large_context")
+    if _HEAVY.search(query):
+        score += 2
+        reasons.append("analysis_or_document")
+    if _VISUAL.search(query):
+        score += 1
+        reasons.append("visualization")
+    scores = scores if scores is not None else intent_scores.get()
+    if scores and sum(1 for s in scores.values() if s > 0) >= 2:
+        score += 1
+        reasons.append("multi_intent")
+    if _TOOL.search(query):
+        reasons.append("tool_action")
+    if score == 0 and _LOOKUP.search(query) and words <= 8:
+        return TierDecision("trivial", reasons=reasons + ["simple_lookup"])
+
+    return TierDecision("heavy" if score >= 3 else "standard", score=score, reasons=reasons)
+
+
+def model_chain(tier: str) -> List[Dict[str, str]]:
+    return TIER_MODEL_CHAINS.get(tier, TIER_MODEL_CHAINS["standard"])
+
+
+def estimate_cost(model: str, token_usage: Dict[str, Any]) -> float:
+    """
+    USD estimate from provider-reported usage (all tokens priced as input if unsplit).
+    Prompt tokens served from the provider's prompt cache are priced at cached_input.
+    """
+    pricing = settings.LLM_MODEL_PRICING.get(model) or MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    prompt = token_usage.get("prompt_tokens")
+    completion = token_usage.get("completion_tokens", 0) or 0
+    if prompt is None:
+        prompt, completion = token_usage.get("total_tokens", 0) or 0, 0
+    cached = min(token_usage.get("cached_tokens", 0) or 0, prompt)
+    cached_price = pricing.get("cached_input", pricing["input"])
+    return ((prompt - cached) * pricing["input"] + cached * cached_price + completion * pricing["output"]) / 1_000_000
+
+
+def record_tier_call(decision: TierDecision, model: str, latency: float, token_usage: Dict[str, Any]) -> float:
+    """Feeds the per-tier dashboard; returns the cost estimate."""
+    cost = estimate_cost(model, token_usage)
+    _tier_requests.inc(tier=decision.tier, source=decision.source)
+    _tier_latency.observe(latency, tier=decision.tier)
+    _tier_tokens.inc(token_usage.get("prompt_tokens", token_usage.get("total_tokens", 0)) or 0, tier=decision.tier, kind="prompt")
+    _tier_tokens.inc(token_usage.get("completion_tokens", 0) or 0, tier=decision.tier, kind="completion")
+    _tier_cost.inc(cost, tier=decision.tier, model=model)
+    return cost
+
+
+def tier_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-tier request count, mean latency, tokens and spend."""
+    out: Dict[str, Dict[str, Any]] = {
+        tier: {"requests": 0, "avg_latency_seconds": None, "latency_buckets": {}, "prompt_tokens": 0,
+               "completion_tokens": 0, "cost_usd": 0.0, "cost_by_model": {}}
+        for tier in TIERS
+    }
+    for entry in _tier_requests.snapshot():
+        out[entry["labels"]["tier"]]["requests"] += int(entry["value"])
+    for entry in _tier_latency.snapshot():
+        tier = out[entry["labels"]["tier"]]
+        tier["avg_latency_seconds"] = round(entry["sum"] / entry["count"], 3) if entry["count"] else None
+        tier["latency_buckets"] = entry["buckets"]
+    for entry in _tier_tokens.snapshot():
+        out[entry["labels"]["tier"]][f"{entry['labels']['kind']}_tokens"] += int(entry["value"])
+    for entry in _tier_cost.snapshot():
+        tier = out[entry["labels"]["tier"]]
+        tier["cost_usd"] = round(tier["cost_usd"] + entry["value"], 6)
+        tier["cost_by_model"][entry["labels"]["model"]] = round(entry["value"], 6)
+    return out
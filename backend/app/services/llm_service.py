@@ -1,21 +1,54 @@
 import os
 import json
-from typing import Dict, List, Any, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Dict, List, Any, Optional, AsyncIterator, Union
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.schemas.agent_schema import AgentResponse, ActionItem
 from dotenv import load_dotenv
 
 load_dotenv()
 
-import httpx
+import asyncio
 import datetime
 import hashlib
+import time
+import uuid
+from app.core.config import settings
+from app.core.http_client import http_pool
+from app.core.singleflight import SingleFlight
+from app.services.llm_circuit_breaker import CircuitBreakerRegistry
+from app.services.llm_clients import google_clients
+from app.services.json_stream import IncrementalJSONParser, STREAMED_ARRAYS
+from app.services.json_repair import parse_agent_payload, parse_llm_json
+from app.services.llm_cache import llm_cache, infer_cache_tags
+from app.services.semantic_cache import SemanticCache
+from app.services.prompt_budget import PromptContext, fit_to_budget, count_tokens
+from app.services.llm_routing import classify_query, model_chain, record_tier_call, tier_override, estimate_cost
+from app.services.llm_rate_limiter import rate_limiter, RateLimitTimeout, is_rate_limit_error
+from app.services.llm_hedging import get_hedge_policy, hedged_race, latency_tracker
+from app.services.llm_timeouts import adaptive_timeout, with_timeout, iter_with_timeout, DeadlineCutoff, EXPECTED_OUTPUT_TOKENS
+from app.core.deadline import clear_deadline, DeadlineExceeded
+from app.services.prompt_layout import build_agent_prompt, openai_message_content, cached_prompt_tokens, record_prompt_cache
+from app.services.usage_ledger import usage_ledger
 try:
     import redis.asyncio as redis
 except ImportError:
     redis = None
-# ... existing imports ...
+
+
+# Model chains per complexity tier live in app.services.llm_routing.TIER_MODEL_CHAINS
+
+
+class OpenRouterAPIError(Exception):
+    """Error object in an OpenRouter response body (HTTP 200 or mid-stream); keeps its code."""
+    def __init__(self, error: Any):
+        super().__init__(f"OpenRouter API Error: {error}")
+        self.error = error
+        self.status_code = error.get("code") if isinstance(error, dict) else None
+
+# Process-wide, so coalescing works across LLMService instances in one worker
+llm_singleflight = SingleFlight("llm")
+# Strong references to stale-while-revalidate refresh tasks
+_background_refreshes = set()
 
 class LLMService:
     def __init__(self):
@@ -28,6 +61,15 @@ class LLMService:
         self.google_api_keys = [k for k in self.google_api_keys if k]
 
         self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+
+        # LLM_STUB_BASE_URL points both providers at a local OpenAI-compatible
+        # stand-in (scripts/llm_stub_server.py) for offline load tests
+        self.stub_base_url = settings.LLM_STUB_BASE_URL
+        self.openrouter_url = f"{(self.stub_base_url or settings.OPENROUTER_BASE_URL).rstrip('/')}/chat/completions"
+        if self.stub_base_url:
+            self.google_api_keys = self.google_api_keys or ["stub-key-primary", "stub-key-backup"]
+            self.openrouter_api_key = self.openrouter_api_key or "stub-key"
+            print(f"🧪 LLM stub mode: all provider calls go to {self.stub_base_url}")
         
         if not self.google_api_keys:
             print("⚠️ WARNING: No GOOGLE_API_KEYs found.")
@@ -43,25 +85,31 @@ class LLMService:
             except Exception as e:
                 print(f"⚠️ Failed to initialize Redis: {e}")
 
-    async def _call_openrouter(self, model: str, messages: list) -> str:
-        """
-        Direct HTTP call to OpenRouter API (OpenAI compatible).
-        """
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_api_key}",
+        # Per (provider, model, key) circuit breakers; shared across workers via Redis
+        self.circuit_breakers = CircuitBreakerRegistry(self.redis_client)
+
+        # Exact-key cache, shared by every LLMService in this worker
+        self.response_cache = llm_cache
+
+        # Embedding-keyed second cache tier; the embedder is attached by the owning agent
+        self.semantic_cache = SemanticCache(self.redis_client)
+
+    def _openrouter_headers(self, api_key: Optional[str] = None) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {api_key or self.openrouter_api_key}",
             "HTTP-Referer": "http://localhost:3000", # Required by OpenRouter
             "X-Title": "ERP Agent", # Required by OpenRouter
             "Content-Type": "application/json"
         }
-        
+
+    def _openrouter_payload(self, model: str, messages: list, stream: bool = False) -> Dict[str, Any]:
         # Convert LangChain messages to OpenAI format
         formatted_messages = []
         for msg in messages:
             role = "user"
             if msg.type == "system": role = "system"
             elif msg.type == "ai": role = "assistant"
-            formatted_messages.append({"role": role, "content": msg.content})
+            formatted_messages.append({"role": role, "content": openai_message_content(model, role, msg.content)})
 
         payload = {
             "model": model,
@@ -69,254 +117,537 @@ class LLMService:
             "temperature": 0.3,
             "response_format": { "type": "json_object" } 
         }
+        if stream:
+            payload["stream"] = True
+            # Final SSE event carries usage (incl. cached prompt tokens)
+            payload["stream_options"] = {"include_usage": True}
+        return payload
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, json=payload, headers=headers, timeout=15.0, follow_redirects=True)
-            if resp.status_code != 200:
-                print(f"❌ OpenRouter Error ({resp.status_code}): {resp.text}")
-                resp.raise_for_status()
-            
-            data = resp.json()
-            # Handle cases where choices might be empty or error field exists
-            if 'error' in data:
-                raise Exception(f"OpenRouter API Error: {data['error']}")
-                
-            return data['choices'][0]['message']['content']
+    async def _call_openrouter(self, model: str, messages: list, priority: Optional[str] = None,
+                               expected_tokens: Optional[int] = None, purpose: str = "direct",
+                               template: Optional[str] = None) -> str:
+        """
+        Direct HTTP call to OpenRouter API (OpenAI compatible).
+        Queues on the shared provider rate limiter under the given priority class,
+        then runs under an adaptive timeout sized for expected_tokens of output.
+        Logged to the usage ledger with agent=purpose.
+        """
+        candidate = {"provider": "openrouter", "model": model, "key": self.openrouter_api_key}
+        est_tokens = self._estimate_call_tokens(messages)
+        await rate_limiter.acquire(candidate, est_tokens, priority=priority)
+        timeout = adaptive_timeout("openrouter", model, expected_tokens)
+        start = time.perf_counter()
+        try:
+            data = await self._call_openrouter_full(model, messages, timeout=timeout)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                await rate_limiter.penalize(candidate)
+            self._record_usage(purpose, start, "direct", candidate=candidate, success=False, template=template)
+            raise
+        usage = {**(data.get('usage') or {}), "cached_tokens": cached_prompt_tokens(data.get('usage'))}
+        latency_tracker.record("openrouter", model, time.perf_counter() - start, output_tokens=usage.get('completion_tokens'))
+        record_prompt_cache("openrouter", model, usage)
+        self._record_usage(purpose, start, "direct", token_usage=usage, candidate=candidate,
+                           cost=estimate_cost(model, usage), success='error' not in data, template=template)
+        await rate_limiter.settle(candidate, est_tokens, usage.get('total_tokens', 0))
+        # Handle cases where choices might be empty or error field exists
+        if 'error' in data:
+            error = OpenRouterAPIError(data['error'])
+            if is_rate_limit_error(error):
+                await rate_limiter.penalize(candidate)
+            raise error
 
-    async def _call_openrouter_full(self, model: str, messages: list) -> Dict:
+        return data['choices'][0]['message']['content']
+
+    async def _call_openrouter_full(self, model: str, messages: list, api_key: Optional[str] = None,
+                                    timeout: Optional[float] = None, provider: str = "openrouter") -> Dict:
         """
         Direct HTTP call to OpenRouter API (OpenAI compatible), returning full JSON.
+        Uses the app-scoped connection pool so fallback hops reuse keep-alive connections.
+        `timeout` bounds the whole call (default: the model's adaptive timeout).
         """
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_api_key}",
-            "HTTP-Referer": "http://localhost:3000",
-            "X-Title": "ERP Agent",
-            "Content-Type": "application/json"
-        }
+        timeout = timeout or adaptive_timeout(provider, model)
+        resp = await with_timeout(http_pool.post(
+            self.openrouter_url, json=self._openrouter_payload(model, messages),
+            headers=self._openrouter_headers(api_key), timeout=timeout
+        ), timeout, provider, model)
+        if resp.status_code != 200:
+            print(f"❌ OpenRouter Error ({resp.status_code}): {resp.text}")
+            resp.raise_for_status()
         
-        formatted_messages = []
-        for msg in messages:
-            role = "user"
-            if msg.type == "system": role = "system"
-            elif msg.type == "ai": role = "assistant"
-            formatted_messages.append({"role": role, "content": msg.content})
+        return resp.json()
 
-        payload = {
-            "model": model,
-            "messages": formatted_messages,
-            "temperature": 0.3,
-            "response_format": { "type": "json_object" } 
-        }
+    def _expand_candidates(self, models_to_try: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Flattens the model hierarchy into individually raceable candidates.
+        Google models are expanded once per rotated API key.
+        """
+        candidates = []
+        for entry in models_to_try:
+            if entry["provider"] == "google":
+                for key_idx, current_key in enumerate(self.google_api_keys):
+                    candidates.append({**entry, "key": current_key, "key_idx": key_idx})
+            elif entry["provider"] == "openrouter" and self.openrouter_api_key:
+                candidates.append({**entry, "key": self.openrouter_api_key, "key_idx": 0})
+        return candidates
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, json=payload, headers=headers, timeout=15.0, follow_redirects=True)
-            if resp.status_code != 200:
-                print(f"❌ OpenRouter Error ({resp.status_code}): {resp.text}")
-                resp.raise_for_status()
-            
-            return resp.json()
+    @staticmethod
+    def _estimate_call_tokens(messages: list) -> int:
+        """Rate-limiter charge for a call: prompt tokens plus the expected completion."""
+        return sum(count_tokens(m.content) for m in messages) + settings.LLM_RATE_LIMIT_OUTPUT_ESTIMATE
+
+    @staticmethod
+    def _record_usage(role: str, started: float, cache_status: str, token_usage: Optional[Dict[str, Any]] = None,
+                      candidate: Optional[Dict[str, Any]] = None, tier: Optional[str] = None,
+                      fallback_depth: Optional[int] = None, cost: float = 0.0, success: bool = True,
+                      template: Optional[str] = None):
+        """Queues one row for the usage ledger (written in background batches)."""
+        token_usage = token_usage or {}
+        fields = dict(
+            agent=role,
+            provider=candidate["provider"] if candidate else None,
+            model=candidate["model"] if candidate else None,
+            tier=tier,
+            cache_status=cache_status,
+            fallback_depth=fallback_depth,
+            latency_ms=int((time.perf_counter() - started) * 1000),
+            prompt_tokens=token_usage.get("prompt_tokens", 0) or 0,
+            completion_tokens=token_usage.get("completion_tokens", 0) or 0,
+            cached_tokens=token_usage.get("cached_tokens", 0) or 0,
+            total_tokens=token_usage.get("total_tokens", 0) or 0,
+            cost_usd=cost,
+            success=success
+        )
+        if template:
+            fields["template"] = template
+        usage_ledger.record(**fields)
+
+    def _cache_hit_response(self, data: Dict[str, Any], role: str, started: float, **metadata) -> AgentResponse:
+        """AgentResponse for a cache hit, logged to the usage ledger."""
+        self._record_usage(role, started, metadata["cache_status"])
+        return self._response_from_payload(data, role, **metadata)
+
+    async def _invoke_candidate(self, candidate: Dict[str, Any], messages: list, system_prompt: str,
+                                expected_tokens: Optional[int] = None):
+        """
+        Calls a single (provider, model, key) candidate and parses its JSON.
+        Returns (data, token_usage); raises on transport or parse failure, on
+        its adaptive timeout, RateLimitTimeout / DeadlineExceeded if the
+        request deadline leaves no time for it, or DeadlineCutoff if the
+        deadline cut the call short (these three do not count against the circuit).
+        """
+        provider = candidate["provider"]
+        model_name = candidate["model"]
+        est_tokens = self._estimate_call_tokens(messages)
+        await rate_limiter.acquire(candidate, est_tokens)
+        timeout = adaptive_timeout(provider, model_name, expected_tokens)
+        start = time.perf_counter()
+        raw_content = ""
+
+        try:
+            if provider == "google" and not self.stub_base_url:
+                print(f"🤖 Calling {provider.upper()} Model: {model_name} (Key #{candidate['key_idx'] + 1})...")
+                llm = google_clients.get(model_name, candidate["key"], temperature=0.3)
+                response_msg = await with_timeout(llm.ainvoke(messages), timeout, provider, model_name)
+                raw_content = response_msg.content.strip()
+                
+                # Capture Metadata (LangChain puts Gemini usage on the message itself)
+                usage = getattr(response_msg, "usage_metadata", None) or (response_msg.response_metadata or {}).get('usage_metadata')
+                if usage:
+                    token_usage = {
+                         "prompt_tokens": usage.get('input_tokens', 0),
+                         "completion_tokens": usage.get('output_tokens', 0),
+                         "total_tokens": usage.get('total_tokens', 0),
+                         "cached_tokens": cached_prompt_tokens(usage)
+                    }
+                else:
+                     # Estimate if not provided
+                     token_usage = {
+                         "total_tokens": count_tokens(raw_content) + count_tokens(system_prompt)
+                     }
+
+            elif provider in ("openrouter", "google"):
+                # Google only reaches this branch in stub mode (OpenAI-compatible wire format)
+                print(f"🤖 Calling {provider.upper()} Model: {model_name}...")
+                result_payload = await self._call_openrouter_full(
+                    model_name, messages, api_key=candidate["key"], timeout=timeout, provider=provider
+                )
+                if 'error' in result_payload:
+                    raise OpenRouterAPIError(result_payload['error'])
+                raw_content = result_payload['choices'][0]['message']['content']
+                
+                if 'usage' in result_payload:
+                    token_usage = {**result_payload['usage'], "cached_tokens": cached_prompt_tokens(result_payload['usage'])}
+                else:
+                    token_usage = {"total_tokens": count_tokens(raw_content)}
+            else:
+                raise ValueError(f"Unknown provider '{provider}'")
+
+            data = parse_agent_payload(raw_content, model=model_name)
+
+        except asyncio.CancelledError:
+            print(f"🛑 {provider} {model_name} cancelled (another candidate won).")
+            raise
+        except Exception as e:
+            print(f"⚠️ {provider} {model_name} (Key #{candidate['key_idx'] + 1}) Failed: {e}")
+            if is_rate_limit_error(e):
+                await rate_limiter.penalize(candidate)
+            # A timeout shortened to fit the request deadline says nothing about the provider
+            if not isinstance(e, DeadlineCutoff):
+                await self.circuit_breakers.record(candidate, success=False, latency=time.perf_counter() - start)
+            raise
+
+        latency = time.perf_counter() - start
+        latency_tracker.record(provider, model_name, latency, output_tokens=token_usage.get("completion_tokens"))
+        record_prompt_cache(provider, model_name, token_usage)
+        await self.circuit_breakers.record(candidate, success=True, latency=latency)
+        await rate_limiter.settle(candidate, est_tokens, token_usage.get("total_tokens", 0))
+        return data, token_usage
+
+    async def _stream_candidate(self, candidate: Dict[str, Any], messages: list, timeout: float,
+                                usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Yields raw text chunks from one candidate as the provider produces them.
+        Callers bound the whole stream with iter_with_timeout; `timeout` also
+        caps each HTTP read. Provider-reported usage is copied into `usage`.
+        """
+        provider = candidate["provider"]
+        model_name = candidate["model"]
+        if usage is None:
+            usage = {}
+        if provider == "google" and not self.stub_base_url:
+            llm = google_clients.get(model_name, candidate["key"], temperature=0.3)
+            async for chunk in llm.astream(messages):
+                if chunk.usage_metadata:
+                    # Per-chunk deltas; they sum to the call's totals
+                    for field, value in (("prompt_tokens", chunk.usage_metadata.get("input_tokens", 0)),
+                                         ("completion_tokens", chunk.usage_metadata.get("output_tokens", 0)),
+                                         ("cached_tokens", cached_prompt_tokens(chunk.usage_metadata))):
+                        usage[field] = usage.get(field, 0) + (value or 0)
+                if chunk.content:
+                    yield chunk.content
+        elif provider in ("openrouter", "google"):
+            async with http_pool.stream(
+                "POST", self.openrouter_url, json=self._openrouter_payload(model_name, messages, stream=True),
+                headers=self._openrouter_headers(candidate["key"]), timeout=timeout
+            ) as resp:
+                if resp.status_code != 200:
+                    await resp.aread()
+                    print(f"❌ OpenRouter Error ({resp.status_code}): {resp.text}")
+                    resp.raise_for_status()
+                # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    body = line[6:].strip()
+                    if body == "[DONE]":
+                        break
+                    event = json.loads(body)
+                    if 'error' in event:
+                        raise OpenRouterAPIError(event['error'])
+                    if event.get("usage"):
+                        usage.update(event["usage"], cached_tokens=cached_prompt_tokens(event["usage"]))
+                    choices = event.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        else:
+            raise ValueError(f"Unknown provider '{provider}'")
+
+    def frames_from_response(self, response: AgentResponse) -> List[Dict[str, Any]]:
+        """Stream frames for an already complete response (cache hits, mock mode, fallbacks)."""
+        frames = [{"type": "content", "delta": response.content}]
+        for field in STREAMED_ARRAYS:
+            for item in getattr(response, field):
+                frames.append({"type": "item", "field": field, "data": item.model_dump(mode="json")})
+        frames.append({"type": "final", "response": response.model_dump(mode="json")})
+        return frames
+
+    async def stream_response(self, role: str, query: str, context: Union[str, PromptContext], force_mock: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of get_response. Yields frames:
+          {"type": "content", "delta": "..."}                     - content tokens as they arrive
+          {"type": "item", "field": "action_items", "data": {...}} - each array element once complete
+          {"type": "final", "response": {...AgentResponse...}}     - always last; the source of truth
+        The final frame carries "replace": true when the stream had to restart on
+        another provider after partial output, so clients discard earlier frames.
+        The context is fitted to the role's token budget first (see _fit_context).
+        """
+        if force_mock:
+            for frame in self.frames_from_response(self._get_mock_response(role, query)):
+                yield frame
+            return
+
+        context, prompt_report = self._fit_context(role, query, context)
+        async for frame in self._stream_frames(role, query, context):
+            if frame["type"] == "final":
+                frame["response"]["metadata"]["prompt_budget"] = prompt_report
+            yield frame
+
+    async def _stream_frames(self, role: str, query: str, context: str) -> AsyncIterator[Dict[str, Any]]:
+        """Cache tiers, then provider streams in health order; see stream_response."""
+        started = time.perf_counter()
+        cache_key = self._cache_key(role, query, context)
+
+        cached_data, is_stale = await self.response_cache.get(cache_key)
+        if cached_data:
+            if is_stale:
+                self._schedule_refresh(role, query, context, cache_key)
+            response = self._cache_hit_response(cached_data, role, started, cache_status="stale" if is_stale else "exact")
+            for frame in self.frames_from_response(response):
+                yield frame
+            return
+
+        semantic_hit, query_vector = await self.semantic_cache.lookup(role, query, context)
+        if semantic_hit:
+            payload, similarity = semantic_hit
+            response = self._cache_hit_response(payload, role, started, cache_status="semantic", similarity=round(similarity, 4))
+            for frame in self.frames_from_response(response):
+                yield frame
+            return
+
+        system_prompt, messages = self._build_messages(role, query, context)
+        decision = classify_query(query, role, context_tokens=count_tokens(context))
+        candidates = await self.circuit_breakers.order(self._expand_candidates(model_chain(decision.tier)))
+        emitted = False
+
+        # Streams cannot be raced, so candidates are tried in health order. A
+        # failure before any output moves on to the next candidate.
+        for depth, candidate in enumerate(candidates):
+            provider, model_name = candidate["provider"], candidate["model"]
+            parser = IncrementalJSONParser()
+            raw_chunks = []
+            provider_usage: Dict[str, Any] = {}
+            est_tokens = self._estimate_call_tokens(messages)
+            try:
+                await rate_limiter.acquire(candidate, est_tokens)
+                timeout = adaptive_timeout(provider, model_name, EXPECTED_OUTPUT_TOKENS.get(decision.tier))
+            except DeadlineExceeded:
+                print(f"⏰ Request deadline reached; abandoning stream for '{query[:60]}'.")
+                break
+            except RateLimitTimeout as e:
+                print(f"🚦 Stream {provider} {model_name} skipped: {e}")
+                continue
+            start = time.perf_counter()
+            try:
+                print(f"📡 Streaming {provider.upper()} Model: {model_name} (timeout {timeout:.1f}s)...")
+                stream = self._stream_candidate(candidate, messages, timeout, usage=provider_usage)
+                async for chunk in iter_with_timeout(stream, timeout, provider, model_name):
+                    raw_chunks.append(chunk)
+                    for event in parser.feed(chunk):
+                        emitted = True
+                        if event[0] == "content":
+                            yield {"type": "content", "delta": event[1]}
+                        else:
+                            yield {"type": "item", "field": event[1], "data": event[2]}
+
+                raw_content = "".join(raw_chunks)
+                data = parse_agent_payload(raw_content, model=model_name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Stream {provider} {model_name} Failed: {e}")
+                if is_rate_limit_error(e):
+                    await rate_limiter.penalize(candidate)
+                if isinstance(e, DeadlineCutoff):
+                    break
+                await self.circuit_breakers.record(candidate, success=False, latency=time.perf_counter() - start)
+                if emitted:
+                    break
+                continue
+
+            latency = time.perf_counter() - start
+            await self.circuit_breakers.record(candidate, success=True, latency=latency)
+            token_usage = {
+                "prompt_tokens": provider_usage.get("prompt_tokens") or count_tokens(system_prompt) + count_tokens(query),
+                "completion_tokens": provider_usage.get("completion_tokens") or count_tokens(raw_content),
+                "cached_tokens": provider_usage.get("cached_tokens", 0)
+            }
+            latency_tracker.record(provider, model_name, latency, output_tokens=token_usage["completion_tokens"])
+            record_prompt_cache(provider, model_name, token_usage)
+            token_usage["total_tokens"] = token_usage["prompt_tokens"] + token_usage["completion_tokens"]
+            cost = record_tier_call(decision, model_name, latency, token_usage)
+            await rate_limiter.settle(candidate, est_tokens, token_usage["total_tokens"])
+            self._record_usage(role, started, "miss", token_usage, candidate, decision.tier, depth, cost)
+            response = await self._store_response(role, query, context, cache_key, data, token_usage, candidate, query_vector)
+            response.metadata.update(tier=decision.tier, tier_source=decision.source, cost_usd=round(cost, 6), fallback_depth=depth)
+            yield {"type": "final", "response": response.model_dump(mode="json")}
+            return
+
+        # Streaming failed: fall back to the regular (hedged, mock-protected) path
+        response = await self._generate(role, query, context, cache_key, query_vector)
+        yield {"type": "final", "response": response.model_dump(mode="json"), "replace": emitted}
+
+    def _response_from_payload(self, data: Dict[str, Any], role: str, **metadata) -> AgentResponse:
+        """Builds an AgentResponse from a parsed model/cached JSON payload."""
+        return AgentResponse(
+            content=data.get("content", "Error parsing content"),
+            action_items=data.get("action_items", []),
+            visualizations=data.get("visualizations", []),
+            components=data.get("components", []),
+            notifications=data.get("notifications", []),
+            documents_generated=data.get("documents_generated", []),
+            agent_name=data.get("agent_name", role),
+            token_usage=data.get("token_usage", {"total_tokens": 0}),
+            metadata=metadata
+        )
 
-    async def get_response(self, role: str, query: str, context: str, force_mock: bool = False) -> AgentResponse:
+    @staticmethod
+    def _cache_key(role: str, query: str, context: str) -> str:
+        key_content = f"{role}:{query}:{context}"
+        # A forced tier (X-LLM-Tier, for testing) must not be answered from another tier's entry
+        if tier_override.get():
+            key_content += f":tier={tier_override.get()}"
+        return f"llm_cache:{hashlib.md5(key_content.encode('utf-8')).hexdigest()}"
+
+    def _fit_context(self, role: str, query: str, context: Union[str, PromptContext]):
+        """
+        Fits the context to the role's prompt token budget, measured against
+        the real system template and query. Returns (context_text, report).
+        """
+        system_prompt, _ = self._build_messages(role, query, "")
+        overhead = count_tokens(system_prompt) + count_tokens(query)
+        return fit_to_budget(context or "", role, overhead)
+
+    async def get_response(self, role: str, query: str, context: Union[str, PromptContext], force_mock: bool = False) -> AgentResponse:
         """
         Generates a structured AgentResponse using the LLM with Multi-Provider Fallback.
+        A PromptContext is trimmed to the role's token budget; the actual vs
+        budgeted token counts are reported in metadata["prompt_budget"].
         """
         if force_mock:
             print(f"🚀 FORCE MOCK: Skipping LLM for '{query}'")
             return self._get_mock_response(role, query)
 
-        # Check Redis Cache
-        cache_key = None
-        if self.redis_client:
+        context, prompt_report = self._fit_context(role, query, context)
+        response = await self._resolve_response(role, query, context)
+        response.metadata["prompt_budget"] = prompt_report
+        return response
+
+    async def _resolve_response(self, role: str, query: str, context: str) -> AgentResponse:
+        """Cache tiers, then a (deduplicated) provider call."""
+        started = time.perf_counter()
+        cache_key = self._cache_key(role, query, context)
+
+        # Check Cache (in-process LRU, then compressed Redis)
+        cached_data, is_stale = await self.response_cache.get(cache_key)
+        if cached_data:
+            if is_stale:
+                # Stale-while-revalidate: answer now, refresh in the background
+                print(f"♻️ Cache STALE for query: '{query}', refreshing in background")
+                self._schedule_refresh(role, query, context, cache_key)
+                return self._cache_hit_response(cached_data, role, started, cache_status="stale")
+            print(f"✅ Cache HIT for query: '{query}'")
+            return self._cache_hit_response(cached_data, role, started, cache_status="exact")
+
+        # Semantic Cache (paraphrases of a query already answered from the same context)
+        semantic_hit, query_vector = await self.semantic_cache.lookup(role, query, context)
+        if semantic_hit:
+            payload, similarity = semantic_hit
+            return self._cache_hit_response(payload, role, started, cache_status="semantic", similarity=round(similarity, 4))
+
+        # Singleflight: concurrent identical requests in this worker share one provider call
+        response = await llm_singleflight.do(
+            cache_key,
+            lambda: self._generate_with_lock(role, query, context, cache_key, query_vector)
+        )
+        # Callers may mutate their response (metadata etc.), so never hand out the shared object
+        return response.model_copy(deep=True)
+
+    def _schedule_refresh(self, role: str, query: str, context: str, cache_key: str):
+        """Refreshes a stale entry off the request path (deduplicated by singleflight)."""
+        async def refresh():
+            # Runs in a copy of the request's context; it must not inherit the request deadline
+            clear_deadline()
+            return await llm_singleflight.do(cache_key, lambda: self._generate_with_lock(role, query, context, cache_key))
+
+        task = asyncio.create_task(refresh())
+        _background_refreshes.add(task)
+        task.add_done_callback(_background_refreshes.discard)
+
+    async def _generate_with_lock(self, role: str, query: str, context: str, cache_key: str, query_vector=None) -> AgentResponse:
+        """
+        Optional cross-worker singleflight: only the worker holding the Redis lock
+        calls the provider; the others poll the cache for its result and fall
+        back to calling the provider themselves if the lock holder gives up.
+        """
+        if not (self.redis_client and settings.LLM_SINGLEFLIGHT_REDIS_LOCK):
+            return await self._generate(role, query, context, cache_key, query_vector)
+
+        lock_key = f"{cache_key}:lock"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis_client.set(
+                lock_key, token, nx=True, px=int(settings.LLM_SINGLEFLIGHT_LOCK_TTL * 1000)
+            )
+        except Exception as e:
+            print(f"⚠️ Singleflight lock error: {e}")
+            return await self._generate(role, query, context, cache_key, query_vector)
+
+        if acquired:
             try:
-                key_content = f"{role}:{query}:{context}".encode('utf-8')
-                cache_key = f"llm_cache:{hashlib.md5(key_content).hexdigest()}"
-                cached_data = await self.redis_client.get(cache_key)
+                return await self._generate(role, query, context, cache_key, query_vector)
+            finally:
+                try:
+                    # Release only if we still own the lock
+                    if await self.redis_client.get(lock_key) == token:
+                        await self.redis_client.delete(lock_key)
+                except Exception as e:
+                    print(f"⚠️ Singleflight unlock error: {e}")
+
+        print(f"⏳ Singleflight: another worker is generating '{query}', waiting for cache...")
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        wait_until = loop.time() + settings.LLM_SINGLEFLIGHT_WAIT
+        try:
+            while loop.time() < wait_until:
+                await asyncio.sleep(settings.LLM_SINGLEFLIGHT_POLL_INTERVAL)
+                cached_data, _ = await self.response_cache.get(cache_key)
                 if cached_data:
-                    print(f"✅ Cache HIT for query: '{query}'")
-                    data = json.loads(cached_data)
-                    return AgentResponse(
-                        content=data.get("content", "Error parsing content"),
-                        action_items=data.get("action_items", []),
-                        visualizations=data.get("visualizations", []),
-                        components=data.get("components", []),
-                        notifications=data.get("notifications", []),
-                        documents_generated=data.get("documents_generated", []),
-                        agent_name=data.get("agent_name", role),
-                        token_usage=data.get("token_usage", {"total_tokens": 0})
-                    )
-            except Exception as e:
-                print(f"⚠️ Redis cache read error: {e}")
-
-        # Fallback Hierarchy: Google Native (Best) -> OpenRouter Free Tier (Backup)
-        # Fallback Hierarchy: Google Native (Best) -> OpenRouter Free Tier (Backup)
-        models_to_try = [
-            # Primary: Google Native (High Speed & Reliability)
-            {"provider": "google", "model": "gemini-3-flash-preview"},
-            {"provider": "google", "model": "gemini-3.1-pro-preview"},
-            
-            # --- OpenRouter Fallbacks ---
-            # 1. Google Gemini 2.5 Flash
-            {"provider": "openrouter", "model": "google/gemini-2.5-flash"},
-            # 2. Anthropic Claude Sonnet 4.6
-            {"provider": "openrouter", "model": "anthropic/claude-sonnet-4.6"},
-            # 3. OpenAI GPT 5.5
-            {"provider": "openrouter", "model": "openai/gpt-5.5"},
-            # 4. Mistral Codestral
-            {"provider": "openrouter", "model": "mistralai/codestral-2508"}
-        ]
+                    return self._cache_hit_response(cached_data, role, started, cache_status="coalesced")
+                if not await self.redis_client.exists(lock_key):
+                    break
+        except Exception as e:
+            print(f"⚠️ Singleflight wait error: {e}")
+        return await self._generate(role, query, context, cache_key, query_vector)
+
+    async def _generate(self, role: str, query: str, context: str, cache_key: str, query_vector=None) -> AgentResponse:
+        """
+        Calls the providers (cache already missed), stores the result and
+        falls back to the mock response if every candidate fails.
+        """
         last_error = None
-        token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        system_prompt, messages = self._build_messages(role, query, context)
 
-        system_prompt = f"""You are the {role} Agent for an Educational Institution ERP system (AICTE/NAAC compliant).
-        
-        **Your Goal**: Assist the user with their request using the provided context.
-        **Tone**: Professional, academic, data-driven.
-        
-        **Response Requirements**:
-        1. **Role-Based Insights**: Provide specific recommendations based on the user's role and the query context.
-        2. **MANDATORY Action Plans**: You MUST generate 1-3 concrete 'action_items'.
-        3. **Cross-Role Dependencies**: If the task requires input/approval from another role (e.g., 'Finance', 'HOD', 'Admin'), you MUST create an action item to 'Request [Item] from [Role]'.
-        
-        **Response Format**:
-        You must output valid JSON strictly matching this schema:
-        {{
-            "content": "The main conversational response. Keep it concise (max 3-4 sentences). Do NOT list actions here.",
-            "action_items": [
-                {{ "label": "Text (e.g., 'Request Budget Approval')", "action_type": "button|link|download", "variant": "primary|danger", "icon": "lucide-icon-name" }}
-            ],
-            "visualizations": [
-                {{
-                    "type": "pie|bar|line|mermaid",
-                    "title": "Chart Title",
-                    "data": {{ "labels": ["A", "B"], "values": [10, 20] }} OR {{ "code": "graph TD... [Mermaid Syntax]" }}
-                }}
-            ],
-            "components": [
-                {{
-                    "type": "KPICard|DataTable|ProgressTracker",
-                    "props": {{ "title": "Example", "value": "123", "columns": [], "rows": [] }}
-                }}
-            ],
-            "documents_generated": [
-                {{ "filename": "Report.pdf", "path": "/api/v1/documents/download?file=Name.pdf", "type": "pdf" }}
-            ]
-        }}
+        # Pick the cheapest adequate model chain for the query's complexity tier
+        decision = classify_query(query, role, context_tokens=count_tokens(context))
+        print(f"🧭 Tier '{decision.tier}' ({decision.source}: {', '.join(decision.reasons) or 'default'}) for '{query[:60]}'")
 
-        **Context**:
-        {context}
-        
-        **Strict Rules**:
-        1. **MANDATORY ACTIONS**: If no obvious action exists, provide a 'Suggested Follow-up' query as a button.
-        2. **Dependency Tracking**: For any task involving funds, hiring, or policy, explicitly add an action to Notify/Request the dependency.
-        3. **Visualizations**: Use "pie", "bar", "line", or "mermaid" only.
-        4. **Separation**: 'content' is for explanation. 'action_items' is for execution.
-        """
+        # Race candidates (Google models x rotated keys, then OpenRouter) under the role's hedge policy
+        candidates = await self.circuit_breakers.order(self._expand_candidates(model_chain(decision.tier)))
+        policy = get_hedge_policy(role)
+        expected_tokens = EXPECTED_OUTPUT_TOKENS.get(decision.tier)
 
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=query)
-        ]
+        async def attempt(candidate: Dict[str, Any]):
+            return await self._invoke_candidate(candidate, messages, system_prompt, expected_tokens)
 
-        # Retry Loop
-        for attempt in models_to_try:
-            provider = attempt["provider"]
-            model_name = attempt["model"]
-            
-            try:
-                print(f"🤖 Calling {provider.upper()} Model: {model_name}...")
-                raw_content = ""
-                
-                if provider == "google":
-                    # Try rotating keys for Google
-                    key_success = False
-                    for key_idx, current_key in enumerate(self.google_api_keys):
-                        try:
-                            if not current_key: continue
-                            print(f"🤖 Calling {provider.upper()} Model: {model_name} (Key #{key_idx + 1})...")
-                            
-                            llm = ChatGoogleGenerativeAI(
-                                model=model_name, 
-                                temperature=0.3,
-                                google_api_key=current_key,
-                                convert_system_message_to_human=True
-                            )
-                            response_msg = await llm.ainvoke(messages)
-                            raw_content = response_msg.content.strip()
-                            
-                            # Capture Metadata
-                            if response_msg.response_metadata and 'usage_metadata' in response_msg.response_metadata:
-                                usage = response_msg.response_metadata['usage_metadata']
-                                token_usage = {
-                                     "prompt_tokens": usage.get('input_tokens', 0),
-                                     "completion_tokens": usage.get('output_tokens', 0),
-                                     "total_tokens": usage.get('total_tokens', 0)
-                                }
-                            else:
-                                 # Estimate if not provided
-                                 token_usage = {
-                                     "total_tokens": len(raw_content) // 4 + len(system_prompt) // 4
-                                 }
-                            
-                            key_success = True
-                            break # Success! Exit key loop
-                            
-                        except Exception as key_err:
-                            print(f"⚠️ Key #{key_idx + 1} Failed: {key_err}")
-                            continue # Try next key
-                    
-                    if not key_success:
-                        raise Exception("All Google API Keys failed.")
-                
-                elif provider == "openrouter":
-                    result_payload = await self._call_openrouter_full(model_name, messages)
-                    raw_content = result_payload['choices'][0]['message']['content']
-                    
-                    if 'usage' in result_payload:
-                        token_usage = result_payload['usage']
-                    else:
-                        token_usage = {"total_tokens": len(raw_content) // 4}
-
-                # Cleanup Markdown
-                raw_content = raw_content.strip()
-                if raw_content.startswith("```json"):
-                    raw_content = raw_content[7:]
-                elif raw_content.startswith("```"):
-                    raw_content = raw_content[3:]
-                if raw_content.endswith("```"):
-                    raw_content = raw_content[:-3]
-                
-                raw_content = raw_content.strip()
-                data = json.loads(raw_content)
-                
-                # Save to cache if enabled
-                if self.redis_client and cache_key:
-                    try:
-                        data['agent_name'] = role
-                        data['token_usage'] = token_usage
-                        # Cache for 1 hour
-                        await self.redis_client.setex(cache_key, 3600, json.dumps(data))
-                        print(f"✅ Cached LLM response for '{query}'")
-                    except Exception as e:
-                        print(f"⚠️ Redis cache write error: {e}")
-
-                return AgentResponse(
-                    content=data.get("content", "Error parsing content"),
-                    action_items=data.get("action_items", []),
-                    visualizations=data.get("visualizations", []),
-                    components=data.get("components", []),
-                    notifications=data.get("notifications", []),
-                    documents_generated=data.get("documents_generated", []),
-                    agent_name=role,
-                    token_usage=token_usage
-                )
+        start = time.perf_counter()
+        try:
+            (data, token_usage), winner = await hedged_race(candidates, attempt, policy)
+            cost = record_tier_call(decision, winner["model"], time.perf_counter() - start, token_usage)
+            depth = candidates.index(winner)
+            self._record_usage(role, start, "miss", token_usage, winner, decision.tier, depth, cost)
+            response = await self._store_response(role, query, context, cache_key, data, token_usage, winner, query_vector)
+            response.metadata.update(tier=decision.tier, tier_source=decision.source, cost_usd=round(cost, 6), fallback_depth=depth)
+            return response
 
-            except Exception as e:
-                print(f"⚠️ {provider} {model_name} Failed: {e}")
-                last_error = e
-                continue # Try next model
-        
-        if str(os.getenv("ENABLE_MOCK_FALLBACK", "true")).lower() != "true":
+        except Exception as e:
+            print(f"⚠️ All candidates failed or budget exhausted: {e}")
+            last_error = e
+        mock_fallback = str(os.getenv("ENABLE_MOCK_FALLBACK", "true")).lower() == "true"
+        self._record_usage(role, start, "mock_fallback" if mock_fallback else "failed", tier=decision.tier, success=False)
+
+        if not mock_fallback:
             print("❌ Mock Fallback Disabled by User Config. Raising Error.")
             if last_error:
                 raise last_error
@@ -329,6 +660,41 @@ class LLMService:
         
         return self._get_mock_response(role, query)
 
+    def _build_messages(self, role: str, query: str, context: str):
+        """
+        Returns (system_prompt, messages) for a structured AgentResponse request.
+        The system prompt opens with the byte-identical AGENT_PROMPT_PREFIX so
+        providers can serve it from their prompt cache; role and context follow it.
+        """
+        system_prompt = build_agent_prompt(role, context)
+
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=query)
+        ]
+        return system_prompt, messages
+
+    async def _store_response(self, role: str, query: str, context: str, cache_key: str, data: Dict[str, Any],
+                              token_usage: Dict[str, Any], winner: Dict[str, Any], query_vector=None) -> AgentResponse:
+        """Caches a freshly generated payload (exact + semantic tiers) and builds the AgentResponse."""
+        data['agent_name'] = role
+        data['token_usage'] = token_usage
+
+        # Save to cache (local LRU + compressed Redis). Tagged answers live for
+        # days and are evicted by their domain's events; untagged ones
+        # (timetables, briefings) have no event and keep the short TTL.
+        tags = infer_cache_tags(role, query)
+        ttl = settings.LLM_CACHE_TAGGED_TTL if tags else settings.LLM_CACHE_TTL
+        await self.response_cache.set(cache_key, data, ttl=ttl, tags=tags)
+        print(f"✅ Cached LLM response for '{query}' (tags={tags or 'none'}, ttl={ttl}s)")
+        if self.semantic_cache.active:
+            await self.semantic_cache.store(role, query, context, data, vector=query_vector)
+            await self.response_cache.tag_keys(tags, [self.semantic_cache.scope_key(role, context)], ttl)
+
+        return self._response_from_payload(
+            data, role, cache_status="miss", provider=winner["provider"], model=winner["model"]
+        )
+
     def _get_mock_response(self, role: str, query: str) -> AgentResponse:
         """
         Returns a deterministic mock response based on keywords. 
@@ -625,6 +991,17 @@ class LLMService:
         """
         Generates a specific section of the SAR report using LLM.
         """
+        try:
+            return await self.generate_sar_section(section_title, program_data)
+        except Exception as e:
+            print(f"Narrative gen error: {e}")
+            return "Narrative generation failed. Please try again later."
+
+    async def generate_sar_section(self, section_title: str, program_data: Dict[str, Any]) -> str:
+        """
+        Same as generate_sar_narrative but raises on failure, so batch runs
+        (app.services.sar_batch) never cache or checkpoint a failed section.
+        """
         prompt = f"""
         You are an expert in Washington Accord Accreditation and Outcome-Based Education (OBE).
         
@@ -648,28 +1025,15 @@ class LLMService:
         5. Format: Markdown.
         """
         
-        # Use simpler message structure for internal method
-        payload = [
-            {"role": "system", "content": "You are an academic accreditation consultant."},
-            {"role": "user", "content": prompt}
-        ]
-        
-        # Manually construct object that looks like Langchain message for _call_openrouter if needed
-        # Or better, just adapt _call_openrouter or use direct client 
-        # But for valid reuse, let's just assume _call_openrouter accepts objects with .type/.content
-        # OR just instantiate HumanMessage here
-        
         messages = [
             SystemMessage(content="You are an academic accreditation consultant."),
             HumanMessage(content=prompt)
         ]
         
-        try:
-             # Using the free model as default
-            return await self._call_openrouter("google/gemini-2.5-flash", messages)
-        except Exception as e:
-            print(f"Narrative gen error: {e}")
-            return "Narrative generation failed. Please try again later."
+        # Using the free model as default; queued behind interactive chat.
+        # 300-500 words of Markdown is ~900 tokens, so the timeout is sized for that.
+        return await self._call_openrouter("google/gemini-2.5-flash", messages, priority="background", expected_tokens=900,
+                                           purpose="SAR Generator", template=section_title)
 
     async def analyze_gaps_with_llm(self, po_attainment: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -710,11 +1074,9 @@ class LLMService:
         
         try:
             # Using a model good at JSON instructions
-            response_str = await self._call_openrouter("google/gemini-2.5-flash", messages)
-            # Ensure we parse the JSON
-            # Often models wrap json in ```json ... ```
-            cleaned_str = response_str.replace("```json", "").replace("```", "").strip()
-            return json.loads(cleaned_str)
+            response_str = await self._call_openrouter("google/gemini-2.5-flash", messages, purpose="Gap Analysis")
+            data, _ = parse_llm_json(response_str, model="google/gemini-2.5-flash")
+            return data
         except Exception as e:
             print(f"Gap analysis error: {e}")
             return {"gaps": [], "error": str(e)}
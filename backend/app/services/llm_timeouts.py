@@ -0,0 +1,122 @@
+from typing import Dict, Any, Optional, AsyncIterator, Awaitable, TypeVar
+import asyncio
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.deadline import cap as deadline_cap, remaining as deadline_remaining, DeadlineExceeded
+from app.services.llm_hedging import latency_tracker
+
+_timeout_seconds = metrics.histogram(
+    "llm_timeout_seconds", "Timeout chosen per provider call", buckets=(2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180)
+)
+_timeouts = metrics.counter("llm_call_timeouts_total", "Provider calls cut off by their adaptive timeout or the request deadline")
+
+T = TypeVar("T")
+
+# Expected completion size per tier, used when the caller has no better estimate
+EXPECTED_OUTPUT_TOKENS: Dict[str, int] = {"trivial": 300, "standard": 800, "heavy": 1600}
+
+# A timeout that expires this close to the request deadline was the deadline's
+DEADLINE_SLACK = 0.05
+
+
+class DeadlineCutoff(asyncio.TimeoutError):
+    """
+    A call cut off because the request deadline ran out (its timeout had been
+    shortened to fit), not because the provider exceeded its own timeout.
+    Not a provider failure: it must not count against the circuit breaker.
+    """
+
+
+def _expired(provider: str, model: str, kind: str, message: str) -> asyncio.TimeoutError:
+    left = deadline_remaining()
+    if left is not None and left <= DEADLINE_SLACK:
+        _timeouts.inc(provider=provider, model=model, kind="deadline")
+        return DeadlineCutoff(f"{message} (request deadline)")
+    _timeouts.inc(provider=provider, model=model, kind=kind)
+    return asyncio.TimeoutError(message)
+
+
+def _base_timeout(provider: str, model: str, expected_output_tokens: Optional[int] = None) -> float:
+    expected = expected_output_tokens or settings.LLM_RATE_LIMIT_OUTPUT_ESTIMATE
+    observed = latency_tracker.percentile(
+        provider, model, settings.LLM_TIMEOUT_PERCENTILE, min_samples=settings.LLM_TIMEOUT_MIN_SAMPLES
+    )
+    if observed is not None:
+        typical_tokens = latency_tracker.median_output_tokens(provider, model)
+        scale = max(1.0, expected / typical_tokens) if typical_tokens else 1.0
+        timeout = observed * settings.LLM_TIMEOUT_MULTIPLIER * scale
+    else:
+        timeout = settings.LLM_TIMEOUT_DEFAULT_BASE + expected / settings.LLM_TIMEOUT_DEFAULT_TOKENS_PER_SECOND
+    return min(settings.LLM_TIMEOUT_MAX, max(settings.LLM_TIMEOUT_MIN, timeout))
+
+
+def adaptive_timeout(provider: str, model: str, expected_output_tokens: Optional[int] = None) -> float:
+    """
+    Per-call timeout for (provider, model), from its rolling latency window.
+
+    With enough samples: the LLM_TIMEOUT_PERCENTILE latency x LLM_TIMEOUT_MULTIPLIER,
+    scaled up when this call expects a longer completion than the model's
+    median, so a long SAR section is not cut off at a chat-sized limit.
+    Before that: a fixed base plus a conservative tokens/second estimate.
+    Clamped to [LLM_TIMEOUT_MIN, LLM_TIMEOUT_MAX], then to the request deadline
+    (raises DeadlineExceeded if it has already passed).
+    """
+    timeout = _base_timeout(provider, model, expected_output_tokens)
+    try:
+        timeout = deadline_cap(timeout)
+    except DeadlineExceeded:
+        _timeouts.inc(provider=provider, model=model, kind="deadline")
+        raise
+    _timeout_seconds.observe(timeout, provider=provider)
+    return timeout
+
+
+async def with_timeout(awaitable: Awaitable[T], timeout: float, provider: str, model: str) -> T:
+    """
+    asyncio.wait_for that counts expiries and names the call in the error.
+    Raises DeadlineCutoff instead when the request deadline is what ran out.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise _expired(provider, model, "call", f"{provider} {model} timed out after {timeout:.1f}s")
+
+
+async def iter_with_timeout(stream: AsyncIterator[T], timeout: float, provider: str, model: str) -> AsyncIterator[T]:
+    """
+    Bounds the whole stream (not each chunk) to `timeout` seconds, so a
+    provider that trickles tokens cannot hold the request past its deadline.
+    Raises DeadlineCutoff when the request deadline is what ran out.
+    """
+    end = time.monotonic() + timeout
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            left = end - time.monotonic()
+            if left <= 0:
+                raise _expired(provider, model, "stream", f"{provider} {model} stream exceeded {timeout:.1f}s")
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=left)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise _expired(provider, model, "stream", f"{provider} {model} stream exceeded {timeout:.1f}s")
+            yield chunk
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def timeout_stats() -> Dict[str, Any]:
+    """Current timeout per tracked (provider, model) at the default completion size."""
+    current = {}
+    for key in latency_tracker.snapshot():
+        provider, model = key.split(":", 1)
+        current[key] = round(_base_timeout(provider, model), 2)
+    return {
+        "current": current,
+        "chosen": _timeout_seconds.snapshot(),
+        "expired": _timeouts.snapshot()
+    }
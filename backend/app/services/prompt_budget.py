@@ -0,0 +1,214 @@
+from typing import Dict, List, Any, Optional, Tuple, Union
+from dataclasses import dataclass, field
+import base64
+import hashlib
+import os
+import re
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_prompt_tokens = metrics.histogram(
+    "llm_prompt_tokens", "Assembled prompt size in tokens, per role",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+_trimmed = metrics.counter("llm_prompt_trimmed_total", "History turns / RAG chunks dropped to fit the budget")
+
+_encoding = None
+_encoding_failed = False
+_WORDS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+ENCODING_NAME = "cl100k_base"
+ENCODING_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+# cl100k_base split pattern and special tokens (the BPE ranks come from the preloaded file)
+_CL100K_PAT = r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+_CL100K_SPECIAL = {
+    "<|endoftext|>": 100257,
+    "<|fim_prefix|>": 100258,
+    "<|fim_middle|>": 100259,
+    "<|fim_suffix|>": 100260,
+    "<|endofprompt|>": 100276,
+}
+
+
+def encoding_cache_path() -> str:
+    # tiktoken caches a BPE file as sha1(url) inside TIKTOKEN_CACHE_DIR
+    return os.path.join(settings.TIKTOKEN_CACHE_DIR, hashlib.sha1(ENCODING_URL.encode()).hexdigest())
+
+
+def _load_ranks(path: str) -> Dict[bytes, int]:
+    with open(path, "rb") as f:
+        return {base64.b64decode(token, validate=True): int(rank)
+                for token, rank in (line.split() for line in f if line.strip())}
+
+
+def _get_encoding():
+    """
+    cl100k_base if tiktoken and the preloaded BPE file are available. The file
+    is parsed here rather than through tiktoken.get_encoding, which downloads
+    it again when it is missing or fails its hash check; a missing or corrupt
+    file falls back to the approximation instead.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and tiktoken is not None:
+        if not os.path.exists(encoding_cache_path()):
+            _encoding_failed = True
+            print(f"⚠️ tiktoken {ENCODING_NAME} not found in {settings.TIKTOKEN_CACHE_DIR} "
+                  f"(run scripts/fetch_tiktoken_encoding.py). Using approximate token counts.")
+            return None
+        try:
+            _encoding = tiktoken.Encoding(
+                name=ENCODING_NAME,
+                pat_str=_CL100K_PAT,
+                mergeable_ranks=_load_ranks(encoding_cache_path()),
+                special_tokens=_CL100K_SPECIAL
+            )
+        except Exception as e:
+            _encoding_failed = True
+            print(f"⚠️ tiktoken encoding unavailable ({e}). Using approximate token counts.")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count for budgeting. Exact for OpenAI-style BPE; Gemini and Claude
+    tokenizers differ by a few percent, which the budgets leave room for.
+    Without tiktoken, words/punctuation (x1.3) or chars/4, whichever is larger.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(len(text) // 4, int(len(_WORDS.findall(text)) * 1.3))
+
+
+def tokenizer_name() -> str:
+    return ENCODING_NAME if _get_encoding() is not None else "approx"
+
+
+# Per-role prompt budgets in tokens (keys are normalised role names, e.g. "finance_agent").
+# Covers the whole prompt: system template + context + query.
+ROLE_PROMPT_BUDGETS: Dict[str, int] = {
+    "orchestrator": 4000,
+    "reportgenerator": 12000,
+    "accreditation_manager": 12000,
+}
+
+
+def get_prompt_budget(role: str) -> int:
+    """Resolve a role's budget: LLM_PROMPT_TOKEN_BUDGET <- ROLE_PROMPT_BUDGETS <- settings.LLM_PROMPT_BUDGETS."""
+    key = (role or "").lower().replace(" ", "_")
+    return settings.LLM_PROMPT_BUDGETS.get(key, ROLE_PROMPT_BUDGETS.get(key, settings.LLM_PROMPT_TOKEN_BUDGET))
+
+
+_TURN_START = re.compile(r"^[A-Z][A-Z _]{0,20}:\s", re.MULTILINE)
+
+
+def split_history(history: Union[str, List[Any], None]) -> List[str]:
+    """
+    Splits conversation history into turns, oldest first. Accepts the
+    frontend's "USER: ...\\nASSISTANT: ..." string or a list of strings/dicts.
+    """
+    if not history:
+        return []
+    if isinstance(history, list):
+        turns = []
+        for turn in history:
+            if isinstance(turn, dict):
+                turns.append(f"{str(turn.get('role', 'user')).upper()}: {turn.get('content', '')}")
+            else:
+                turns.append(str(turn))
+        return turns
+    starts = [m.start() for m in _TURN_START.finditer(history)]
+    if not starts:
+        return [history.strip()]
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(history)]
+    return [history[a:b].strip() for a, b in zip(bounds, bounds[1:]) if history[a:b].strip()]
+
+
+@dataclass
+class PromptContext:
+    """
+    Unassembled prompt context: scored RAG chunks and conversation history.
+    LLMService fits it to the role's token budget when building the prompt.
+    """
+    chunks: List[Tuple[str, float]] = field(default_factory=list)   # (text, relevance score)
+    history: List[str] = field(default_factory=list)               # turns, oldest first
+
+    def render(self, chunks: Optional[List[Tuple[str, float]]] = None, history: Optional[List[str]] = None) -> str:
+        chunks = self.chunks if chunks is None else chunks
+        history = self.history if history is None else history
+        rag_text = "\n\n---\n\n".join(text for text, _ in chunks)
+        if not history:
+            return rag_text
+        return f"{rag_text}\n\n[Recent Conversation History]:\n" + "\n".join(history)
+
+
+def fit_to_budget(prompt_context: Union[PromptContext, str], role: str, overhead_tokens: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Renders the context so that overhead (system template + query) plus
+    context fits the role's budget. Trims the oldest history turns first,
+    then the lowest-scoring RAG chunks; chunks keep their retrieval order.
+
+    Plain string contexts (legacy callers) are measured but not trimmed.
+    Returns (context_text, report) where report goes into AgentResponse.metadata.
+    """
+    budget = get_prompt_budget(role)
+    available = max(budget - overhead_tokens, 0)
+    report: Dict[str, Any] = {"budget": budget, "tokenizer": tokenizer_name()}
+
+    if isinstance(prompt_context, str):
+        context_tokens = count_tokens(prompt_context)
+        report.update(context_tokens=context_tokens, prompt_tokens=overhead_tokens + context_tokens, trimmed=False)
+        _prompt_tokens.observe(report["prompt_tokens"], role=role)
+        return prompt_context, report
+
+    history = list(prompt_context.history)
+    chunks = list(prompt_context.chunks)
+    history_cost = [count_tokens(turn) + 1 for turn in history]
+    chunk_cost = [count_tokens(text) + 3 for text, _ in chunks]
+    separator_cost = 8 if history else 0
+    total = sum(history_cost) + sum(chunk_cost) + separator_cost
+
+    dropped_history = 0
+    while total > available and history:
+        history.pop(0)
+        total -= history_cost[dropped_history]
+        dropped_history += 1
+    if not history:
+        total -= separator_cost
+
+    # Drop lowest scores first, keeping the survivors in retrieval order
+    keep = set(range(len(chunks)))
+    for idx in sorted(range(len(chunks)), key=lambda i: chunks[i][1]):
+        if total <= available:
+            break
+        keep.discard(idx)
+        total -= chunk_cost[idx]
+    kept_chunks = [chunk for i, chunk in enumerate(chunks) if i in keep]
+    dropped_chunks = len(chunks) - len(kept_chunks)
+
+    text = prompt_context.render(kept_chunks, history)
+    context_tokens = count_tokens(text)
+    report.update(
+        context_tokens=context_tokens,
+        prompt_tokens=overhead_tokens + context_tokens,
+        trimmed=bool(dropped_history or dropped_chunks),
+        history_turns_kept=len(history),
+        history_turns_dropped=dropped_history,
+        rag_chunks_kept=len(kept_chunks),
+        rag_chunks_dropped=dropped_chunks
+    )
+    _prompt_tokens.observe(report["prompt_tokens"], role=role)
+    if dropped_history:
+        _trimmed.inc(dropped_history, role=role, kind="history")
+    if dropped_chunks:
+        _trimmed.inc(dropped_chunks, role=role, kind="rag_chunk")
+    return text, report
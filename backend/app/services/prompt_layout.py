@@ -0,0 +1,141 @@
+from typing import Dict, Any, Optional
+import hashlib
+from app.core.metrics import metrics
+from app.services.llm_routing import MODEL_PRICING
+from app.core.config import settings
+
+_prompt_cache_tokens = metrics.counter(
+    "llm_prompt_cache_tokens_total", "Prompt tokens per provider/model, split into cached (provider cache read) and uncached"
+)
+_prompt_cache_requests = metrics.counter("llm_prompt_cache_requests_total", "Provider calls with / without a prompt cache hit")
+
+# Fixed instructions and response schema shared by every role and request.
+# Providers cache prompts by exact prefix (OpenAI / Gemini implicitly, Anthropic
+# through cache_control breakpoints), so this block must stay byte-identical:
+# no f-string fields, no timestamps, and the role, context and query always
+# come after it. Editing it invalidates every provider cache once.
+AGENT_PROMPT_PREFIX = """You are an agent of an Educational Institution ERP system (AICTE/NAAC compliant). Your specific role and the context for this request are given at the end of these instructions.
+
+**Your Goal**: Assist the user with their request using the provided context.
+**Tone**: Professional, academic, data-driven.
+
+**Response Requirements**:
+1. **Role-Based Insights**: Provide specific recommendations based on the user's role and the query context.
+2. **MANDATORY Action Plans**: You MUST generate 1-3 concrete 'action_items'.
+3. **Cross-Role Dependencies**: If the task requires input/approval from another role (e.g., 'Finance', 'HOD', 'Admin'), you MUST create an action item to 'Request [Item] from [Role]'.
+
+**Response Format**:
+You must output valid JSON strictly matching this schema:
+{
+    "content": "The main conversational response. Keep it concise (max 3-4 sentences). Do NOT list actions here.",
+    "action_items": [
+        { "label": "Text (e.g., 'Request Budget Approval')", "action_type": "button|link|download", "variant": "primary|danger", "icon": "lucide-icon-name" }
+    ],
+    "visualizations": [
+        {
+            "type": "pie|bar|line|mermaid",
+            "title": "Chart Title",
+            "data": { "labels": ["A", "B"], "values": [10, 20] } OR { "code": "graph TD... [Mermaid Syntax]" }
+        }
+    ],
+    "components": [
+        {
+            "type": "KPICard|DataTable|ProgressTracker",
+            "props": { "title": "Example", "value": "123", "columns": [], "rows": [] }
+        }
+    ],
+    "documents_generated": [
+        { "filename": "Report.pdf", "path": "/api/v1/documents/download?file=Name.pdf", "type": "pdf" }
+    ]
+}
+
+**Strict Rules**:
+1. **MANDATORY ACTIONS**: If no obvious action exists, provide a 'Suggested Follow-up' query as a button.
+2. **Dependency Tracking**: For any task involving funds, hiring, or policy, explicitly add an action to Notify/Request the dependency.
+3. **Visualizations**: Use "pie", "bar", "line", or "mermaid" only.
+4. **Separation**: 'content' is for explanation. 'action_items' is for execution.
+"""
+
+PREFIX_FINGERPRINT = hashlib.sha256(AGENT_PROMPT_PREFIX.encode("utf-8")).hexdigest()[:12]
+
+# Models reached through OpenRouter that only cache behind an explicit breakpoint
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/",)
+
+
+def build_agent_prompt(role: str, context: str) -> str:
+    """Stable prefix first, then the per-role and per-request parts."""
+    return (
+        f"{AGENT_PROMPT_PREFIX}\n"
+        f"**Your Role**: You are the {role} Agent.\n\n"
+        f"**Context**:\n{context}\n"
+    )
+
+
+def openai_message_content(model: str, role: str, content: str) -> Any:
+    """
+    OpenAI-format message content. For models that need an explicit cache
+    breakpoint, a system prompt starting with the shared prefix is split so
+    the prefix carries cache_control; everything else stays a plain string.
+    """
+    if (role == "system" and model.startswith(CACHE_CONTROL_MODEL_PREFIXES)
+            and content.startswith(AGENT_PROMPT_PREFIX)):
+        return [
+            {"type": "text", "text": AGENT_PROMPT_PREFIX, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": content[len(AGENT_PROMPT_PREFIX):]},
+        ]
+    return content
+
+
+def cached_prompt_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    """
+    Cache-read tokens from a provider usage block: OpenAI/OpenRouter
+    prompt_tokens_details.cached_tokens, Anthropic cache_read_input_tokens,
+    or LangChain's input_token_details.cache_read (Gemini).
+    """
+    if not usage:
+        return 0
+    details = usage.get("prompt_tokens_details") or usage.get("input_token_details") or {}
+    return int(
+        details.get("cached_tokens") or details.get("cache_read")
+        or usage.get("cache_read_input_tokens") or usage.get("cached_tokens") or 0
+    )
+
+
+def record_prompt_cache(provider: str, model: str, token_usage: Dict[str, Any]):
+    """Counts cached vs uncached prompt tokens for a completed call."""
+    prompt = token_usage.get("prompt_tokens")
+    if prompt is None:
+        return
+    cached = min(int(token_usage.get("cached_tokens", 0) or 0), int(prompt))
+    _prompt_cache_tokens.inc(cached, provider=provider, model=model, kind="cached")
+    _prompt_cache_tokens.inc(int(prompt) - cached, provider=provider, model=model, kind="uncached")
+    _prompt_cache_requests.inc(provider=provider, model=model, hit="yes" if cached else "no")
+
+
+def prompt_cache_stats() -> Dict[str, Any]:
+    """Cache-read share of prompt tokens per model, and the input cost it saved."""
+    models: Dict[str, Dict[str, Any]] = {}
+    for entry in _prompt_cache_tokens.snapshot():
+        labels = entry["labels"]
+        model = models.setdefault(f"{labels['provider']}:{labels['model']}", {
+            "model": labels["model"], "cached_tokens": 0, "uncached_tokens": 0, "requests": 0, "hits": 0
+        })
+        model[f"{labels['kind']}_tokens"] += int(entry["value"])
+    for entry in _prompt_cache_requests.snapshot():
+        labels = entry["labels"]
+        model = models.get(f"{labels['provider']}:{labels['model']}")
+        if model is None:
+            continue
+        model["requests"] += int(entry["value"])
+        if labels["hit"] == "yes":
+            model["hits"] += int(entry["value"])
+
+    total_saved = 0.0
+    for model in models.values():
+        total = model["cached_tokens"] + model["uncached_tokens"]
+        model["cached_share"] = round(model["cached_tokens"] / total, 4) if total else 0.0
+        pricing = settings.LLM_MODEL_PRICING.get(model["model"]) or MODEL_PRICING.get(model["model"]) or {}
+        discount = pricing.get("input", 0.0) - pricing.get("cached_input", pricing.get("input", 0.0))
+        model["saved_usd"] = round(model["cached_tokens"] * discount / 1_000_000, 6)
+        total_saved += model["saved_usd"]
+    return {"prefix_fingerprint": PREFIX_FINGERPRINT, "models": models, "saved_usd": round(total_saved, 6)}
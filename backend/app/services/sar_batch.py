@@ -0,0 +1,310 @@
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.deadline import clear_deadline
+from app.services.llm_cache import llm_cache
+
+_sections = metrics.counter("sar_batch_sections_total", "SAR sections by source (checkpoint/cache/generated/failed)")
+_section_seconds = metrics.histogram("sar_batch_section_seconds", "Wall time per generated SAR section")
+
+# NBA SAR (Tier-II, UG Engineering) criteria sections
+NBA_SAR_SECTIONS: List[str] = [
+    "Executive Summary",
+    "Criterion 1: Vision, Mission and Program Educational Objectives",
+    "1.1 State the Vision and Mission of the Department and Institute",
+    "1.2 State the Program Educational Objectives (PEOs)",
+    "1.3 Process for Defining the Vision, Mission and PEOs",
+    "1.4 Consistency of PEOs with Mission of the Department",
+    "Criterion 2: Program Curriculum and Teaching-Learning Processes",
+    "2.1 Program Curriculum",
+    "2.2 Teaching-Learning Processes",
+    "Criterion 3: Course Outcomes and Program Outcomes",
+    "3.1 Establish the Correlation between the Courses and the POs & PSOs",
+    "3.2 Attainment of Course Outcomes",
+    "3.3 Attainment of Program Outcomes and Program Specific Outcomes",
+    "Criterion 4: Students' Performance",
+    "4.1 Enrolment Ratio",
+    "4.2 Success Rate in the Stipulated Period of the Program",
+    "4.5 Placement, Higher Studies and Entrepreneurship",
+    "Criterion 5: Faculty Information and Contributions",
+    "5.1 Student-Faculty Ratio",
+    "5.7 Research and Development",
+    "Criterion 6: Facilities and Technical Support",
+    "Criterion 7: Continuous Improvement",
+    "7.1 Actions Taken Based on the Results of Evaluation of Each of the POs & PSOs",
+    "Criterion 8: First Year Academics",
+    "Criterion 9: Student Support Systems",
+    "Criterion 10: Governance, Institutional Support and Financial Resources",
+]
+
+
+def program_data_hash(program_data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(program_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def checkpoint_field(index: int, title: str) -> str:
+    # By position as well as title: a batch may repeat a title (e.g. per-program sections)
+    return f"{index}:{title}"
+
+
+class _LocalRunStore:
+    """
+    In-process stand-in for the Redis run keys: each run expires after
+    SAR_CHECKPOINT_TTL (refreshed on write, like the Redis EXPIRE) and only
+    the most recently written `max_runs` are kept.
+    """
+    def __init__(self, max_runs: int):
+        self.max_runs = max_runs
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, run_id: str) -> Dict[str, Any]:
+        entry = self._data.get(run_id)
+        if entry is None:
+            return {}
+        if entry[0] <= time.time():
+            del self._data[run_id]
+            return {}
+        return entry[1]
+
+    def put(self, run_id: str, value: Dict[str, Any]):
+        now = time.time()
+        self._data[run_id] = (now + settings.SAR_CHECKPOINT_TTL, value)
+        self._data.move_to_end(run_id)
+        while self._data and (len(self._data) > self.max_runs or next(iter(self._data.values()))[0] <= now):
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SARBatchGenerator:
+    """
+    Generates many SAR sections concurrently and streams them back as they finish.
+
+    - Concurrency is bounded by a semaphore (SAR_BATCH_CONCURRENCY); the calls
+      also queue on the provider rate limiter as "background" priority, so
+      interactive chat keeps its headroom.
+    - Each finished section is cached under (program_data hash, section title),
+      so regenerating a report after unrelated edits only pays for sections
+      whose data changed.
+    - Each run checkpoints completed sections in Redis (in memory without it)
+      under its run_id; re-running with the same run_id resumes where a
+      crashed or disconnected run stopped.
+    - `start` runs a batch as a background job, detached from the calling
+      request's deadline (a full SAR takes minutes at background priority);
+      `status` reports its progress from the checkpoint. Only runs still in
+      progress are held in memory; a finished run leaves its summary next to
+      the checkpoint.
+    """
+    CHECKPOINT_PREFIX = "sar_run"
+    SUMMARY_PREFIX = "sar_run_summary"
+    SECTION_PREFIX = "sar_section"
+
+    def __init__(self, llm_service):
+        self.llm_service = llm_service
+        self.redis_client = llm_service.redis_client
+        # Fallback stores, used only without Redis (or when a Redis write fails)
+        self._local_checkpoints = _LocalRunStore(settings.SAR_LOCAL_MAX_RUNS)
+        self._local_summaries = _LocalRunStore(settings.SAR_LOCAL_MAX_RUNS)
+        self._jobs: Dict[str, asyncio.Task] = {}   # background runs in progress in this worker, by run_id
+        self._totals: Dict[str, int] = {}
+
+    @staticmethod
+    def run_id_for(jobs: List[Tuple[str, Dict[str, Any]]]) -> str:
+        """Deterministic id, so an identical request resumes the previous run."""
+        digest = hashlib.sha256()
+        for title, data in jobs:
+            digest.update(title.encode("utf-8"))
+            digest.update(program_data_hash(data).encode("utf-8"))
+        return digest.hexdigest()[:24]
+
+    def section_cache_key(self, title: str, program_data: Dict[str, Any]) -> str:
+        title_fp = hashlib.md5(title.encode("utf-8")).hexdigest()
+        return f"{self.SECTION_PREFIX}:{program_data_hash(program_data)}:{title_fp}"
+
+    # --- Checkpoints ----------------------------------------------------------
+
+    async def load_checkpoint(self, run_id: str) -> Dict[str, str]:
+        """Checkpointed narratives keyed by checkpoint_field(index, title)."""
+        if self.redis_client:
+            try:
+                return await self.redis_client.hgetall(f"{self.CHECKPOINT_PREFIX}:{run_id}") or {}
+            except Exception as e:
+                print(f"⚠️ SAR checkpoint read error: {e}")
+        return dict(self._local_checkpoints.get(run_id))
+
+    async def _checkpoint(self, run_id: str, index: int, title: str, narrative: str):
+        field = checkpoint_field(index, title)
+        if self.redis_client:
+            try:
+                key = f"{self.CHECKPOINT_PREFIX}:{run_id}"
+                pipe = self.redis_client.pipeline()
+                pipe.hset(key, field, narrative)
+                pipe.expire(key, settings.SAR_CHECKPOINT_TTL)
+                await pipe.execute()
+                return
+            except Exception as e:
+                print(f"⚠️ SAR checkpoint write error: {e}")
+        self._local_checkpoints.put(run_id, {**self._local_checkpoints.get(run_id), field: narrative})
+
+    async def load_summary(self, run_id: str) -> Dict[str, Any]:
+        if self.redis_client:
+            try:
+                raw = await self.redis_client.get(f"{self.SUMMARY_PREFIX}:{run_id}")
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                print(f"⚠️ SAR summary read error: {e}")
+        return dict(self._local_summaries.get(run_id))
+
+    async def _save_summary(self, run_id: str, summary: Dict[str, Any]):
+        if self.redis_client:
+            try:
+                await self.redis_client.set(f"{self.SUMMARY_PREFIX}:{run_id}", json.dumps(summary),
+                                            ex=settings.SAR_CHECKPOINT_TTL)
+                return
+            except Exception as e:
+                print(f"⚠️ SAR summary write error: {e}")
+        self._local_summaries.put(run_id, summary)
+
+    # --- Generation -----------------------------------------------------------
+
+    async def _section(self, index: int, title: str, program_data: Dict[str, Any],
+                       run_id: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        cache_key = self.section_cache_key(title, program_data)
+        cached, _ = await llm_cache.get(cache_key)
+        if cached:
+            _sections.inc(source="cache")
+            await self._checkpoint(run_id, index, title, cached["narrative"])
+            return {"type": "section", "index": index, "title": title, "narrative": cached["narrative"], "source": "cache"}
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                narrative = await self.llm_service.generate_sar_section(title, program_data)
+            except Exception as e:
+                _sections.inc(source="failed")
+                print(f"⚠️ SAR section '{title}' failed: {e}")
+                return {"type": "section", "index": index, "title": title, "error": str(e), "source": "failed"}
+            _section_seconds.observe(time.perf_counter() - start)
+
+        _sections.inc(source="generated")
+        await llm_cache.set(cache_key, {"narrative": narrative}, ttl=settings.SAR_SECTION_CACHE_TTL)
+        await self._checkpoint(run_id, index, title, narrative)
+        return {"type": "section", "index": index, "title": title, "narrative": narrative, "source": "generated"}
+
+    async def generate(self, jobs: List[Tuple[str, Dict[str, Any]]], run_id: Optional[str] = None,
+                       concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields {"type": "section", ...} events in completion order, then one
+        {"type": "done", ...} summary. Sections already in the run's checkpoint
+        are replayed first without calling the model.
+        """
+        run_id = run_id or self.run_id_for(jobs)
+        checkpoint = await self.load_checkpoint(run_id)
+        concurrency = max(1, min(concurrency or settings.SAR_BATCH_CONCURRENCY, settings.SAR_BATCH_MAX_CONCURRENCY))
+        semaphore = asyncio.Semaphore(concurrency)
+        completed, failed = 0, []
+
+        tasks = []
+        for index, (title, program_data) in enumerate(jobs):
+            field = checkpoint_field(index, title)
+            if field in checkpoint:
+                _sections.inc(source="checkpoint")
+                completed += 1
+                yield {"type": "section", "index": index, "title": title, "narrative": checkpoint[field], "source": "checkpoint"}
+                continue
+            tasks.append(asyncio.create_task(self._section(index, title, program_data, run_id, semaphore)))
+
+        if checkpoint:
+            print(f"♻️ SAR run {run_id}: resumed with {len(checkpoint)} checkpointed section(s), {len(tasks)} to go.")
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                if event["source"] == "failed":
+                    failed.append(event["title"])
+                else:
+                    completed += 1
+                yield event
+        finally:
+            # Client went away: stop spending tokens; finished sections are checkpointed
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        yield {"type": "done", "run_id": run_id, "total": len(jobs), "completed": completed, "failed": failed}
+
+    # --- Background jobs ------------------------------------------------------
+
+    def is_running(self, run_id: str) -> bool:
+        task = self._jobs.get(run_id)
+        return task is not None and not task.done()
+
+    def start(self, jobs: List[Tuple[str, Dict[str, Any]]], run_id: Optional[str] = None,
+              concurrency: Optional[int] = None) -> str:
+        """
+        Queues a run as a background task and returns its run_id at once.
+        A run already in progress in this worker is not started twice.
+        """
+        run_id = run_id or self.run_id_for(jobs)
+        if not self.is_running(run_id):
+            self._totals[run_id] = len(jobs)
+            task = asyncio.create_task(self._run_detached(jobs, run_id, concurrency))
+            self._jobs[run_id] = task
+            task.add_done_callback(lambda _: self._forget(run_id, task))
+        return run_id
+
+    def _forget(self, run_id: str, task: asyncio.Task):
+        # The generator lives as long as the worker; finished runs are served from the summary
+        if self._jobs.get(run_id) is task:
+            del self._jobs[run_id]
+            self._totals.pop(run_id, None)
+
+    async def _run_detached(self, jobs: List[Tuple[str, Dict[str, Any]]], run_id: str,
+                            concurrency: Optional[int]) -> Dict[str, Any]:
+        # The task inherited the caller's context; the chat deadline must not apply here
+        clear_deadline()
+        summary: Dict[str, Any] = {}
+        try:
+            async for event in self.generate(jobs, run_id=run_id, concurrency=concurrency):
+                if event["type"] == "done":
+                    summary = event
+        except Exception as e:
+            print(f"❌ SAR run {run_id} failed: {e}")
+            summary = {"run_id": run_id, "total": len(jobs), "failed": [], "error": str(e)}
+            await self._save_summary(run_id, summary)
+            return summary
+        print(f"📄 SAR run {run_id}: {summary['completed']}/{summary['total']} sections, {len(summary['failed'])} failed.")
+        await self._save_summary(run_id, summary)
+        return summary
+
+    async def status(self, run_id: str) -> Dict[str, Any]:
+        """
+        Progress of a run: "running" for a background run of this worker,
+        "finished" once a background run has saved its summary, otherwise
+        "checkpointed" (or "unknown") from the checkpoint alone.
+        """
+        checkpoint = await self.load_checkpoint(run_id)
+        result: Dict[str, Any] = {}
+        if self.is_running(run_id):
+            state = "running"
+        else:
+            result = await self.load_summary(run_id)
+            if result:
+                state = "finished"
+            else:
+                state = "checkpointed" if checkpoint else "unknown"
+        return {
+            "run_id": run_id,
+            "status": state,
+            "total": self._totals.get(run_id, result.get("total")),
+            "completed": len(checkpoint),
+            "failed": result.get("failed", []),
+            "error": result.get("error"),
+            "sections": [field.split(":", 1)[1] for field in checkpoint]
+        }
@@ -0,0 +1,158 @@
+from typing import Dict, List, Any, Optional, Callable, Tuple
+import asyncio
+import hashlib
+import json
+import math
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+
+_lookups = metrics.counter("llm_semantic_cache_lookups_total", "Semantic cache lookups by result (hit/miss)")
+_similarity = metrics.histogram(
+    "llm_semantic_cache_similarity",
+    "Best cosine similarity found per semantic cache lookup",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0)
+)
+
+
+def _normalise(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class SemanticCache:
+    """
+    Second cache tier keyed by query embedding.
+
+    Entries are scoped to (role, context fingerprint) so a paraphrased query
+    only matches answers produced from the same context. Within a scope the
+    closest stored query wins if its cosine similarity passes the threshold.
+    Vectors are stored L2-normalised, so cosine similarity is a dot product.
+
+    The embedding function is supplied by KnowledgeService (the same one the
+    ChromaDB collection uses); without it the cache is a no-op.
+    """
+    PREFIX = "llm_sem"
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self.enabled = settings.LLM_SEMANTIC_CACHE_ENABLED
+        self.threshold = settings.LLM_SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = settings.LLM_SEMANTIC_CACHE_MAX_ENTRIES
+        self.ttl = settings.LLM_SEMANTIC_CACHE_TTL
+        self.embedding_function: Optional[Callable[[List[str]], List[List[float]]]] = None
+        self._local: Dict[str, List[Dict[str, Any]]] = {}
+
+    def set_embedding_function(self, fn: Callable[[List[str]], List[List[float]]]):
+        self.embedding_function = fn
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.embedding_function is not None
+
+    def scope_key(self, role: str, context: str) -> str:
+        fingerprint = hashlib.md5((context or "").encode("utf-8")).hexdigest()
+        return f"{self.PREFIX}:{role}:{fingerprint}"
+
+    async def _embed(self, text: str) -> List[float]:
+        # Embedding runs a local model; keep it off the event loop
+        vectors = await asyncio.to_thread(self.embedding_function, [text])
+        return _normalise([float(v) for v in vectors[0]])
+
+    def _fresh(self, entries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Entries still within the TTL, and the index of the first expired one.
+        Lists are newest first, so everything from that index on can be trimmed.
+        """
+        now = time.time()
+        for i, entry in enumerate(entries):
+            if now - entry.get("ts", 0) >= self.ttl:
+                return entries[:i], i
+        return entries, len(entries)
+
+    async def _load_entries(self, scope: str) -> List[Dict[str, Any]]:
+        if self.redis_client:
+            try:
+                raw = await self.redis_client.lrange(scope, 0, self.max_entries - 1)
+                entries, cut = self._fresh([json.loads(r) for r in raw])
+                if cut < len(raw):
+                    # Writes refresh the key's expiry, so old answers must be dropped here.
+                    # Trim counted from the tail: entries pushed meanwhile are kept.
+                    await self.redis_client.ltrim(scope, 0, cut - len(raw) - 1)
+                return entries
+            except Exception as e:
+                print(f"⚠️ Semantic cache read error: {e}")
+                return []
+        entries, cut = self._fresh(self._local.get(scope, []))
+        if not entries:
+            self._local.pop(scope, None)
+        elif cut < len(self._local[scope]):
+            del self._local[scope][cut:]
+        return entries
+
+    async def lookup(self, role: str, query: str, context: str) -> Tuple[Optional[Tuple[Dict[str, Any], float]], Optional[List[float]]]:
+        """
+        Returns ((payload, similarity) or None, query_vector).
+        The vector is handed back so `store` does not embed the same query twice.
+        """
+        if not self.active:
+            return None, None
+        try:
+            vector = await self._embed(query)
+        except Exception as e:
+            print(f"⚠️ Semantic cache embedding error: {e}")
+            return None, None
+
+        entries = await self._load_entries(self.scope_key(role, context))
+        best, best_score = None, 0.0
+        for entry in entries:
+            score = _dot(vector, entry["embedding"])
+            if score > best_score:
+                best, best_score = entry, score
+
+        if entries:
+            _similarity.observe(best_score, role=role)
+        if best is not None and best_score >= self.threshold:
+            _lookups.inc(result="hit", role=role)
+            print(f"✅ Semantic cache HIT ({best_score:.3f}) for '{query}' ~ '{best['query']}'")
+            return (best["payload"], best_score), vector
+        _lookups.inc(result="miss", role=role)
+        return None, vector
+
+    async def store(self, role: str, query: str, context: str, payload: Dict[str, Any], vector: Optional[List[float]] = None):
+        if not self.active:
+            return
+        try:
+            vector = vector or await self._embed(query)
+        except Exception as e:
+            print(f"⚠️ Semantic cache embedding error: {e}")
+            return
+
+        scope = self.scope_key(role, context)
+        entry = {"query": query, "embedding": [round(v, 6) for v in vector], "payload": payload, "ts": time.time()}
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.lpush(scope, json.dumps(entry))
+                pipe.ltrim(scope, 0, self.max_entries - 1)
+                pipe.expire(scope, self.ttl)
+                await pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Semantic cache write error: {e}")
+            return
+        entries = self._local.setdefault(scope, [])
+        entries.insert(0, entry)
+        del entries[self.max_entries:]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "threshold": self.threshold,
+            "lookups": _lookups.snapshot(),
+            "similarity": _similarity.snapshot()
+        }
@@ -0,0 +1,104 @@
+from typing import Dict, List, Any, Optional, AsyncIterator
+import asyncio
+import time
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.tools.database_tools import DatabaseTools
+from app.tools.document_tools import DocumentTools
+
+_letters = metrics.counter("shortage_letters_total", "Attendance shortage letters by outcome (generated/missing/failed)")
+_batch_seconds = metrics.histogram("shortage_letter_batch_seconds", "Wall time of one bulk shortage letter run")
+
+
+async def stream_shortage_letters(student_ids: List[str], course_id: str,
+                                  db_tools: Optional[DatabaseTools] = None,
+                                  doc_tools: Optional[DocumentTools] = None,
+                                  concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Attendance shortage letters for many students of one course.
+
+    Students are loaded with IN queries and the course once, concurrently
+    (two sessions in total instead of two per student). Letters are rendered
+    by a fixed pool of workers (SHORTAGE_LETTER_CONCURRENCY, a client-supplied
+    value clamped to SHORTAGE_LETTER_MAX_CONCURRENCY) and yielded as
+    {"type": "letter", ...} events in completion order, then one
+    {"type": "done", ...} summary. Ids with no student record yield an event
+    with an error instead of a letter.
+    """
+    db_tools = db_tools or DatabaseTools()
+    doc_tools = doc_tools or DocumentTools()
+    start = time.perf_counter()
+    student_ids = list(dict.fromkeys(student_ids))
+    students, course_data = await asyncio.gather(db_tools.get_students_data(student_ids), db_tools.get_course_data(course_id))
+    load_seconds = time.perf_counter() - start
+
+    if not course_data:
+        yield {"type": "done", "course_id": course_id, "total": len(student_ids), "generated": 0,
+               "missing": [], "failed": [], "error": f"Course {course_id} not found"}
+        return
+
+    jobs: asyncio.Queue = asyncio.Queue()
+    results: asyncio.Queue = asyncio.Queue()
+    for student_id in student_ids:
+        jobs.put_nowait(student_id)
+
+    async def worker():
+        while True:
+            try:
+                student_id = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            student_data = students.get(str(student_id))
+            if not student_data:
+                await results.put({"type": "letter", "student_id": student_id, "error": "Student not found"})
+                continue
+            try:
+                url = await doc_tools.generate_attendance_shortage_letter(student_data=student_data, course_data=course_data)
+                await results.put({"type": "letter", "student_id": student_id, "name": student_data.get("name"), "url": url})
+            except Exception as e:
+                await results.put({"type": "letter", "student_id": student_id, "error": str(e)})
+
+    concurrency = min(concurrency or settings.SHORTAGE_LETTER_CONCURRENCY, settings.SHORTAGE_LETTER_MAX_CONCURRENCY)
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(student_ids))))]
+    generated, missing, failed = 0, [], []
+    try:
+        for _ in range(len(student_ids)):
+            event = await results.get()
+            if "url" in event:
+                generated += 1
+                _letters.inc(outcome="generated")
+            elif event["error"] == "Student not found":
+                missing.append(event["student_id"])
+                _letters.inc(outcome="missing")
+            else:
+                failed.append(event["student_id"])
+                _letters.inc(outcome="failed")
+            yield event
+    finally:
+        # Consumer went away: stop rendering
+        for task in workers:
+            if not task.done():
+                task.cancel()
+
+    elapsed = time.perf_counter() - start
+    _batch_seconds.observe(elapsed)
+    yield {"type": "done", "course_id": course_id, "total": len(student_ids), "generated": generated,
+           "missing": missing, "failed": failed, "load_seconds": round(load_seconds, 3), "seconds": round(elapsed, 3)}
+
+
+async def generate_shortage_letters(student_ids: List[str], course_id: str, **kwargs) -> Dict[str, Any]:
+    """Collects a whole run; letter_urls follow the requested student order."""
+    urls: Dict[str, str] = {}
+    summary: Dict[str, Any] = {}
+    async for event in stream_shortage_letters(student_ids, course_id, **kwargs):
+        if event["type"] == "letter":
+            if "url" in event:
+                urls[str(event["student_id"])] = event["url"]
+        else:
+            summary = event
+    return {
+        "status": "success" if not summary.get("error") else "error",
+        "letters_generated": len(urls),
+        "letter_urls": [urls[str(sid)] for sid in dict.fromkeys(student_ids) if str(sid) in urls],
+        **{k: v for k, v in summary.items() if k in ("missing", "failed", "error", "seconds")}
+    }
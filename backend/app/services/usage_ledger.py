@@ -0,0 +1,206 @@
+from typing import Dict, List, Any, Optional
+from contextvars import ContextVar
+import asyncio
+import datetime
+import time
+from sqlalchemy import select, insert, func, case, literal_column
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.llm_usage import LLMUsage
+
+_recorded = metrics.counter("llm_usage_ledger_rows_total", "Usage rows by outcome (queued/written/dropped)")
+_flush_seconds = metrics.histogram("llm_usage_ledger_flush_seconds", "Time to write one batch of usage rows")
+
+# Labels for usage rows recorded in the current request/task (user role, report template...)
+usage_labels: ContextVar[Optional[Dict[str, str]]] = ContextVar("llm_usage_labels", default=None)
+
+# Dimensions the aggregation endpoint can group by
+USAGE_DIMENSIONS = ("user_role", "agent", "template", "provider", "model", "tier", "cache_status", "fallback_depth")
+USAGE_BUCKETS = ("hour", "day", "week")
+CACHE_HIT_STATUSES = ("exact", "semantic", "stale", "coalesced")
+
+# VARCHAR lengths of llm_usage; one over-long value would fail the whole batch insert
+_STRING_LIMITS = {c.name: c.type.length for c in LLMUsage.__table__.columns if getattr(c.type, "length", None)}
+
+
+def tag_usage(**labels: Optional[str]):
+    """Adds labels to every usage row recorded from here on in this task (copy-on-write)."""
+    current = dict(usage_labels.get() or {})
+    current.update({k: v for k, v in labels.items() if v is not None})
+    usage_labels.set(current)
+
+
+class UsageLedger:
+    """
+    Append-only LLM usage log in Postgres (table llm_usage).
+
+    record() only enqueues, so the request path never waits on the database.
+    A single background task drains the queue and inserts rows in batches of
+    LLM_USAGE_BATCH_SIZE, or every LLM_USAGE_FLUSH_INTERVAL seconds. If the
+    queue is full or the database is down, rows are dropped (and counted)
+    rather than slowing down chat.
+    """
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[Dict[str, Any]] = []
+        self._last_error_log = 0.0
+
+    def _ensure_started(self):
+        # Lazily started outside the FastAPI lifespan (Celery, scripts)
+        if self._task is None or self._task.done():
+            self._queue = self._queue or asyncio.Queue(maxsize=settings.LLM_USAGE_QUEUE_MAX)
+            self._task = asyncio.create_task(self._run())
+
+    async def start(self):
+        """Called from the FastAPI lifespan on startup."""
+        if settings.LLM_USAGE_LEDGER_ENABLED:
+            self._ensure_started()
+            print(f"✅ LLM usage ledger started (batch={settings.LLM_USAGE_BATCH_SIZE}, "
+                  f"interval={settings.LLM_USAGE_FLUSH_INTERVAL}s).")
+
+    async def stop(self):
+        """Called from the FastAPI lifespan on shutdown; flushes what is queued."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        rows, self._batch = self._batch, []
+        while self._queue is not None and not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        for i in range(0, len(rows), settings.LLM_USAGE_BATCH_SIZE):
+            await self._flush(rows[i:i + settings.LLM_USAGE_BATCH_SIZE])
+
+    def record(self, **fields: Any):
+        """Queues one usage row (see LLMUsage for the fields). Never blocks or raises."""
+        if not settings.LLM_USAGE_LEDGER_ENABLED:
+            return
+        try:
+            self._ensure_started()
+        except RuntimeError:
+            return  # no running event loop
+        labels = usage_labels.get() or {}
+        row = {
+            "created_at": datetime.datetime.utcnow(),
+            "user_role": labels.get("user_role"),
+            "template": labels.get("template"),
+            **fields
+        }
+        row.setdefault("agent", labels.get("agent"))
+        for name, limit in _STRING_LIMITS.items():
+            if isinstance(row.get(name), str):
+                row[name] = row[name][:limit]
+        try:
+            self._queue.put_nowait(row)
+            _recorded.inc(outcome="queued")
+        except asyncio.QueueFull:
+            _recorded.inc(outcome="dropped")
+
+    async def _run(self):
+        while True:
+            self._batch.append(await self._queue.get())
+            # Give the batch a moment to fill up before writing
+            deadline = time.monotonic() + settings.LLM_USAGE_FLUSH_INTERVAL
+            while len(self._batch) < settings.LLM_USAGE_BATCH_SIZE:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout=left))
+                except asyncio.TimeoutError:
+                    break
+            rows, self._batch = self._batch, []
+            await self._flush(rows)
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        # Imported here so scripts that never flush don't need a database driver
+        from app.core.db_postgres import AsyncSessionLocal
+        start = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(LLMUsage), rows)
+                await session.commit()
+            _recorded.inc(len(rows), outcome="written")
+            _flush_seconds.observe(time.perf_counter() - start)
+        except Exception as e:
+            _recorded.inc(len(rows), outcome="dropped")
+            if time.monotonic() - self._last_error_log > 60:
+                self._last_error_log = time.monotonic()
+                print(f"⚠️ LLM usage ledger write failed ({len(rows)} rows dropped): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.LLM_USAGE_LEDGER_ENABLED,
+            "queued_now": self._queue.qsize() if self._queue is not None else 0,
+            "rows": _recorded.snapshot(),
+            "flush_seconds": _flush_seconds.snapshot()
+        }
+
+# Global Instance
+usage_ledger = UsageLedger()
+
+
+async def aggregate_usage(db, group_by: str = "agent", window_hours: float = 24.0,
+                          bucket: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Calls, p50/p95 latency, tokens, cost, cache hit rate and mean fallback
+    depth per `group_by` value over the last `window_hours`, optionally split
+    into hour/day/week buckets. Percentiles are computed in Postgres.
+    """
+    if group_by not in USAGE_DIMENSIONS or (bucket and bucket not in USAGE_BUCKETS):
+        raise ValueError(f"Unsupported usage grouping: {group_by}/{bucket}")
+    dimension = getattr(LLMUsage, group_by)
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=window_hours)
+    columns = [dimension.label("key")]
+    group = [dimension]
+    if bucket:
+        # Literal (whitelisted) unit, so SELECT and GROUP BY are the same expression for Postgres
+        period = func.date_trunc(literal_column(f"'{bucket}'"), LLMUsage.created_at).label("bucket")
+        columns.append(period)
+        group.append(period)
+
+    is_cache_hit = LLMUsage.cache_status.in_(CACHE_HIT_STATUSES)
+    query = (
+        select(
+            *columns,
+            func.count().label("calls"),
+            func.percentile_cont(0.5).within_group(LLMUsage.latency_ms).label("p50_ms"),
+            func.percentile_cont(0.95).within_group(LLMUsage.latency_ms).label("p95_ms"),
+            func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+            func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+            func.sum(LLMUsage.cached_tokens).label("cached_tokens"),
+            func.sum(LLMUsage.cost_usd).label("cost_usd"),
+            func.sum(case((is_cache_hit, 1), else_=0)).label("cache_hits"),
+            func.avg(LLMUsage.fallback_depth).label("avg_fallback_depth"),
+            func.sum(case((LLMUsage.success.is_(False), 1), else_=0)).label("failures"),
+        )
+        .where(LLMUsage.created_at >= since)
+        .group_by(*group)
+        .order_by(*([group[1]] if bucket else []), func.sum(LLMUsage.cost_usd).desc())
+    )
+    result = await db.execute(query)
+
+    rows = []
+    for row in result.mappings():
+        calls = row["calls"] or 0
+        rows.append({
+            group_by: row["key"],
+            **({"bucket": row["bucket"].isoformat()} if bucket and row["bucket"] else {}),
+            "calls": calls,
+            "p50_ms": round(row["p50_ms"], 1) if row["p50_ms"] is not None else None,
+            "p95_ms": round(row["p95_ms"], 1) if row["p95_ms"] is not None else None,
+            "prompt_tokens": int(row["prompt_tokens"] or 0),
+            "completion_tokens": int(row["completion_tokens"] or 0),
+            "cached_tokens": int(row["cached_tokens"] or 0),
+            "cost_usd": round(row["cost_usd"] or 0.0, 6),
+            "cache_hit_rate": round((row["cache_hits"] or 0) / calls, 4) if calls else 0.0,
+            "avg_fallback_depth": round(float(row["avg_fallback_depth"]), 2) if row["avg_fallback_depth"] is not None else None,
+            "failures": int(row["failures"] or 0),
+        })
+    return rows
@@ -1,3 +1,5 @@
+from typing import Dict
+
 class CalculationTools:
     async def calculate_co_attainment(self, course_id: str, academic_year: str, semester: int) -> Dict:
         return {
@@ -3,10 +3,19 @@ from sqlalchemy import select
 from ..core.db_postgres import AsyncSessionLocal
 from ..models.academic import Attendance, Course, AttendanceSummary
 from ..models.user import User
+from .memo import memoized
 
 class DatabaseTools:
-    """Tools for interacting with the database."""
+    """
+    Tools for interacting with the database.
+    Lookups are memoized per request (see .memo); course data is also kept
+    for DB_TOOL_REFERENCE_CACHE_TTL seconds across requests.
+    """
+
+    # Ids per IN (...) query, well under the driver's bind parameter limit
+    IN_QUERY_CHUNK = 1000
     
+    @memoized()
     async def fetch_attendance(self, student_id: str = None, course_id: str = None, date_range: Dict = None) -> List[Dict]:
         """Fetch attendance records."""
         async with AsyncSessionLocal() as session:
@@ -30,6 +39,7 @@ class DatabaseTools:
                 for r in records
             ]
     
+    @memoized()
     async def get_student_data(self, student_id: str) -> Dict:
         """Fetch student details."""
         async with AsyncSessionLocal() as session:
@@ -45,6 +55,25 @@ class DatabaseTools:
                 }
             return {}
 
+    @memoized()
+    async def get_students_data(self, student_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch many students in one session with IN queries; keyed by student id (missing ids are absent)."""
+        students: Dict[str, Dict] = {}
+        ids = list(dict.fromkeys(student_ids))
+        async with AsyncSessionLocal() as session:
+            for i in range(0, len(ids), self.IN_QUERY_CHUNK):
+                stmt = select(User).where(User.user_id.in_(ids[i:i + self.IN_QUERY_CHUNK]), User.user_type == 'student')
+                result = await session.execute(stmt)
+                for student in result.scalars().all():
+                    students[str(student.user_id)] = {
+                        "id": str(student.user_id),
+                        "name": student.username,
+                        "email": student.email,
+                        "mobile": student.mobile
+                    }
+        return students
+
+    @memoized(reference=True)
     async def get_course_data(self, course_id: str) -> Dict:
         """Fetch course details."""
         async with AsyncSessionLocal() as session:
@@ -61,6 +90,7 @@ class DatabaseTools:
                 }
             return {}
 
+    @memoized()
     async def fetch_students_below_attendance_threshold(self, course_id: str, threshold: float = 75.0) -> List[Dict]:
         """Identify students with low attendance."""
         async with AsyncSessionLocal() as session:
@@ -0,0 +1,168 @@
+from typing import Dict, Any, Optional, Callable, Tuple
+from collections import OrderedDict
+from contextvars import ContextVar
+import asyncio
+import copy
+import functools
+import inspect
+import json
+import time
+from ..core.config import settings
+from ..core.metrics import metrics
+
+_lookups = metrics.counter("db_tool_cache_lookups_total", "DatabaseTools lookups by method and result (request_hit/reference_hit/miss)")
+
+
+class ToolMemo:
+    """
+    Results of DatabaseTools calls made while answering one request, keyed by
+    method and arguments. Concurrent identical calls (parallel tool calls,
+    fan-out agents) share one in-flight query. Failures are not remembered.
+    """
+    def __init__(self):
+        self._results: Dict[str, "asyncio.Future"] = {}
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def count(self, method: str, result: str):
+        per_method = self.counts.setdefault(method, {"request_hit": 0, "reference_hit": 0, "miss": 0})
+        per_method[result] += 1
+        _lookups.inc(method=method, result=result)
+
+    @property
+    def lookups(self) -> int:
+        return sum(sum(c.values()) for c in self.counts.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rates for response metadata."""
+        request_hits = sum(c["request_hit"] for c in self.counts.values())
+        reference_hits = sum(c["reference_hit"] for c in self.counts.values())
+        lookups = self.lookups
+        return {
+            "lookups": lookups,
+            "request_hits": request_hits,
+            "reference_hits": reference_hits,
+            "hit_rate": round((request_hits + reference_hits) / lookups, 4) if lookups else 0.0,
+            "by_method": self.counts
+        }
+
+
+# Memo of the current request. Set at the API edge (or per agent turn);
+# asyncio tasks inherit the same object, so fan-out agents share it.
+tool_memo: ContextVar[Optional[ToolMemo]] = ContextVar("db_tool_memo", default=None)
+
+
+def begin_tool_memo() -> ToolMemo:
+    """Starts a fresh memo for this request/task and returns it."""
+    memo = ToolMemo()
+    tool_memo.set(memo)
+    return memo
+
+
+class ReferenceCache:
+    """
+    Small in-process TTL cache shared across requests, for reference data
+    that rarely changes within a minute (courses). Bounded LRU.
+    """
+    def __init__(self):
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if time.monotonic() >= expires:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any):
+        ttl = settings.DB_TOOL_REFERENCE_CACHE_TTL
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > settings.DB_TOOL_REFERENCE_CACHE_MAX_ENTRIES:
+            self._data.popitem(last=False)
+
+    def invalidate(self, method: Optional[str] = None):
+        """Drops every entry, or only those of one method (after writing reference data)."""
+        if method is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if k.startswith(f"{method}:")]:
+            del self._data[key]
+
+# Global Instance
+reference_cache = ReferenceCache()
+
+
+def memoized(reference: bool = False):
+    """
+    Caches an async DatabaseTools method in the request memo, and with
+    reference=True also in the cross-request reference cache. Empty results
+    are not put in the reference cache, so a missing row is retried.
+    Callers get a copy and may modify it.
+    """
+    def decorator(fn: Callable):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            memo = tool_memo.get() if settings.DB_TOOL_MEMO_ENABLED else None
+            if memo is None and not reference:
+                return await fn(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k != "self"}
+            key = f"{fn.__name__}:{json.dumps(arguments, sort_keys=True, default=str)}"
+
+            if memo is not None and key in memo._results:
+                memo.count(fn.__name__, "request_hit")
+                future = memo._results[key]
+                try:
+                    return copy.deepcopy(await asyncio.shield(future))
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise  # this caller was cancelled
+                    # The call we joined was cancelled (e.g. its tool timed out): run our own
+                    return copy.deepcopy(await fn(self, *args, **kwargs))
+
+            if reference:
+                found, value = reference_cache.get(key)
+                if found:
+                    if memo is not None:
+                        memo.count(fn.__name__, "reference_hit")
+                    else:
+                        _lookups.inc(method=fn.__name__, result="reference_hit")
+                    return copy.deepcopy(value)
+
+            if memo is None:
+                _lookups.inc(method=fn.__name__, result="miss")
+                value = await fn(self, *args, **kwargs)
+                if value:
+                    reference_cache.set(key, value)
+                return copy.deepcopy(value)
+
+            memo.count(fn.__name__, "miss")
+            future = asyncio.get_running_loop().create_future()
+            memo._results[key] = future
+            try:
+                value = await fn(self, *args, **kwargs)
+            except asyncio.CancelledError:
+                memo._results.pop(key, None)
+                future.cancel()
+                raise
+            except Exception as e:
+                memo._results.pop(key, None)
+                future.set_exception(e)
+                future.exception()  # waiters re-raise it; don't log it as never retrieved
+                raise
+            future.set_result(value)
+            if reference and value:
+                reference_cache.set(key, value)
+            return copy.deepcopy(value)
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+"""
+Per-request overhead of the chat path: building an OrchestratorAgent for every
+request (the old behaviour) versus reusing the app-scoped agent pool.
+
+Each request is a mock-mode chat turn. Run it without provider API keys: agents
+that handle their own intents then fall back to the mock answer too, so no
+provider is called and the numbers are the agent/service setup cost plus
+routing and RAG. The per-request mode is run with
+fewer requests by default because every construction opens Chroma and
+re-indexes the knowledge base.
+
+Usage: python scripts/bench_agent_pool.py [--requests N] [--per-request-requests M] [--concurrency C]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.agents.orchestrator import OrchestratorAgent
+from app.agents.pool import agent_pool
+from app.core.request_context import bind_db
+
+QUERIES = [
+    "show my timetable",
+    "What is the fee due date for semester 3?",
+    "Summarize attendance shortages for CS101",
+    "Draft a circular for the faculty meeting next Monday",
+    "How many publications did the department file this year?",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def run_mode(name: str, requests: int, concurrency: int, pooled: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            bind_db(None)
+            orchestrator = agent_pool.orchestrator if pooled else OrchestratorAgent(None)
+            await orchestrator.process_request(QUERIES[i % len(QUERIES)], {"role_id": "faculty", "mock_mode": True})
+            latencies.append(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - wall
+    mean = sum(latencies) / len(latencies) if latencies else 0.0
+    print(f"{name:<12} n={requests:<5} mean={mean * 1000:8.1f}ms  p50={percentile(latencies, 0.5) * 1000:8.1f}ms  "
+          f"p95={percentile(latencies, 0.95) * 1000:8.1f}ms  throughput={requests / wall:7.1f} req/s")
+    return mean
+
+
+async def main(requests: int, per_request_requests: int, concurrency: int):
+    start = time.perf_counter()
+    await agent_pool.start()
+    print(f"Pool startup: {(time.perf_counter() - start) * 1000:.1f}ms (paid once per worker)\n")
+
+    before = await run_mode("per-request", per_request_requests, concurrency, pooled=False)
+    after = await run_mode("pooled", requests, concurrency, pooled=True)
+    if after > 0:
+        print(f"\nMean per-request overhead reduced {before / after:.1f}x ({before * 1000:.1f}ms -> {after * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-request agent construction vs the shared agent pool")
+    parser.add_argument("--requests", type=int, default=500, help="Requests against the pooled orchestrator")
+    parser.add_argument("--per-request-requests", type=int, default=20, help="Requests that each build a new orchestrator")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.per_request_requests, args.concurrency))
@@ -0,0 +1,50 @@
+"""
+Micro-benchmark: per-call overhead of building a ChatGoogleGenerativeAI client
+on every request (old behaviour) vs. reusing one from GoogleClientRegistry.
+
+No network calls are made; only client construction / lookup is timed.
+
+Usage: python scripts/bench_google_clients.py [iterations]
+"""
+import os
+import sys
+import time
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from app.services.llm_clients import GoogleClientRegistry
+
+MODELS = ["gemini-3-flash-preview", "gemini-3.1-pro-preview"]
+KEYS = ["bench-key-primary", "bench-key-backup"]
+
+
+def bench_per_call(iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        ChatGoogleGenerativeAI(
+            model=MODELS[i % 2],
+            temperature=0.3,
+            google_api_key=KEYS[i % 2],
+            convert_system_message_to_human=True
+        )
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_registry(iterations: int) -> float:
+    registry = GoogleClientRegistry()
+    start = time.perf_counter()
+    for i in range(iterations):
+        registry.get(MODELS[i % 2], KEYS[i % 2], temperature=0.3)
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    before = bench_per_call(n)
+    after = bench_registry(n)
+    print(f"Iterations: {n}")
+    print(f"Before (new client per call): {before * 1e6:10.1f} µs/call")
+    print(f"After  (registry lookup):     {after * 1e6:10.1f} µs/call")
+    print(f"Speedup: {before / after:.0f}x" if after else "Speedup: n/a")
@@ -0,0 +1,150 @@
+"""
+Routing accuracy and latency over a labelled query set.
+
+Compares the previous substring-count router (first max wins, no keyword ->
+Orchestrator fallback) with IntentRouter, keyword-only and with embedding
+centroids. A label of None means the Orchestrator should answer itself.
+
+Embeddings use ChromaDB's default local model (the one KnowledgeService uses);
+pass --no-embeddings to measure the keyword stage alone.
+
+Usage: python scripts/bench_intent_routing.py [--repeat N] [--no-embeddings]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.agents.orchestrator import OrchestratorAgent
+from app.services.intent_router import IntentRouter
+
+LABELLED_QUERIES = [
+    # Keyword queries
+    ("Mark attendance for CS101 section A", "academic"),
+    ("Show the faculty workload for this semester", "academic"),
+    ("Update the syllabus for data structures", "academic"),
+    ("When is the exam for Digital Electronics?", "examination"),
+    ("Publish the grade sheet for 5th semester", "examination"),
+    ("Generate hall tickets for the final exams", "examination"),
+    ("What is the fee due date for semester 3?", "finance"),
+    ("Show the department budget utilisation", "finance"),
+    ("Process the salary for contract staff", "finance"),
+    ("Prepare the AQAR for this year", "quality"),
+    ("Status of the IQAC meeting minutes", "quality"),
+    ("List upcoming placement drives", "student_services"),
+    ("How many students applied for hostel rooms?", "student_services"),
+    ("Apply for leave next Monday", "administrative"),
+    ("Draft a circular for the faculty meeting", "administrative"),
+    ("How many patents were filed this year?", "research"),
+    ("List research grants received by ECE", "research"),
+    ("Submit the NIRF data", "compliance"),
+    ("Check AICTE compliance for the new intake", "compliance"),
+    ("Generate the SAR for the CSE program", "accreditation_manager"),
+    ("Show the PO gap analysis", "accreditation_manager"),
+    # Substring false positives in the old router ("hr" in "three", "file" in "profile", "sar" in "necessary")
+    ("Show the three year publication trend", "research"),
+    ("Update my profile photo for placement", "student_services"),
+    ("Is it necessary to pay the exam fee again?", "examination"),
+    # No keyword
+    ("Which classes do I teach on Thursday?", "academic"),
+    ("How many students were absent today in my section?", "academic"),
+    ("When will the semester end results be published?", "examination"),
+    ("I want to apply for revaluation of my answer script", "examination"),
+    ("How much money is left for lab equipment?", "finance"),
+    ("Has my tuition been received?", "finance"),
+    ("Which companies are visiting campus for recruitment?", "student_services"),
+    ("I need a room change in the residence block", "student_services"),
+    ("Send a notice about the holiday to all departments", "administrative"),
+    ("How many papers did we publish in Scopus journals?", "research"),
+    ("Do we satisfy the approval norms for intake?", "compliance"),
+    ("Which graduate attributes map to the international benchmark?", "accreditation_manager"),
+    # Orchestrator's own
+    ("hello", None),
+    ("thanks, that helps", None),
+]
+
+
+def legacy_route(intent_map, query: str):
+    query_lower = query.lower()
+    scores = {agent: sum(1 for kw in kws if kw in query_lower) for agent, kws in intent_map.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else None
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def report(name: str, predictions, latencies):
+    correct = sum(1 for (_, label), predicted in zip(LABELLED_QUERIES, predictions) if predicted == label)
+    print(f"{name:<22} accuracy={correct}/{len(LABELLED_QUERIES)} ({correct / len(LABELLED_QUERIES):.0%})  "
+          f"p50={percentile(latencies, 0.5) * 1e6:8.1f}us  p95={percentile(latencies, 0.95) * 1e6:8.1f}us")
+
+
+async def time_router(router: IntentRouter, repeat: int):
+    """Cold pass (decides every query) then `repeat` cached passes."""
+    predictions, cold = [], []
+    for query, _ in LABELLED_QUERIES:
+        start = time.perf_counter()
+        decision = await router.route(query)
+        cold.append(time.perf_counter() - start)
+        predictions.append(decision.agent)
+    warm = []
+    for _ in range(repeat):
+        for query, _ in LABELLED_QUERIES:
+            start = time.perf_counter()
+            await router.route(query)
+            warm.append(time.perf_counter() - start)
+    return predictions, cold, warm
+
+
+async def main(repeat: int, use_embeddings: bool):
+    intent_map = OrchestratorAgent.INTENT_MAP
+
+    latencies, predictions = [], []
+    for _ in range(repeat):
+        predictions = []
+        for query, _ in LABELLED_QUERIES:
+            start = time.perf_counter()
+            predictions.append(legacy_route(intent_map, query))
+            latencies.append(time.perf_counter() - start)
+    report("legacy substring", predictions, latencies)
+
+    keyword_router = IntentRouter(intent_map)
+    predictions, cold, warm = await time_router(keyword_router, repeat)
+    report("router keywords", predictions, cold)
+    report("  (cached)", predictions, warm)
+
+    if use_embeddings:
+        from chromadb.utils import embedding_functions
+        embedder = embedding_functions.DefaultEmbeddingFunction()
+        router = IntentRouter(intent_map)
+        router.set_embedding_function(lambda texts: [list(v) for v in embedder(texts)])
+        start = time.perf_counter()
+        await router.warm()
+        print(f"\nCentroids built in {(time.perf_counter() - start) * 1000:.0f}ms")
+        predictions, cold, warm = await time_router(router, repeat)
+        report("router + centroids", predictions, cold)
+        report("  (cached)", predictions, warm)
+        sources = Counter(router._cache[router._cache_key(q)].source for q, _ in LABELLED_QUERIES)
+        print(f"Decision sources: {dict(sources)}")
+
+    misses = [(q, label, p) for (q, label), p in zip(LABELLED_QUERIES, predictions) if p != label]
+    if misses:
+        print("\nMisrouted by the last router:")
+        for query, label, predicted in misses:
+            print(f"  {query!r}: expected {label}, got {predicted}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Routing accuracy/latency benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed passes over the query set")
+    parser.add_argument("--no-embeddings", action="store_true", help="Skip the embedding-centroid stage")
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat, not args.no_embeddings))
@@ -0,0 +1,109 @@
+"""
+Bulk attendance shortage letters: the previous per-student loop (two sessions
+and round trips per student, letters rendered one at a time) versus
+stream_shortage_letters (IN query + one course lookup, worker-pool rendering).
+
+The database and renderer are simulated with fixed per-call latencies so the
+run is reproducible without Postgres or MinIO:
+
+    --db-latency-ms   one session + query round trip
+    --row-us          extra cost per row returned
+    --render-ms       rendering/uploading one letter
+
+Usage: python scripts/bench_shortage_letters.py [--students N] [--concurrency C] [--db-latency-ms MS] [--render-ms MS]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.tools.database_tools import DatabaseTools
+from app.tools.document_tools import DocumentTools
+from app.services.shortage_letters import stream_shortage_letters
+
+
+class SimulatedDatabaseTools(DatabaseTools):
+    def __init__(self, db_latency: float, row_cost: float):
+        self.db_latency = db_latency
+        self.row_cost = row_cost
+        self.round_trips = 0
+
+    async def _round_trip(self, rows: int):
+        self.round_trips += 1
+        await asyncio.sleep(self.db_latency + rows * self.row_cost)
+
+    async def get_student_data(self, student_id: str):
+        await self._round_trip(1)
+        return {"id": student_id, "name": f"student-{student_id[:8]}", "email": f"{student_id[:8]}@college.edu", "mobile": None}
+
+    async def get_students_data(self, student_ids):
+        students = {}
+        for i in range(0, len(student_ids), self.IN_QUERY_CHUNK):
+            chunk = student_ids[i:i + self.IN_QUERY_CHUNK]
+            await self._round_trip(len(chunk))
+            students.update({sid: {"id": sid, "name": f"student-{sid[:8]}", "email": f"{sid[:8]}@college.edu", "mobile": None} for sid in chunk})
+        return students
+
+    async def get_course_data(self, course_id: str):
+        await self._round_trip(1)
+        return {"id": course_id, "name": "Data Structures", "code": "CS201", "credits": 4, "course_type": "THEORY"}
+
+
+class SimulatedDocumentTools(DocumentTools):
+    def __init__(self, render_latency: float):
+        self.render_latency = render_latency
+
+    async def generate_attendance_shortage_letter(self, student_data, course_data):
+        await asyncio.sleep(self.render_latency)
+        return await super().generate_attendance_shortage_letter(student_data, course_data)
+
+
+async def legacy(student_ids, course_id, db_tools, doc_tools):
+    """The loop previously inlined in AcademicAgent._execute_tool."""
+    letters = []
+    for student_id in student_ids:
+        student_data = await db_tools.get_student_data(student_id)
+        course_data = await db_tools.get_course_data(course_id)
+        letters.append(await doc_tools.generate_attendance_shortage_letter(student_data=student_data, course_data=course_data))
+    return letters
+
+
+async def main(students: int, concurrency: int, db_latency_ms: float, row_us: float, render_ms: float):
+    student_ids = [str(uuid.uuid4()) for _ in range(students)]
+    course_id = str(uuid.uuid4())
+    print(f"{students} students, db round trip {db_latency_ms}ms (+{row_us}us/row), render {render_ms}ms, concurrency {concurrency}\n")
+
+    db_tools = SimulatedDatabaseTools(db_latency_ms / 1000, row_us / 1e6)
+    doc_tools = SimulatedDocumentTools(render_ms / 1000)
+    start = time.perf_counter()
+    letters = await legacy(student_ids, course_id, db_tools, doc_tools)
+    legacy_seconds = time.perf_counter() - start
+    print(f"per-student loop  letters={len(letters):<5} round_trips={db_tools.round_trips:<5} total={legacy_seconds:7.2f}s")
+
+    db_tools = SimulatedDatabaseTools(db_latency_ms / 1000, row_us / 1e6)
+    start = time.perf_counter()
+    first_letter, generated = None, 0
+    async for event in stream_shortage_letters(student_ids, course_id, db_tools=db_tools, doc_tools=doc_tools, concurrency=concurrency):
+        if event["type"] == "letter" and "url" in event:
+            generated += 1
+            first_letter = first_letter or time.perf_counter() - start
+    bulk_seconds = time.perf_counter() - start
+    print(f"bulk + workers    letters={generated:<5} round_trips={db_tools.round_trips:<5} total={bulk_seconds:7.2f}s  "
+          f"first letter after {first_letter * 1000 if first_letter else 0:.0f}ms")
+    print(f"\nSpeed-up: {legacy_seconds / bulk_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk shortage letter generation")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--row-us", type=float, default=5.0)
+    parser.add_argument("--render-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.students, args.concurrency, args.db_latency_ms, args.row_us, args.render_ms))
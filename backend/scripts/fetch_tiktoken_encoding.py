@@ -0,0 +1,30 @@
+"""
+Downloads the cl100k_base BPE file into TIKTOKEN_CACHE_DIR at build time, so
+prompt budgeting counts tokens exactly without network access at runtime.
+Without the file, count_tokens uses its approximation.
+
+Usage (from backend/): python scripts/fetch_tiktoken_encoding.py
+"""
+import os
+import sys
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import tiktoken
+from app.core.config import settings
+from app.services.prompt_budget import ENCODING_NAME, encoding_cache_path
+
+
+def main():
+    os.makedirs(settings.TIKTOKEN_CACHE_DIR, exist_ok=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = settings.TIKTOKEN_CACHE_DIR
+    encoding = tiktoken.get_encoding(ENCODING_NAME)
+    path = encoding_cache_path()
+    if not os.path.exists(path):
+        sys.exit(f"❌ {ENCODING_NAME} loaded but {path} was not written")
+    print(f"✅ {ENCODING_NAME} ({encoding.n_vocab} tokens) cached at {path}")
+
+
+if __name__ == "__main__":
+    main()
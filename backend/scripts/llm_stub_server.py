@@ -0,0 +1,363 @@
+"""
+OpenAI-compatible LLM stand-in for offline load tests.
+
+Serves POST /v1/chat/completions (plain and stream=true) with configurable
+latency distributions and fault injection, so the real LLMService path
+(parsing/repair, caching, hedging, circuit breaking, rate limiting) can be
+exercised without provider keys. Point the backend at it with:
+
+    LLM_STUB_BASE_URL=http://localhost:8100/v1
+
+Google candidates are then sent here too, using their native model names.
+
+Modes:
+    synthetic  deterministic AgentResponse JSON (or markdown for non-JSON prompts)
+    record     forward to --upstream (OPENROUTER_API_KEY) and append to --cassette
+    replay     answer from --cassette; misses fall back to synthetic (or 404 with --strict)
+
+Latency specs: fixed:S | uniform:A,B | normal:MU,SIGMA | lognormal:MEDIAN,SIGMA | exp:MEAN
+Per-model latency: --model-latency gemini-3.1-pro-preview=lognormal:4,0.5 (repeatable)
+Faults (probabilities): --rate-429 --rate-500 --rate-timeout --rate-malformed
+Prompt caching: usage reports prompt_tokens_details.cached_tokens for the longest
+prompt prefix (per model, 128-token steps, min --cache-min-tokens) seen before.
+
+Runtime control: GET /stub/stats, POST /stub/config {"rate_429": 0.2, ...}, POST /stub/reset
+
+Usage: python scripts/llm_stub_server.py [--port 8100] [--mode synthetic] [--latency lognormal:0.8,0.4]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter as TallyCounter
+from typing import Any, Dict, List, Optional
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CONFIG: Dict[str, Any] = {
+    "mode": "synthetic",
+    "cassette": None,
+    "strict": False,
+    "upstream": "https://openrouter.ai/api/v1",
+    "seed": 0,
+    "latency": "lognormal:0.8,0.4",
+    "model_latency": {},
+    "use_recorded_latency": False,
+    "rate_429": 0.0,
+    "rate_500": 0.0,
+    "rate_timeout": 0.0,
+    "rate_malformed": 0.0,
+    "timeout_seconds": 60.0,
+    "cache_min_tokens": 1024,
+}
+
+STATS: TallyCounter = TallyCounter()
+_cassette: Dict[str, Dict[str, Any]] = {}
+_occurrences: TallyCounter = TallyCounter()
+_cassette_lock = asyncio.Lock()
+_prefix_cache: set = set()
+
+app = FastAPI(title="LLM Stub")
+
+
+# --- Helpers ------------------------------------------------------------------
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Cassette key: model + messages (temperature etc. are ignored)."""
+    material = json.dumps({"model": body.get("model"), "messages": body.get("messages")}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def request_rng(key: str) -> random.Random:
+    """Per-request RNG: the n-th identical request always gets the same dice, regardless of interleaving."""
+    _occurrences[key] += 1
+    return random.Random(f"{CONFIG['seed']}:{key}:{_occurrences[key]}")
+
+
+def sample_latency(spec: str, rng: random.Random) -> float:
+    kind, _, args = spec.partition(":")
+    params = [float(x) for x in args.split(",") if x]
+    if kind == "fixed":
+        return params[0]
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return rng.lognormvariate(math.log(params[0]), params[1])
+    if kind == "exp":
+        return rng.expovariate(1.0 / params[0])
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+def last_user_message(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages or []):
+        if message.get("role") == "user":
+            return str(message.get("content", ""))
+    return ""
+
+
+def wants_json(body: Dict[str, Any]) -> bool:
+    system = " ".join(str(m.get("content", "")) for m in body.get("messages", []) if m.get("role") == "system")
+    return "valid JSON" in system or "strictly in JSON" in system
+
+
+def synthetic_content(body: Dict[str, Any], rng: random.Random) -> str:
+    query = last_user_message(body.get("messages", []))[:120].replace("\n", " ")
+    if not wants_json(body):
+        return f"## Stub narrative\n\nThis is a deterministic stub answer for: {query}\n\n- Point A\n- Point B\n"
+    payload = {
+        "content": f"[stub:{body.get('model')}] Answer for '{query}'.",
+        "action_items": [
+            {"label": "Suggested Follow-up", "action_type": "button", "variant": "primary", "icon": "arrow-right"}
+        ],
+        "visualizations": [],
+        "components": [],
+        "documents_generated": []
+    }
+    if rng.random() < 0.3:
+        payload["visualizations"].append({
+            "type": "bar", "title": "Stub Chart",
+            "data": {"labels": ["A", "B", "C"], "values": [rng.randint(1, 99) for _ in range(3)]}
+        })
+    return json.dumps(payload)
+
+
+def malform(content: str, rng: random.Random) -> str:
+    """Breaks JSON the way real models do; all but 'garbage' are repairable."""
+    kind = rng.choice(["fenced_prose", "trailing_comma", "truncated", "garbage"])
+    STATS[f"malformed:{kind}"] += 1
+    if kind == "fenced_prose":
+        return f"Sure! Here is the response:\n```json\n{content}\n```\nLet me know if you need more."
+    if kind == "trailing_comma":
+        return content[:-1] + ",}" if content.endswith("}") else content + ","
+    if kind == "truncated":
+        return content[: max(10, int(len(content) * rng.uniform(0.5, 0.9)))]
+    return "I'm sorry, I can't produce JSON right now."
+
+
+def prompt_text_of(messages: List[Dict[str, Any]]) -> str:
+    """Flattened prompt as a provider sees it (content parts joined)."""
+    parts = []
+    for message in messages or []:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(f"{message.get('role')}\n{content}\n")
+    return "".join(parts)
+
+
+def cached_prefix_tokens(model: str, prompt_text: str) -> int:
+    """Emulates provider prefix caching at ~4 chars/token in 128-token blocks."""
+    block = 128 * 4
+    best = 0
+    for end in range(block, len(prompt_text) + 1, block):
+        digest = hashlib.sha1(f"{model}\0{prompt_text[:end]}".encode("utf-8")).hexdigest()
+        if digest in _prefix_cache:
+            best = end
+        else:
+            _prefix_cache.add(digest)
+    cached = best // 4
+    return cached if cached >= CONFIG["cache_min_tokens"] else 0
+
+
+def usage_for(model: str, content: str, prompt_text: str) -> Dict[str, Any]:
+    prompt_tokens, completion_tokens = len(prompt_text) // 4, len(content) // 4
+    cached = cached_prefix_tokens(model, prompt_text)
+    STATS["cached_prompt_tokens"] += cached
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens, "prompt_tokens_details": {"cached_tokens": cached}}
+
+
+def completion(model: str, content: str, prompt_text: str) -> Dict[str, Any]:
+    return {
+        "id": f"stub-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage_for(model, content, prompt_text)
+    }
+
+
+# --- Cassettes ----------------------------------------------------------------
+
+def load_cassette(path: Optional[str]):
+    _cassette.clear()
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    _cassette[entry["key"]] = entry
+        print(f"📼 Loaded {len(_cassette)} cassette entries from {path}")
+
+
+async def record(key: str, body: Dict[str, Any], response: Dict[str, Any], latency: float):
+    entry = {"key": key, "model": body.get("model"), "response": response, "latency": round(latency, 4)}
+    _cassette[key] = entry
+    async with _cassette_lock:
+        with open(CONFIG["cassette"], "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+async def forward_upstream(body: Dict[str, Any]) -> Dict[str, Any]:
+    upstream_body = {**body, "stream": False}
+    headers = {"Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY', '')}", "Content-Type": "application/json"}
+    async with httpx.AsyncClient(timeout=120) as client:
+        resp = await client.post(f"{CONFIG['upstream'].rstrip('/')}/chat/completions", json=upstream_body, headers=headers)
+        resp.raise_for_status()
+        return resp.json()
+
+
+# --- Routes -------------------------------------------------------------------
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "unknown")
+    key = request_key(body)
+    rng = request_rng(key)
+    STATS[f"requests:{model}"] += 1
+
+    # Faults first: they cost the configured latency like the real thing
+    latency = sample_latency(CONFIG["model_latency"].get(model, CONFIG["latency"]), rng)
+    roll = rng.random()
+    if roll < CONFIG["rate_timeout"]:
+        STATS["fault:timeout"] += 1
+        await asyncio.sleep(CONFIG["timeout_seconds"])
+        return JSONResponse({"error": {"message": "stub timeout", "code": 504}}, status_code=504)
+    roll -= CONFIG["rate_timeout"]
+    if roll < CONFIG["rate_429"]:
+        STATS["fault:429"] += 1
+        await asyncio.sleep(min(latency, 0.2))
+        return JSONResponse({"error": {"message": "Rate limit exceeded (stub)", "code": 429}},
+                            status_code=429, headers={"Retry-After": "5"})
+    roll -= CONFIG["rate_429"]
+    if roll < CONFIG["rate_500"]:
+        STATS["fault:500"] += 1
+        await asyncio.sleep(latency)
+        return JSONResponse({"error": {"message": "Internal error (stub)", "code": 500}}, status_code=500)
+
+    prompt_text = prompt_text_of(body.get("messages", []))
+    if CONFIG["mode"] == "record":
+        start = time.perf_counter()
+        result = await forward_upstream(body)
+        await record(key, body, result, time.perf_counter() - start)
+        STATS["cassette:recorded"] += 1
+        content = result["choices"][0]["message"]["content"]
+        latency = 0.0
+    elif CONFIG["mode"] == "replay" and key in _cassette:
+        entry = _cassette[key]
+        STATS["cassette:hit"] += 1
+        content = entry["response"]["choices"][0]["message"]["content"]
+        if CONFIG["use_recorded_latency"]:
+            latency = entry.get("latency", latency)
+    else:
+        if CONFIG["mode"] == "replay":
+            STATS["cassette:miss"] += 1
+            if CONFIG["strict"]:
+                return JSONResponse({"error": {"message": "cassette miss", "code": 404}}, status_code=404)
+        content = synthetic_content(body, rng)
+
+    if rng.random() < CONFIG["rate_malformed"]:
+        content = malform(content, rng)
+    STATS["ok"] += 1
+
+    if body.get("stream"):
+        usage = usage_for(model, content, prompt_text) if (body.get("stream_options") or {}).get("include_usage") else None
+        return StreamingResponse(stream_chunks(model, content, latency, usage), media_type="text/event-stream")
+    await asyncio.sleep(latency)
+    return completion(model, content, prompt_text)
+
+
+async def stream_chunks(model: str, content: str, latency: float, usage: Optional[Dict[str, Any]] = None):
+    """SSE in OpenAI's delta format; the latency is spread over the chunks."""
+    chunks = [content[i:i + 24] for i in range(0, len(content), 24)] or [""]
+    # First token takes a third of the latency, the rest is spread evenly
+    await asyncio.sleep(latency / 3)
+    per_chunk = (latency * 2 / 3) / len(chunks)
+    for piece in chunks:
+        event = {"object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        yield f"data: {json.dumps(event)}\n\n"
+        await asyncio.sleep(per_chunk)
+    if usage:
+        yield f"data: {json.dumps({'object': 'chat.completion.chunk', 'model': model, 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return {"config": CONFIG, "stats": dict(STATS), "cassette_entries": len(_cassette)}
+
+
+@app.post("/stub/config")
+async def stub_config(update: Dict[str, Any]):
+    """Change fault rates / latency mid-run, e.g. to watch circuits open and close."""
+    unknown = [k for k in update if k not in CONFIG]
+    if unknown:
+        return JSONResponse({"error": f"unknown keys {unknown}"}, status_code=400)
+    CONFIG.update(update)
+    if "cassette" in update:
+        load_cassette(CONFIG["cassette"])
+    return CONFIG
+
+
+@app.post("/stub/reset")
+async def stub_reset():
+    STATS.clear()
+    _occurrences.clear()
+    _prefix_cache.clear()
+    return {"status": "reset"}
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--cassette", default=None, help="JSONL cassette file (record/replay)")
+    parser.add_argument("--strict", action="store_true", help="replay: 404 on cassette miss instead of synthesizing")
+    parser.add_argument("--upstream", default=CONFIG["upstream"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", default=CONFIG["latency"])
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SPEC")
+    parser.add_argument("--use-recorded-latency", action="store_true")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-500", type=float, default=0.0)
+    parser.add_argument("--rate-timeout", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--timeout-seconds", type=float, default=60.0)
+    parser.add_argument("--cache-min-tokens", type=int, default=1024, help="smallest prefix the emulated prompt cache serves")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args(sys.argv[1:])
+    if args.mode in ("record", "replay") and not args.cassette:
+        sys.exit("--cassette is required for record/replay")
+    CONFIG.update(
+        mode=args.mode, cassette=args.cassette, strict=args.strict, upstream=args.upstream, seed=args.seed,
+        latency=args.latency, use_recorded_latency=args.use_recorded_latency,
+        model_latency=dict(spec.split("=", 1) for spec in args.model_latency),
+        rate_429=args.rate_429, rate_500=args.rate_500, rate_timeout=args.rate_timeout,
+        rate_malformed=args.rate_malformed, timeout_seconds=args.timeout_seconds,
+        cache_min_tokens=args.cache_min_tokens
+    )
+    sample_latency(CONFIG["latency"], random.Random(0))  # validate the spec early
+    load_cassette(CONFIG["cassette"])
+    print(f"🧪 LLM stub ({CONFIG['mode']}) on http://{args.host}:{args.port}/v1")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,110 @@
+"""
+Offline load test for the LLMService chat path against scripts/llm_stub_server.py.
+
+Drives get_response() concurrently with a mix of repeated and unique queries,
+then reports latency percentiles, cache status, winning models, tiers,
+JSON repair outcomes, adaptive timeouts, provider prompt-cache savings and
+circuit-breaker state.
+
+    python scripts/llm_stub_server.py --rate-500 0.1 --rate-malformed 0.1 &
+    LLM_STUB_BASE_URL=http://127.0.0.1:8100/v1 python scripts/load_test_llm.py --requests 300 --concurrency 30
+
+Usage: python scripts/load_test_llm.py [--requests N] [--concurrency C] [--repeat-ratio R] [--role ROLE]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.core.http_client import http_pool
+from app.services.llm_service import LLMService
+from app.services.json_repair import repair_stats
+from app.services.llm_routing import TIER_MODEL_CHAINS
+from app.services.llm_timeouts import timeout_stats
+from app.services.prompt_layout import prompt_cache_stats
+
+QUERIES = [
+    "hi",
+    "show my timetable",
+    "What is the fee due date for semester 3?",
+    "Generate a comparison chart of placement trends across departments",
+    "Summarize attendance shortages for CS101 and recommend actions",
+    "Draft a circular for the faculty meeting next Monday",
+    "Analyze the research publication trend and suggest a strategy",
+    "How many students are eligible for scholarships this year?",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def run(requests: int, concurrency: int, repeat_ratio: float, role: str, seed: int):
+    rng = random.Random(seed)
+    service = LLMService()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses, models, tiers, errors = [], Counter(), Counter(), Counter(), Counter()
+
+    async def one(i: int):
+        if rng.random() < repeat_ratio:
+            query = rng.choice(QUERIES)
+        else:
+            query = f"{rng.choice(QUERIES)} (variant {i})"
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await service.get_response(role, query, "Load test context")
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+        meta = response.metadata
+        statuses[meta.get("cache_status", "mock_fallback")] += 1
+        models[meta.get("model", "-")] += 1
+        tiers[meta.get("tier", "-")] += 1
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - wall
+    await http_pool.close()
+
+    print(f"Requests: {requests}  Concurrency: {concurrency}  Wall: {wall:.2f}s  Throughput: {requests / wall:.1f} req/s")
+    print(f"Latency  p50 {percentile(latencies, 0.5) * 1000:8.1f} ms   p95 {percentile(latencies, 0.95) * 1000:8.1f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:8.1f} ms")
+    print(f"Cache status: {dict(statuses)}")
+    print(f"Winning models: {dict(models)}")
+    print(f"Tiers: {dict(tiers)}")
+    print(f"JSON parse outcomes: {repair_stats()}")
+    print(f"Errors: {dict(errors) or 'none'}")
+    print(f"Adaptive timeouts: {timeout_stats()['current']}")
+    cache = prompt_cache_stats()
+    print(f"Provider prompt cache (prefix {cache['prefix_fingerprint']}): saved ${cache['saved_usd']}")
+    for name, entry in cache["models"].items():
+        print(f"  {name}: {entry['cached_share']:.0%} of prompt tokens cached, {entry['hits']}/{entry['requests']} calls hit")
+    print("Circuits:")
+    chain = list({(m["provider"], m["model"]): m for tier in TIER_MODEL_CHAINS.values() for m in tier}.values())
+    for cid, state in (await service.circuit_breakers.snapshot(service._expand_candidates(chain))).items():
+        print(f"  {cid}: {state}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--repeat-ratio", type=float, default=0.5, help="share of queries drawn from the fixed set (cache hits)")
+    parser.add_argument("--role", default="Academic Agent")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not settings.LLM_STUB_BASE_URL:
+        sys.exit("Set LLM_STUB_BASE_URL (e.g. http://127.0.0.1:8100/v1) so no real provider is called.")
+    asyncio.run(run(args.requests, args.concurrency, args.repeat_ratio, args.role, args.seed))
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.event_bus import Event, EventType
+from app.services import cache_invalidation
+from app.services.cache_invalidation import EVENT_CACHE_TAGS
+from app.services.llm_cache import CACHE_TAG_KEYWORDS, LLMResponseCache, infer_cache_tags
+from app.services.llm_service import LLMService
+
+
+def _local_cache() -> LLMResponseCache:
+    cache = LLMResponseCache()
+    cache.redis_client = None
+    return cache
+
+
+def test_infer_cache_tags():
+    assert infer_cache_tags("Academic", "Which students have attendance shortage?") == ["attendance"]
+    assert infer_cache_tags("Academic", "Generate morning academic briefing") == []
+    assert infer_cache_tags("Academic", "Show today's timetable") == []
+    assert infer_cache_tags("Examination", "Publish semester grades") == ["grades"]
+    assert infer_cache_tags("Finance", "Pending fee payment for CSE") == ["finance"]
+    assert infer_cache_tags("Accreditation", "NBA SAR criterion 3 attainment") == ["accreditation"]
+    # Keywords match whole-word prefixes only
+    assert infer_cache_tags("Academic", "Is a necessary step missing?") == []
+
+
+def test_every_tag_has_an_event_that_evicts_it():
+    evicted = {tag for tags in EVENT_CACHE_TAGS.values() for tag in tags}
+    assert evicted == set(CACHE_TAG_KEYWORDS)
+
+
+def test_renewal_due_does_not_evict_anything():
+    assert EventType.ACCREDITATION_RENEWAL_DUE not in EVENT_CACHE_TAGS
+
+
+def test_attendance_event_evicts_only_tagged_entries(monkeypatch):
+    cache = _local_cache()
+    monkeypatch.setattr(cache_invalidation, "llm_cache", cache)
+
+    async def run():
+        await cache.set("k:attendance", {"content": "72%"}, ttl=3600, tags=["attendance"])
+        await cache.set("k:other", {"content": "hello"}, ttl=3600, tags=[])
+        await cache_invalidation._invalidate_for_event(
+            Event(EventType.ATTENDANCE_UPDATED, "academic", {"student_id": "s1"})
+        )
+        return await cache.get("k:attendance"), await cache.get("k:other")
+
+    evicted, kept = asyncio.run(run())
+    assert evicted == (None, False)
+    assert kept == ({"content": "hello"}, False)
+
+
+def test_tagged_answers_live_longer_than_untagged_ones():
+    class RecordingCache:
+        def __init__(self):
+            self.calls = []
+
+        async def set(self, key, payload, ttl, tags=None):
+            self.calls.append((key, ttl, tags))
+
+    class InactiveSemanticCache:
+        active = False
+
+    service = LLMService.__new__(LLMService)
+    service.response_cache = RecordingCache()
+    service.semantic_cache = InactiveSemanticCache()
+    winner = {"provider": "stub", "model": "stub"}
+
+    async def run():
+        await service._store_response("Academic", "Generate morning academic briefing", "", "k1",
+                                      {"content": "Briefing"}, {}, winner)
+        await service._store_response("Academic", "attendance shortage list", "", "k2",
+                                      {"content": "List"}, {}, winner)
+
+    asyncio.run(run())
+    assert service.response_cache.calls == [
+        ("k1", settings.LLM_CACHE_TTL, []),
+        ("k2", settings.LLM_CACHE_TAGGED_TTL, ["attendance"]),
+    ]
+
+
+def test_local_tag_index_is_bounded(monkeypatch):
+    cache = _local_cache()
+    cache.local.max_entries = 3
+
+    async def run():
+        for i in range(10):
+            await cache.set(f"k{i}", {"content": str(i)}, ttl=3600, tags=["attendance"])
+        assert list(cache._local_tags["attendance"]) == ["k7", "k8", "k9"]
+
+        # Entries that have aged out leave the index on the next write
+        later = time.time() + 3600 + cache.stale_ttl + 1
+        monkeypatch.setattr(time, "time", lambda: later)
+        await cache.set("fresh", {"content": "new"}, ttl=3600, tags=["attendance"])
+        assert list(cache._local_tags["attendance"]) == ["fresh"]
+
+    asyncio.run(run())
@@ -0,0 +1,29 @@
+import pytest
+
+from app.core.config import settings
+
+pytest.importorskip("chromadb")  # app.agents pulls in the knowledge service
+from app.agents.fanout import fanout_candidates  # noqa: E402
+
+
+def test_single_incidental_hit_does_not_fan_out():
+    assert fanout_candidates({"accreditation": 4, "attendance": 1}) == ["accreditation"]
+
+
+def test_minor_domain_below_relative_threshold_is_dropped():
+    assert fanout_candidates({"accreditation": 6, "attendance": 2}) == ["accreditation"]
+
+
+def test_comparable_domains_fan_out_best_first():
+    assert fanout_candidates({"attendance": 2, "accreditation": 3, "finance": 0}) == ["accreditation", "attendance"]
+
+
+def test_max_agents_and_disabled(monkeypatch):
+    scores = {"a": 5, "b": 4, "c": 4, "d": 3}
+    assert fanout_candidates(scores) == ["a", "b", "c"]
+    monkeypatch.setattr(settings, "ORCHESTRATOR_FANOUT_ENABLED", False)
+    assert fanout_candidates(scores) == []
+
+
+def test_no_scores():
+    assert fanout_candidates({}) == []
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from app.services.json_repair import JSONRepairError, parse_agent_payload, parse_llm_json, repair_json_text
+
+
+def test_clean_payload_is_not_repaired():
+    data, repaired = parse_llm_json('{"content": "ok", "action_items": []}')
+    assert data == {"content": "ok", "action_items": []}
+    assert not repaired
+
+
+def test_code_block_inside_a_string_value_is_kept():
+    payload = {"content": "Here is code:\n```python\nprint(1)\n```\nDone", "action_items": []}
+    data, repaired = parse_llm_json(json.dumps(payload))
+    assert data == payload
+    assert not repaired
+    assert parse_agent_payload(json.dumps(payload))["content"] == payload["content"]
+
+
+def test_code_block_inside_a_fenced_payload_is_kept():
+    payload = {"content": "Run:\n```bash\nmake\n```", "action_items": []}
+    data, repaired = parse_llm_json(f"```json\n{json.dumps(payload)}\n```")
+    assert data == payload
+    assert not repaired
+
+
+def test_fenced_payload():
+    data, repaired = parse_llm_json('```json\n{"content": "ok"}\n```')
+    assert data == {"content": "ok"}
+    assert not repaired
+
+
+def test_prose_around_a_fenced_payload_is_repaired():
+    data, repaired = parse_llm_json('Sure! Here it is:\n```json\n{"content": "ok"}\n```\nAnything else?')
+    assert data == {"content": "ok"}
+    assert repaired
+
+
+def test_trailing_commas_are_removed():
+    data, repaired = parse_llm_json('{"content": "ok", "action_items": [{"label": "a"},],}')
+    assert data == {"content": "ok", "action_items": [{"label": "a"}]}
+    assert repaired
+
+
+def test_comma_before_a_bracket_inside_a_string_is_kept():
+    data, repaired = parse_llm_json('{"content": "Use a, ] or b, }", "action_items": [],}')
+    assert data == {"content": "Use a, ] or b, }", "action_items": []}
+    assert repaired
+
+
+def test_truncated_output_is_closed():
+    assert json.loads(repair_json_text('```json\n{"content": "cut off mid-sent')) == {"content": "cut off mid-sent"}
+    assert json.loads(repair_json_text('{"content": "ok", "action_items": [{"label": "a"},')) == {
+        "content": "ok", "action_items": [{"label": "a"}]
+    }
+    assert json.loads(repair_json_text('{"content": "ok", "next":')) == {"content": "ok", "next": None}
+
+
+def test_unrepairable_payload_raises():
+    with pytest.raises(JSONRepairError):
+        parse_llm_json("no json here at all")
+
+
+def test_invalid_array_elements_are_dropped():
+    raw = json.dumps({
+        "content": "ok",
+        "action_items": [{"label": "Approve", "action_type": "approve"}, {"unexpected": True}],
+    })
+    data = parse_agent_payload(raw)
+    assert data["content"] == "ok"
+    assert len(data["action_items"]) <= 1
+
+
+def test_non_object_payload_is_rejected():
+    with pytest.raises(JSONRepairError):
+        parse_agent_payload("[1, 2, 3]")
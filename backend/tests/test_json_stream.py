@@ -0,0 +1,40 @@
+import json
+
+from app.services.json_stream import IncrementalJSONParser
+
+
+def _feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+def test_content_and_items_are_emitted_incrementally():
+    payload = {
+        "content": "Line one\nLine \"two\" é",
+        "action_items": [{"label": "A"}, {"label": "B", "data": {"x": [1, 2]}}],
+        "visualizations": [],
+    }
+    text = "```json\n" + json.dumps(payload) + "\n```"
+    parser = IncrementalJSONParser()
+
+    events = _feed_in_chunks(parser, text, 3)
+
+    content = "".join(e[1] for e in events if e[0] == "content")
+    items = [(e[1], e[2]) for e in events if e[0] == "item"]
+    assert content == payload["content"]
+    assert items == [("action_items", {"label": "A"}), ("action_items", {"label": "B", "data": {"x": [1, 2]}})]
+    assert parser.text.startswith("{")
+
+
+def test_nested_content_keys_are_not_streamed():
+    text = json.dumps({"action_items": [{"content": "nested"}], "content": "top"})
+    events = IncrementalJSONParser().feed(text)
+    assert [e[1] for e in events if e[0] == "content"] == ["top"]
+
+
+def test_unicode_escape_split_across_chunks():
+    text = '{"content": "caf\\u00e9"}'
+    events = _feed_in_chunks(IncrementalJSONParser(), text, 1)
+    assert "".join(e[1] for e in events if e[0] == "content") == "café"
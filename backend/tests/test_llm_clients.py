@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_google_genai")
+
+from app.services.llm_clients import GoogleClientRegistry
+
+
+def _key_of(service_client):
+    return service_client.transport._credentials.token
+
+
+def test_each_key_keeps_its_own_credentials():
+    registry = GoogleClientRegistry()
+
+    async def run():
+        return registry.get("gemini-pro", "key-one"), registry.get("gemini-pro", "key-two")
+
+    first, second = asyncio.run(run())
+    assert first is not second
+    # Building the second client re-ran genai.configure(); the first keeps its key
+    assert _key_of(first.client._async_client) == "key-one"
+    assert _key_of(second.client._async_client) == "key-two"
+    assert _key_of(first.client._client) == "key-one"
+
+
+def test_clients_are_reused_per_model_key_and_temperature():
+    registry = GoogleClientRegistry()
+
+    async def run():
+        client = registry.get("gemini-pro", "key-one")
+        assert registry.get("gemini-pro", "key-one") is client
+        assert registry.get("gemini-1.5-flash", "key-one").client._async_client is client.client._async_client
+        assert len(registry) == 2
+
+    asyncio.run(run())
+
+
+def test_each_event_loop_gets_its_own_clients():
+    registry = GoogleClientRegistry()
+
+    async def run():
+        return registry.get("gemini-pro", "key-one")
+
+    # e.g. two Celery tasks, each under its own asyncio.run
+    assert asyncio.run(run()) is not asyncio.run(run())
@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.llm_rate_limiter import (
+    ProviderRateLimiter, RateLimitTimeout, _LocalBucket, bucket_id, is_rate_limit_error
+)
+from app.services.llm_service import OpenRouterAPIError
+
+
+def _http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError(f"{status} error", request=request, response=response)
+
+
+class ResourceExhausted(Exception):
+    """Shape of google.api_core.exceptions.ResourceExhausted."""
+    code = 429
+
+
+def test_structured_rate_limit_errors():
+    assert is_rate_limit_error(_http_error(429))
+    assert is_rate_limit_error(ResourceExhausted("Resource has been exhausted"))
+    assert is_rate_limit_error(OpenRouterAPIError({"code": 429, "message": "Rate limit exceeded"}))
+
+
+def test_wrapped_rate_limit_error():
+    try:
+        try:
+            raise _http_error(429)
+        except httpx.HTTPStatusError as inner:
+            raise RuntimeError("retries exhausted") from inner
+    except RuntimeError as outer:
+        assert is_rate_limit_error(outer)
+
+
+def test_429_in_message_text_is_not_a_rate_limit():
+    assert not is_rate_limit_error(Exception("Request id req_4291 failed"))
+    assert not is_rate_limit_error(Exception("prompt is 14290 tokens, max is 8192"))
+    assert not is_rate_limit_error(Exception("connection refused on port 4290"))
+    assert not is_rate_limit_error(_http_error(500))
+    assert not is_rate_limit_error(OpenRouterAPIError({"code": 502, "message": "upstream 429 retries"}))
+
+
+def test_local_bucket_admits_until_empty_then_reports_wait():
+    bucket = _LocalBucket(rpm=2, tpm=1000)
+    assert bucket.try_acquire(2, 1000, cost=100, reserve=0) == 0
+    assert bucket.try_acquire(2, 1000, cost=100, reserve=0) == 0
+    wait = bucket.try_acquire(2, 1000, cost=100, reserve=0)
+    assert 0 < wait <= 30
+
+
+def test_local_bucket_reserve_keeps_headroom_for_higher_priorities():
+    bucket = _LocalBucket(rpm=10, tpm=100_000)
+    # Background may not dip below half of the bucket
+    admitted = sum(1 for _ in range(10) if bucket.try_acquire(10, 100_000, cost=10, reserve=0.5) == 0)
+    assert admitted == 5
+    assert bucket.try_acquire(10, 100_000, cost=10, reserve=0) == 0
+
+
+def test_local_bucket_token_limit():
+    bucket = _LocalBucket(rpm=100, tpm=1000)
+    assert bucket.try_acquire(100, 1000, cost=900, reserve=0) == 0
+    assert bucket.try_acquire(100, 1000, cost=900, reserve=0) > 0
+
+
+@pytest.fixture
+def local_limiter(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"openrouter": {"rpm": 1, "tpm": 1_000_000}})
+    limiter = ProviderRateLimiter()
+    limiter.redis_client = None
+    return limiter
+
+
+def test_acquire_times_out_instead_of_waiting_past_max_wait(local_limiter):
+    candidate = {"provider": "openrouter", "model": "m", "key": "k"}
+
+    async def run():
+        await local_limiter.acquire(candidate, 10, priority="interactive", max_wait=1)
+        with pytest.raises(RateLimitTimeout):
+            await local_limiter.acquire(candidate, 10, priority="interactive", max_wait=0.2)
+
+    asyncio.run(run())
+
+
+def test_penalize_drains_the_bucket(local_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"openrouter": {"rpm": 60, "tpm": 1_000_000}})
+    candidate = {"provider": "openrouter", "model": "m", "key": "k"}
+
+    async def run():
+        await local_limiter.acquire(candidate, 10, max_wait=1)
+        await local_limiter.penalize(candidate)
+        return local_limiter._local[bucket_id(candidate)]
+
+    bucket = asyncio.run(run())
+    assert bucket.r == 0
+    assert bucket.try_acquire(60, 1_000_000, cost=10, reserve=0) > 0
+
+
+def test_bucket_id_does_not_contain_the_key():
+    bid = bucket_id({"provider": "google", "key": "AIza-secret"})
+    assert bid.startswith("google:")
+    assert "secret" not in bid
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.deadline import set_deadline
+from app.services.llm_circuit_breaker import CLOSED, OPEN, CircuitBreakerRegistry, circuit_id
+from app.services.llm_service import LLMService
+from app.services.llm_timeouts import DeadlineCutoff, iter_with_timeout, with_timeout
+
+
+def test_own_timeout_is_a_plain_timeout():
+    async def run():
+        await with_timeout(asyncio.sleep(1), 0.05, "google", "m")
+
+    with pytest.raises(asyncio.TimeoutError) as info:
+        asyncio.run(run())
+    assert not isinstance(info.value, DeadlineCutoff)
+
+
+def test_timeout_cut_by_the_request_deadline_is_a_deadline_cutoff():
+    async def run():
+        set_deadline(0.05)
+        await with_timeout(asyncio.sleep(1), 0.05, "google", "m")
+
+    with pytest.raises(DeadlineCutoff):
+        asyncio.run(run())
+
+
+def test_stream_cut_by_the_request_deadline_is_a_deadline_cutoff():
+    async def trickle():
+        while True:
+            await asyncio.sleep(0.01)
+            yield "x"
+
+    async def run():
+        set_deadline(0.05)
+        async for _ in iter_with_timeout(trickle(), 0.05, "openrouter", "m"):
+            pass
+
+    with pytest.raises(DeadlineCutoff):
+        asyncio.run(run())
+
+
+class RecordingBreakers:
+    def __init__(self):
+        self.records = []
+
+    async def record(self, candidate, success, latency=None):
+        self.records.append(success)
+
+
+def _service(monkeypatch, call_seconds):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", False)
+    service = LLMService.__new__(LLMService)
+    service.stub_base_url = "http://stub"
+    service.circuit_breakers = RecordingBreakers()
+
+    async def slow_call(*args, **kwargs):
+        await asyncio.sleep(call_seconds)
+        return {"choices": [{"message": {"content": '{"content": "ok"}'}}]}
+
+    service._call_openrouter_full = lambda *a, **kw: with_timeout(slow_call(), kw["timeout"], "openrouter", "m")
+    return service
+
+
+CANDIDATE = {"provider": "openrouter", "model": "m", "key": "k", "key_idx": 0}
+
+
+def test_deadline_cutoff_does_not_count_against_the_circuit(monkeypatch):
+    service = _service(monkeypatch, call_seconds=1)
+
+    async def run():
+        set_deadline(0.05)
+        await service._invoke_candidate(CANDIDATE, [], "")
+
+    with pytest.raises(DeadlineCutoff):
+        asyncio.run(run())
+    assert service.circuit_breakers.records == []
+
+
+def test_provider_timeout_counts_against_the_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_MIN", 0.05)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_MAX", 0.05)
+    service = _service(monkeypatch, call_seconds=1)
+
+    async def run():
+        set_deadline(30)
+        await service._invoke_candidate(CANDIDATE, [], "")
+
+    with pytest.raises(asyncio.TimeoutError) as info:
+        asyncio.run(run())
+    assert not isinstance(info.value, DeadlineCutoff)
+    assert service.circuit_breakers.records == [False]
+
+
+def test_breaker_opens_on_error_rate_and_closes_after_a_good_probe(monkeypatch):
+    breakers = CircuitBreakerRegistry()
+    breakers.min_requests, breakers.error_threshold, breakers.open_seconds = 4, 0.5, 0
+    cid = circuit_id(CANDIDATE)
+
+    async def run():
+        for success in (True, False, True, False):
+            await breakers.record(CANDIDATE, success=success)
+        opened = breakers._local_circuit(cid).state
+        probe = await breakers.order([CANDIDATE])   # cooldown elapsed: one probe goes through
+        blocked = await breakers.order([CANDIDATE])  # probe lock held
+        await breakers.record(CANDIDATE, success=True)
+        return opened, probe, blocked, breakers._local_circuit(cid).state
+
+    opened, probe, blocked, closed = asyncio.run(run())
+    assert opened == OPEN
+    assert probe == [CANDIDATE]
+    assert blocked == []
+    assert closed == CLOSED
+
+
+def test_failed_probe_reopens_the_circuit():
+    breakers = CircuitBreakerRegistry()
+    breakers.min_requests, breakers.error_threshold, breakers.open_seconds = 2, 0.5, 0
+    cid = circuit_id(CANDIDATE)
+
+    async def run():
+        for _ in range(2):
+            await breakers.record(CANDIDATE, success=False)
+        await breakers.order([CANDIDATE])
+        await breakers.record(CANDIDATE, success=False)
+        return breakers._local_circuit(cid).state
+
+    assert asyncio.run(run()) == OPEN
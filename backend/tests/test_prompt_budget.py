@@ -0,0 +1,66 @@
+import base64
+import os
+import socket
+
+import pytest
+
+from app.core.config import settings
+from app.services import prompt_budget
+
+
+@pytest.fixture
+def fresh_tokenizer(monkeypatch, tmp_path):
+    monkeypatch.setattr(prompt_budget, "_encoding", None)
+    monkeypatch.setattr(prompt_budget, "_encoding_failed", False)
+    monkeypatch.setattr(settings, "TIKTOKEN_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_missing_encoding_file_falls_back_without_downloading(fresh_tokenizer, monkeypatch):
+    class NoNetworkTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            raise AssertionError("get_encoding would download the BPE file")
+
+    monkeypatch.setattr(prompt_budget, "tiktoken", NoNetworkTiktoken)
+
+    assert prompt_budget.count_tokens("hello world, how are you") == 7
+    assert prompt_budget.tokenizer_name() == "approx"
+
+
+def test_tiktoken_not_installed_falls_back(fresh_tokenizer, monkeypatch):
+    monkeypatch.setattr(prompt_budget, "tiktoken", None)
+    assert prompt_budget.count_tokens("x" * 400) == 100
+    assert prompt_budget.count_tokens("") == 0
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("the tokenizer must not touch the network")
+
+    monkeypatch.setattr(socket.socket, "connect", refuse)
+    monkeypatch.setattr(socket, "create_connection", refuse)
+
+
+def _write_encoding_file(directory, content: bytes):
+    with open(os.path.join(directory, os.path.basename(prompt_budget.encoding_cache_path())), "wb") as f:
+        f.write(content)
+
+
+def test_preloaded_encoding_is_used(fresh_tokenizer, no_network):
+    pytest.importorskip("tiktoken")
+    # Byte-level vocabulary only: every byte is one token
+    _write_encoding_file(fresh_tokenizer, b"".join(base64.b64encode(bytes([b])) + b" %d\n" % b for b in range(256)))
+
+    assert prompt_budget.count_tokens("abc") == 3
+    assert prompt_budget.tokenizer_name() == "cl100k_base"
+
+
+def test_corrupt_encoding_file_falls_back(fresh_tokenizer, no_network):
+    pytest.importorskip("tiktoken")
+    _write_encoding_file(fresh_tokenizer, b"<html>proxy error</html>\n")
+
+    assert prompt_budget.count_tokens("x" * 400) == 100
+    assert prompt_budget.tokenizer_name() == "approx"
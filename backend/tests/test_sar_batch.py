@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.deadline import remaining, set_deadline
+from app.services import sar_batch
+from app.services.llm_cache import LLMResponseCache
+from app.services.sar_batch import SARBatchGenerator
+
+
+class FakeLLMService:
+    redis_client = None
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.deadlines = []
+
+    async def generate_sar_section(self, title, program_data):
+        self.deadlines.append(remaining())
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return f"Narrative for {title} ({program_data['program_name']})"
+
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    cache = LLMResponseCache()
+    cache.redis_client = None
+    monkeypatch.setattr(sar_batch, "llm_cache", cache)
+
+
+def _jobs(n):
+    return [(f"Section {i}", {"program_name": "B.Tech CSE"}) for i in range(n)]
+
+
+def test_background_run_is_detached_from_the_request_deadline():
+    llm = FakeLLMService()
+    generator = SARBatchGenerator(llm)
+
+    async def run():
+        set_deadline(0.001)
+        run_id = generator.start(_jobs(3))
+        assert generator.start(_jobs(3)) == run_id  # not started twice
+        assert (await generator.status(run_id))["status"] == "running"
+        await generator._jobs[run_id]
+        await asyncio.sleep(0)
+        assert generator._jobs == {} and generator._totals == {}  # finished runs are not kept in memory
+        return await generator.status(run_id)
+
+    status = asyncio.run(run())
+    assert status["status"] == "finished"
+    assert status["completed"] == status["total"] == 3
+    assert status["failed"] == []
+    assert llm.deadlines == [None, None, None]
+
+
+def test_client_concurrency_is_clamped(monkeypatch):
+    monkeypatch.setattr(settings, "SAR_BATCH_MAX_CONCURRENCY", 2)
+    llm = FakeLLMService()
+    generator = SARBatchGenerator(llm)
+
+    async def run():
+        return [event async for event in generator.generate(_jobs(6), concurrency=1000)]
+
+    events = asyncio.run(run())
+    assert events[-1]["completed"] == 6
+    assert llm.peak == 2
+
+
+def test_rerun_resumes_from_the_checkpoint():
+    llm = FakeLLMService()
+    generator = SARBatchGenerator(llm)
+
+    async def run():
+        first = [e async for e in generator.generate(_jobs(2), run_id="r1")]
+        second = [e async for e in generator.generate(_jobs(2), run_id="r1")]
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert {e["source"] for e in first if e["type"] == "section"} == {"generated"}
+    assert {e["source"] for e in second if e["type"] == "section"} == {"checkpoint"}
+    assert len(llm.deadlines) == 2
+
+
+def test_repeated_titles_are_checkpointed_separately():
+    llm = FakeLLMService()
+    generator = SARBatchGenerator(llm)
+    jobs = [("Program Overview", {"program_name": "B.Tech CSE"}), ("Program Overview", {"program_name": "B.Tech MECH"})]
+
+    async def run():
+        first = [e async for e in generator.generate(jobs, run_id="r2")]
+        second = [e async for e in generator.generate(jobs, run_id="r2")]
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(llm.deadlines) == 2
+    resumed = {e["index"]: e for e in second if e["type"] == "section"}
+    assert {e["source"] for e in resumed.values()} == {"checkpoint"}
+    assert resumed[0]["narrative"] == "Narrative for Program Overview (B.Tech CSE)"
+    assert resumed[1]["narrative"] == "Narrative for Program Overview (B.Tech MECH)"
+    assert second[-1]["completed"] == 2
+
+
+def test_local_fallback_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "SAR_LOCAL_MAX_RUNS", 2)
+    generator = SARBatchGenerator(FakeLLMService())
+
+    async def run():
+        for run_id in ("a", "b", "c"):
+            [e async for e in generator.generate(_jobs(1), run_id=run_id)]
+        assert len(generator._local_checkpoints) == 2
+        assert await generator.load_checkpoint("a") == {}
+
+        # Runs expire after SAR_CHECKPOINT_TTL, as they would in Redis
+        later = time.time() + settings.SAR_CHECKPOINT_TTL + 1
+        monkeypatch.setattr(time, "time", lambda: later)
+        assert await generator.load_checkpoint("c") == {}
+
+    asyncio.run(run())
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import time
+
+from app.services.semantic_cache import SemanticCache
+
+
+class FakeRedisList:
+    """Just the list commands SemanticCache uses."""
+    def __init__(self):
+        self.lists = {}
+
+    async def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        end = len(items) + end if end < 0 else end
+        self.lists[key] = items[start:end + 1]
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+
+def _entry(query, age):
+    return {"query": query, "embedding": [1.0, 0.0], "payload": {"content": query}, "ts": time.time() - age}
+
+
+def test_redis_entries_past_ttl_are_not_served_and_are_trimmed():
+    redis = FakeRedisList()
+    cache = SemanticCache(redis_client=redis)
+    cache.ttl = 60
+    scope = cache.scope_key("academic", "ctx")
+    redis.lists[scope] = [json.dumps(_entry("fresh", 10)), json.dumps(_entry("old", 120)),
+                          json.dumps(_entry("older", 600))]
+
+    entries = asyncio.run(cache._load_entries(scope))
+
+    assert [e["query"] for e in entries] == ["fresh"]
+    assert [json.loads(r)["query"] for r in redis.lists[scope]] == ["fresh"]
+
+
+def test_redis_trim_keeps_entries_pushed_after_the_read():
+    redis = FakeRedisList()
+    cache = SemanticCache(redis_client=redis)
+    cache.ttl = 60
+    scope = cache.scope_key("academic", "ctx")
+    redis.lists[scope] = [json.dumps(_entry("old", 120))]
+
+    async def read_with_concurrent_write():
+        original = redis.ltrim
+
+        async def ltrim(key, start, end):
+            await redis.lpush(key, json.dumps(_entry("new", 0)))
+            await original(key, start, end)
+        redis.ltrim = ltrim
+        return await cache._load_entries(scope)
+
+    assert asyncio.run(read_with_concurrent_write()) == []
+    assert [json.loads(r)["query"] for r in redis.lists[scope]] == ["new"]
+
+
+def test_local_entries_past_ttl_are_dropped():
+    cache = SemanticCache()
+    cache.ttl = 60
+    scope = cache.scope_key("academic", "ctx")
+    cache._local[scope] = [_entry("fresh", 10), _entry("old", 120)]
+
+    entries = asyncio.run(cache._load_entries(scope))
+
+    assert [e["query"] for e in entries] == ["fresh"]
+    assert [e["query"] for e in cache._local[scope]] == ["fresh"]
+
+
+def test_lookup_matches_only_above_threshold():
+    cache = SemanticCache()
+    cache.enabled = True
+    cache.threshold = 0.9
+    cache.set_embedding_function(lambda texts: [[1.0, 0.0] if "attendance" in texts[0] else [0.0, 1.0]])
+
+    async def run():
+        await cache.store("academic", "show attendance", "ctx", {"content": "92%"})
+        hit, _ = await cache.lookup("academic", "attendance please", "ctx")
+        miss, _ = await cache.lookup("academic", "fee dues", "ctx")
+        other_scope, _ = await cache.lookup("academic", "attendance please", "other ctx")
+        return hit, miss, other_scope
+
+    hit, miss, other_scope = asyncio.run(run())
+    assert hit[0] == {"content": "92%"}
+    assert miss is None
+    assert other_scope is None